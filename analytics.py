@@ -0,0 +1,235 @@
+import re
+from typing import NamedTuple
+
+import numpy as np
+
+from data_version import VersionedCache
+
+# ---------- Analityka (strona statystyk) ----------
+#
+# Kolumny typowane (migrations/003_typed_dates.sql) pobieramy jednym
+# COPY ... (FORMAT BINARY) do tablic NumPy i liczymy serie wektorowo,
+# zamiast wielu zapytań GROUP BY. Wyniki są trzymane w pamięci procesu
+# pod kluczem (wersja_danych, nazwa serii, parametry) – import podbija
+# wersję, więc stare wyniki przestają być używane.
+
+ROLLING_WINDOW = 5  # lata, okno średniej kroczącej
+TOP_CAUSES = 15  # ile przyczyn w macierzy współwystępowania
+TOP_PARISHES = 10  # ile parafii na wykresie zbiorczym
+INFANT_DAYS = 365.25
+
+COPY_SQL = """
+    COPY (
+        SELECT
+            COALESCE(NULLIF(TRIM(parafia), ''), 'brak parafii'),
+            rok_zgonu,
+            CAST(EXTRACT(epoch FROM wiek_interwal) / 86400.0 AS float8),
+            przyczyna_zgonu
+        FROM zgony
+    ) TO STDOUT (FORMAT BINARY)
+"""
+COPY_TYPES = ["text", "int2", "float8", "text"]
+
+# "gruźlica, zapalenie płuc" / "gruźlica i zapalenie płuc" -> dwie przyczyny
+CAUSE_SPLIT_RE = re.compile(r"\s*(?:[,;/+]|\bi\b|\boraz\b)\s*")
+MISSING_CAUSES = {"", "brak informacji", "brak danych", "nieznana"}
+
+
+class Columns(NamedTuple):
+    parish_names: np.ndarray  # unikalne nazwy parafii
+    parish: np.ndarray  # int32, indeks do parish_names
+    year: np.ndarray  # int32, -1 gdy brak
+    age_days: np.ndarray  # float64, NaN gdy brak
+    cause: np.ndarray  # object (str | None)
+
+
+def load_columns(conn) -> Columns:
+    """Cała tabela (tylko potrzebne kolumny) jako tablice kolumnowe."""
+    parishes, years, ages, causes = [], [], [], []
+    with conn.cursor() as cur:
+        with cur.copy(COPY_SQL) as copy:
+            copy.set_types(COPY_TYPES)
+            for parafia, rok, wiek_dni, przyczyna in copy.rows():
+                parishes.append(parafia)
+                years.append(-1 if rok is None else rok)
+                ages.append(np.nan if wiek_dni is None else wiek_dni)
+                causes.append(przyczyna)
+
+    parish_names, parish = np.unique(np.array(parishes, dtype=object), return_inverse=True)
+    return Columns(
+        parish_names=parish_names,
+        parish=parish.astype(np.int32),
+        year=np.array(years, dtype=np.int32),
+        age_days=np.array(ages, dtype=np.float64),
+        cause=np.array(causes, dtype=object),
+    )
+
+
+def _year_axis(cols: Columns, mask=None):
+    known = cols.year >= 0
+    if mask is not None:
+        known &= mask
+    if not known.any():
+        return np.zeros(0, dtype=np.int32), known
+    years = cols.year[known]
+    return np.arange(years.min(), years.max() + 1, dtype=np.int32), known
+
+
+def rolling_mortality(
+    cols: Columns, window=ROLLING_WINDOW, parish_index=None, limit=None
+):
+    """
+    Liczba zgonów rocznie i jej średnia krocząca (okno `window` lat)
+    dla każdej parafii: macierz parafie × lata liczona przez np.add.at,
+    średnia z różnicy sum skumulowanych. `limit` – tylko N parafii
+    z największą liczbą aktów.
+    """
+    mask = None if parish_index is None else cols.parish == parish_index
+    axis, known = _year_axis(cols, mask)
+    if axis.size == 0:
+        return {"years": [], "series": []}
+
+    counts = np.zeros((cols.parish_names.size, axis.size), dtype=np.int64)
+    np.add.at(counts, (cols.parish[known], cols.year[known] - axis[0]), 1)
+
+    csum = np.cumsum(np.pad(counts, ((0, 0), (1, 0))), axis=1)
+    lo = np.maximum(np.arange(axis.size) + 1 - window, 0)
+    widths = np.arange(axis.size) + 1 - lo
+    rolling = (csum[:, 1:] - csum[:, lo]) / widths
+
+    totals = counts.sum(axis=1)
+    rows = np.argsort(-totals, kind="stable")[: np.count_nonzero(totals)]
+    if limit is not None:
+        rows = rows[:limit]
+    return {
+        "years": axis.tolist(),
+        "series": [
+            {
+                "parafia": str(cols.parish_names[i]),
+                "liczba": counts[i].tolist(),
+                "srednia": np.round(rolling[i], 2).tolist(),
+            }
+            for i in rows
+        ],
+    }
+
+
+def infant_share(cols: Columns, parish_index=None):
+    """Udział zgonów dzieci poniżej 1 roku wśród zgonów ze znanym wiekiem, rocznie."""
+    mask = ~np.isnan(cols.age_days)
+    if parish_index is not None:
+        mask &= cols.parish == parish_index
+    axis, known = _year_axis(cols, mask)
+    if axis.size == 0:
+        return {"years": [], "share": [], "infants": [], "total": []}
+
+    offsets = cols.year[known] - axis[0]
+    total = np.bincount(offsets, minlength=axis.size)
+    infants = np.bincount(
+        offsets, weights=cols.age_days[known] < INFANT_DAYS, minlength=axis.size
+    ).astype(np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(total > 0, infants / total, np.nan)
+
+    return {
+        "years": axis.tolist(),
+        "share": [None if np.isnan(v) else round(float(v), 4) for v in share],
+        "infants": infants.tolist(),
+        "total": total.tolist(),
+    }
+
+
+def _split_causes(text):
+    if not text:
+        return []
+    parts = (p.strip().lower() for p in CAUSE_SPLIT_RE.split(text))
+    return sorted({p for p in parts if p not in MISSING_CAUSES})
+
+
+def cause_cooccurrence(cols: Columns, top=TOP_CAUSES, parish_index=None):
+    """
+    Współwystępowanie przyczyn w jednym akcie: macierz 0/1 rekordy × przyczyny
+    (TOP `top` przyczyn), współwystąpienia = M^T M.
+    """
+    causes = cols.cause if parish_index is None else cols.cause[cols.parish == parish_index]
+    split = [_split_causes(c) for c in causes]
+
+    names, counts = np.unique(
+        np.array([c for parts in split for c in parts] or [""], dtype=object),
+        return_counts=True,
+    )
+    if names.size == 1 and names[0] == "":
+        return {"causes": [], "counts": [], "matrix": []}
+    order = np.argsort(-counts, kind="stable")[:top]
+    names, counts = names[order], counts[order]
+    index = {name: i for i, name in enumerate(names)}
+
+    rows = [i for i, parts in enumerate(split) if len(parts) > 1]
+    onehot = np.zeros((len(rows), names.size), dtype=np.int32)
+    for r, i in enumerate(rows):
+        for c in split[i]:
+            j = index.get(c)
+            if j is not None:
+                onehot[r, j] = 1
+    matrix = onehot.T @ onehot
+    np.fill_diagonal(matrix, 0)
+
+    return {
+        "causes": names.tolist(),
+        "counts": counts.tolist(),
+        "matrix": matrix.tolist(),
+    }
+
+
+# ---------- Cache wyników ----------
+
+_cache = VersionedCache()
+
+
+def _cached(conn, key, compute):
+    return _cache.get_or_compute(conn, key, compute)
+
+
+def _columns(conn):
+    return _cached(conn, ("columns",), lambda: load_columns(conn))
+
+
+def overall_stats(conn):
+    """Serie dla /statystyki (wszystkie parafie)."""
+
+    def compute():
+        cols = _columns(conn)
+        return {
+            "rolling": rolling_mortality(cols, limit=TOP_PARISHES),
+            "infant": infant_share(cols),
+            "cooccurrence": cause_cooccurrence(cols),
+        }
+
+    return _cached(conn, ("overall",), compute)
+
+
+def _parish_index(cols, parafia):
+    hits = np.flatnonzero(cols.parish_names == parafia)
+    return int(hits[0]) if hits.size else None
+
+
+def parish_stats(conn, parafia):
+    """
+    Serie dla /statystyki/parafia/<nazwa>; None, gdy parafii nie ma w bazie.
+    Nieznane nazwy nie trafiają do cache (dowolny URL nie zapełnia pamięci).
+    """
+    if _parish_index(_columns(conn), parafia) is None:
+        return None
+
+    def compute():
+        cols = _columns(conn)
+        i = _parish_index(cols, parafia)
+        return {
+            "parafia": parafia,
+            "liczba_aktow": int(np.count_nonzero(cols.parish == i)),
+            "rolling": rolling_mortality(cols, parish_index=i),
+            "infant": infant_share(cols, parish_index=i),
+            "cooccurrence": cause_cooccurrence(cols, parish_index=i),
+        }
+
+    return _cached(conn, ("parish", parafia), compute)
@@ -1,9 +1,11 @@
+import argparse
 import os
 import json
 import random
 import sys
 import time
 import shutil
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 import requests
@@ -11,6 +13,14 @@ from google import genai
 from google.genai import types
 from google.genai.errors import ServerError
 
+from ocr_bands import ROWS_PER_STRIP, BandedOCR
+from ocr_cascade import MODELS, THRESHOLDS, process_with_cascade
+from ocr_engines import FallbackOCR, OCREngine, QuotaExhausted, TesseractEngine
+from ocr_events import EVENTS_FILE_NAME, EventLog, finish_event, new_event, stage
+from ocr_json import RAW_FILE_NAME, REPAIRED, RESPONSE_SCHEMA, parse_response
+from scan_dedupe import HASH_FILE_NAME, MAX_DISTANCE, find_duplicates
+from scan_discovery import DIR_CACHE_FILE_NAME, WORKERS, ImageDiscovery
+
 prompt = (
     """Jesteś asystentem OCR i ekstrakcji danych. Odczytaj treść z przesłanego zdjęcia.
 
@@ -60,13 +70,23 @@ Schemat JSON (dokładnie taki):
 
 
 
-class GeminiOCRProcessor:
-    def __init__(self, api_keys=None):
+class GeminiOCRProcessor(OCREngine):
+    name = "gemini"
+
+    def __init__(self, api_keys=None, wait_on_exhausted=True):
+        """
+        wait_on_exhausted=False – gdy wszystkie klucze mają błędy, zamiast czekać
+        rzucany jest QuotaExhausted (ocr_engines.FallbackOCR przechodzi na lokalny OCR).
+        """
         self.api_keys = api_keys or []
+        self.wait_on_exhausted = wait_on_exhausted
         self.current_key_index = 0
         self.key_usage = {}  # Śledź użycie każdego klucza
         self.key_errors = {}  # Śledź błędy dla każdego klucza
         self.rate_limit_reset = datetime.now()
+        # BandedOCR wysyła pasy strony z kilku wątków – wybór klucza, liczniki
+        # błędów / użycia i statystyki tylko pod blokadą
+        self._lock = threading.Lock()
 
         # Inicjalizuj śledzenie kluczy
         for key in self.api_keys:
@@ -91,35 +111,46 @@ class GeminiOCRProcessor:
 
     def mark_key_error(self, key, error_code):
         """Oznacz klucz jako mający błąd"""
-        if key in self.key_errors:
+        with self._lock:
+            if key not in self.key_errors:
+                return
             self.key_errors[key] += 1
-            print(f"Klucz {self._key_name(key)} ma teraz {self.key_errors[key]} błędów")
+            errors = self.key_errors[key]
+        print(f"Klucz {self._key_name(key)} ma teraz {errors} błędów")
+
+        # Jeśli klucz ma więcej niż 3 błędy 429, tymczasowo go wyłącz
+        if error_code == 429 and errors >= 3:
+            print(f"Klucz {self._key_name(key)} wyłączony (za dużo błędów 429)")
 
-            # Jeśli klucz ma więcej niż 3 błędy 429, tymczasowo go wyłącz
-            if error_code == 429 and self.key_errors[key] >= 3:
-                print(f"Klucz {self._key_name(key)} wyłączony (za dużo błędów 429)")
+    def reset_key_errors(self):
+        with self._lock:
+            for key in self.api_keys:
+                self.key_errors[key] = 0
 
     def get_next_available_key(self):
         """Znajdź następny dostępny klucz API"""
-        original_index = self.current_key_index
+        with self._lock:
+            original_index = self.current_key_index
 
-        for i in range(len(self.api_keys)):
-            next_index = (self.current_key_index + i) % len(self.api_keys)
-            key = self.api_keys[next_index]
+            for i in range(len(self.api_keys)):
+                next_index = (self.current_key_index + i) % len(self.api_keys)
+                key = self.api_keys[next_index]
 
-            # Sprawdź czy klucz nie jest wyłączony
-            if self.key_errors.get(key, 0) < 3:  # Mniej niż 3 błędy
-                self.current_key_index = next_index
+                # Sprawdź czy klucz nie jest wyłączony
+                if self.key_errors.get(key, 0) < 3:  # Mniej niż 3 błędy
+                    self.current_key_index = next_index
 
-                if i > 0:  # Tylko jeśli zmieniliśmy klucz
-                    self.stats['keys_rotated'] += 1
-                    print(f"Rotacja klucza: {self._key_name(self.api_keys[original_index])} → {self._key_name(key)}")
+                    if i > 0:  # Tylko jeśli zmieniliśmy klucz
+                        self.stats['keys_rotated'] += 1
+                        print(f"Rotacja klucza: {self._key_name(self.api_keys[original_index])} → {self._key_name(key)}")
 
-                return key
+                    return key
 
-        # Jeśli wszystkie klucze mają błędy, wyzeruj index
-        self.current_key_index = 0
-        key = self.api_keys[self.current_key_index]
+            # Jeśli wszystkie klucze mają błędy, wyzeruj index
+            self.current_key_index = 0
+            key = self.api_keys[0]
+        if not self.wait_on_exhausted:
+            raise QuotaExhausted("Wszystkie klucze API mają błędy")
         keys_recovery_delay =  300
         print(f"⚠Wszystkie klucze mają błędy, {keys_recovery_delay}s przerwy na odnowienie zasobów")
         keys_recovery_delay =  300
@@ -145,65 +176,98 @@ class GeminiOCRProcessor:
         # Zresetuj czas po oczekiwaniu
         self.rate_limit_reset = datetime.now() + timedelta(minutes=1)
 
-    def process_image(self, image_path, max_retries=3):
-        """Przetwarzanie pojedynczego obrazu z inteligentną rotacją kluczy"""
-
-        with open(image_path, "rb") as f:
-            image_bytes = f.read()
+    def process_image(self, image_path, max_retries=3, event=None, raw_path=None,
+                      model="gemini-2.5-flash"):
+        """
+        Przetwarzanie pojedynczego obrazu z inteligentną rotacją kluczy.
+        model – kolejne poziomy podaje ocr_cascade.process_with_cascade.
+        event (ocr_events.new_event) – uzupełniany czasami etapów, kluczem,
+        liczbą prób, rozmiarem odpowiedzi i wynikiem parsowania JSON.
+        raw_path – tu zapisywana jest pełna odpowiedź modelu
+        (python ocr_json.py napraw parsuje ją ponownie bez wywołań API).
+        """
+        if event is None:
+            event = {}
+
+        with stage(event, "odczyt_pliku"):
+            with open(image_path, "rb") as f:
+                image_bytes = f.read()
+        event["bajty_obrazu"] = len(image_bytes)
 
         attempt = 0
+        last_error = None
         while attempt < max_retries:
+            # klucz tej próby – inny wątek mógł już przejść na następny
+            current_key = None
             try:
                 # Pobierz dostępny klucz
                 current_key = self.get_next_available_key()
                 client = genai.Client(api_key=current_key)
-
-                print(f"Używam klucza: {self._key_name(current_key)} (próba {attempt + 1}/{max_retries})")
-
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash",  # Użyj flash dla oszczędności
-                    contents=[
-                        types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-                        prompt,
-                    ],
-                    config={
-                        "response_mime_type": "application/json",
-                    },
-                )
-
-                # Zaktualizuj statystyki
-                self.stats['total_requests'] += 1
-                self.stats['successful'] += 1
-                self.key_usage[current_key] = self.key_usage.get(current_key, 0) + 1
-
-                # Resetuj błędy dla tego klucza po sukcesie
-                self.key_errors[current_key] = 0
-
-                response_text = response.text.strip()
-
-                # Oczyszczanie odpowiedzi
-                if response_text.startswith('```json'):
-                    response_text = response_text[7:-3]
-                elif response_text.startswith('```'):
-                    response_text = response_text[3:-3]
-
-                # Parsowanie JSON
-                try:
-                    parsed_data = json.loads(response_text)
-                    return parsed_data
-                except json.JSONDecodeError as e:
+                event["klucz"] = self._key_name(current_key)
+                event["proby"] = event.get("proby", 0) + 1
+
+                print(f"Używam klucza: {self._key_name(current_key)}, model {model} "
+                      f"(próba {attempt + 1}/{max_retries})")
+
+                # wysłanie obrazu + czas odpowiedzi modelu (jedno wywołanie API)
+                with stage(event, "api"):
+                    response = client.models.generate_content(
+                        model=model,
+                        contents=[
+                            types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
+                            prompt,
+                        ],
+                        config={
+                            "response_mime_type": "application/json",
+                            "response_schema": RESPONSE_SCHEMA,
+                        },
+                    )
+
+                with self._lock:
+                    # Zaktualizuj statystyki
+                    self.stats['total_requests'] += 1
+                    self.stats['successful'] += 1
+                    self.key_usage[current_key] = self.key_usage.get(current_key, 0) + 1
+
+                    # Resetuj błędy dla tego klucza po sukcesie
+                    self.key_errors[current_key] = 0
+
+                # zablokowana albo pusta odpowiedź strukturalna ma text = None
+                response_text = (response.text or "").strip()
+                event["bajty_odpowiedzi"] = len(response_text.encode("utf-8"))
+                if not response_text:
                     return {
                         "rekordy": [],
-                        "error": f"Błąd parsowania JSON: {str(e)}",
-                        "raw_response": response_text[:500]
+                        "error": "Pusta odpowiedź modelu",
+                        "status": "failed",
                     }
 
+                if raw_path is not None:
+                    with open(raw_path, "w", encoding="utf-8") as f:
+                        f.write(response_text)
+
+                with stage(event, "czyszczenie_json"):
+                    # Parsowanie JSON (z naprawą uciętych / lekko uszkodzonych odpowiedzi)
+                    parsed_data, event["json"], error = parse_response(response_text)
+                if parsed_data is not None:
+                    if event["json"] == REPAIRED:
+                        parsed_data["naprawiono_json"] = True
+                    return parsed_data
+                return {
+                    "rekordy": [],
+                    "error": error,
+                    "raw_response": response_text[:500],
+                }
+
+            except QuotaExhausted:
+                raise
+
             except ServerError as e:
                 error_code = getattr(e, 'code', None)
-                current_key = self.get_current_key()
 
                 if error_code == 503:  # Server overloaded
-                    self.stats['failed_503'] += 1
+                    with self._lock:
+                        self.stats['failed_503'] += 1
                     wait_time = (2 ** attempt) + random.random()
                     print(f"Serwer przeciążony (503), czekam {wait_time:.1f}s")
                     time.sleep(wait_time)
@@ -214,22 +278,30 @@ class GeminiOCRProcessor:
 
             except Exception as e:
                 error_code = getattr(e, 'code', None)
-                current_key = self.get_current_key()
 
                 if error_code == 429:  # Quota exhausted
                     print(f"Błąd: {str(e)[:100]}")
-                    self.stats['failed_429'] += 1
+                    with self._lock:
+                        self.stats['failed_429'] += 1
                     self.mark_key_error(current_key, 429)
                     if attempt == max_retries - 1:
                         print(f"Quota wyczerpane (429) dla klucza {self._key_name(current_key)}")
                         attempt = 0
                     else:
                         attempt += 1
+                elif error_code is not None and 400 <= error_code < 500:
+                    # np. 404 dla błędnej nazwy modelu w OCR_MODELE – ponowienie nic nie da
+                    print(f"Błąd API ({error_code}): {str(e)[:100]}")
+                    return {"rekordy": [], "error": str(e)[:500], "status": "failed"}
+                else:
+                    print(f"Błąd: {str(e)[:100]}")
+                    last_error = str(e)[:500]
+                    attempt += 1
 
         # Wszystkie próby zawiodły
         return {
             "rekordy": [],
-            "error": "Wyczerpano wszystkie próby",
+            "error": last_error or "Wyczerpano wszystkie próby",
             "status": "failed"
         }
 
@@ -274,8 +346,133 @@ def check_api_key_quota(api_key):
         return "connection_error"
 
 
-def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_root="json_zgony"):
-    """Przetwarzanie z automatyczną rotacją kluczy API"""
+def send_to_sink(sink, data, parafia_name, relative_path, image_url_prefix):
+    """Rekordy strony do bazy (db_sink) – bez stron z błędem i z lokalnego OCR."""
+    if sink is None or "error" in data or data.get("do_ponowienia"):
+        return
+    if not isinstance(data.get("rekordy"), list):
+        return
+    sink.put(
+        data["rekordy"],
+        parafia_name,
+        source_file=relative_path.as_posix(),
+        image_url=f"{image_url_prefix}/{relative_path.as_posix()}",
+    )
+
+
+def rerun_flagged(api_keys, target_root="json_zgony", sink=None, image_url_prefix="/static",
+                  models=None, thresholds=None):
+    """
+    Ponowne OCR przez API stron z lokalnego silnika ("do_ponowienia" w data.json);
+    obraz leży już obok data.json (image.jpg).
+    """
+    processor = GeminiOCRProcessor(api_keys)
+    event_log = EventLog(Path(target_root) / EVENTS_FILE_NAME)
+    pages = [
+        p for p in sorted(Path(target_root).rglob("data.json"))
+        if json.loads(p.read_text(encoding="utf-8")).get("do_ponowienia")
+    ]
+    print(f"Strony do ponowienia: {len(pages)}")
+    done = 0
+    for data_path in pages:
+        dest_dir = data_path.parent
+        old = json.loads(data_path.read_text(encoding="utf-8"))
+        relative_path = Path(old.get("plik_zrodlowy") or f"{dest_dir.parent.name}/{dest_dir.name}.jpg")
+        parafia_name = relative_path.parts[0] if len(relative_path.parts) > 1 else "brak_parafii"
+        event = new_event(dest_dir / "image.jpg", parafia_name)
+        event["ponowienie"] = True
+
+        data = process_with_cascade(
+            processor,
+            str(dest_dir / "image.jpg"),
+            models=models,
+            thresholds=thresholds,
+            event=event,
+            raw_path=dest_dir / RAW_FILE_NAME,
+        )
+        event["rekordy"] = len(data.get("rekordy") or [])
+        event["status"] = "blad_json" if "error" in data else "ok"
+        event_log.write(finish_event(event))
+        if "error" in data:
+            print(f"   {dest_dir}: {data['error'][:100]} – zostaje do ponowienia")
+            continue
+        data_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        send_to_sink(sink, data, parafia_name, relative_path, image_url_prefix)
+        done += 1
+        print(f"   {dest_dir}: {event['rekordy']} rekordów (model {data.get('model_ocr')})")
+    print(f"Ponowiono: {done}/{len(pages)}")
+
+
+def page_dir(target_path, relative_path):
+    """Folder wyników strony: <target>/<parafia>/<nazwa pliku bez rozszerzenia>."""
+    parafia_name = relative_path.parts[0] if len(relative_path.parts) > 1 else "brak_parafii"
+    return target_path / parafia_name / relative_path.stem
+
+
+def link_duplicate(image_path, rep_path, source_path, target_path, event_log):
+    """
+    Duplikat skanu (scan_dedupe.py): bez OCR, data.json wskazuje folder
+    reprezentanta. Gdy reprezentant nie został przetworzony (błąd – obraz
+    nie przeniesiony), duplikat zostaje w źródle do następnego uruchomienia.
+    """
+    rep_dir = page_dir(target_path, rep_path.relative_to(source_path))
+    if not (rep_dir / "image.jpg").exists():
+        return False
+
+    relative_path = image_path.relative_to(source_path)
+    dest_dir = page_dir(target_path, relative_path)
+    event = new_event(image_path, dest_dir.parent.name)
+    event["status"] = "duplikat"
+    event["duplikat_strony"] = rep_dir.relative_to(target_path).as_posix()
+    if dest_dir == rep_dir:
+        # 1.jpg i 1.png – ten sam folder strony, zostawiamy tylko plik
+        shutil.move(str(image_path), str(dest_dir / f"duplikat_{image_path.name}"))
+    else:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        with open(dest_dir / "data.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "duplikat_strony": event["duplikat_strony"],
+                "plik_zrodlowy": relative_path.as_posix(),
+            }, f, ensure_ascii=False, indent=2)
+        shutil.move(str(image_path), str(dest_dir / "image.jpg"))
+    event_log.write(finish_event(event))
+    return True
+
+
+def process_all_images_with_key_rotation(
+    api_keys,
+    source_root="zgony",
+    target_root="json_zgony",
+    sink=None,
+    write_files=True,
+    image_url_prefix="/static",
+    models=None,
+    thresholds=None,
+    local_ocr=False,
+    dedupe_scans=False,
+    dedupe_distance=MAX_DISTANCE,
+    bands=False,
+    rows_per_strip=ROWS_PER_STRIP,
+    discovery_workers=WORKERS,
+):
+    """
+    Przetwarzanie z automatyczną rotacją kluczy API.
+    models / thresholds – poziomy kaskady modeli i progi walidacji (ocr_cascade.py).
+    local_ocr=True – przy wyczerpanym quota strony idą do lokalnego OCR
+    (ocr_engines.py) z flagą do_ponowienia zamiast czekać na klucze.
+    dedupe_scans=True – prawie identyczne skany w parafii (pHash, odległość
+    Hamminga <= dedupe_distance, scan_dedupe.py) idą do OCR raz; pozostałe
+    dostają data.json z odnośnikiem "duplikat_strony".
+    bands=True – gęste strony (>= 2 * rows_per_strip wierszy tabeli) idą
+    do OCR równolegle w zachodzących na siebie pasach (ocr_bands.py).
+    Obrazy z source_root przychodzą strumieniowo (scan_discovery.py,
+    discovery_workers wątków, pamięć mtime katalogów w target_root) –
+    OCR rusza od pierwszego znalezionego pliku; tylko --duplikaty czeka
+    na pełną listę.
+    sink (db_sink.DatabaseSink) – rekordy każdej strony idą od razu do bazy;
+    write_files=False – bez plików data.json (obraz i tak jest przenoszony).
+    image_url = image_url_prefix + ścieżka obrazu względem source_root.
+    """
 
     source_path = Path(source_root)
     target_path = Path(target_root)
@@ -284,7 +481,7 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
         print(f"Folder '{source_root}' nie istnieje!")
         return
 
-    if not api_keys:
+    if not api_keys and not local_ocr:
         print("Brak kluczy API Gemini!")
         print("\nJak dodać klucze:")
         print("1. Otwórz Google AI Studio: https://aistudio.google.com/app/apikey")
@@ -306,7 +503,9 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
         else:
             print(f"    Klucz ...{key[-8:]}: {status}")
 
-    if not active_keys:
+    if not active_keys and local_ocr:
+        print(" Brak aktywnych kluczy API – wszystkie strony idą do lokalnego OCR (do ponowienia)")
+    elif not active_keys:
         print(" Brak aktywnych kluczy API!")
         print(" Rozwiązania:")
         print("1. Odbierz nowe quota w Google AI Studio")
@@ -315,22 +514,33 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
         return
 
     # Inicjalizacja procesora
-    processor = GeminiOCRProcessor(active_keys)
-
-    # Zbierz wszystkie obrazy
-    all_images = []
-    for root, dirs, files in os.walk(source_path):
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                all_images.append(Path(root) / file)
-
-    total_images = len(all_images)
-
-    if total_images == 0:
-        print("Nie znaleziono obrazów do przetworzenia")
-        return
-
-    print(f"\nObrazy do przetworzenia: {total_images}")
+    processor = GeminiOCRProcessor(active_keys, wait_on_exhausted=not local_ocr)
+    engine = FallbackOCR(processor, TesseractEngine()) if local_ocr else processor
+    banded = BandedOCR(engine, rows_per_strip=rows_per_strip) if bands else None
+    event_log = EventLog(target_path / EVENTS_FILE_NAME)
+
+    # Obrazy ze źródła – strumieniowo, w tle
+    discovery = ImageDiscovery(
+        source_path, cache_path=target_path / DIR_CACHE_FILE_NAME, workers=discovery_workers,
+    )
+    images = discovery
+
+    duplicates = {}
+    if dedupe_scans:
+        # grupy duplikatów wymagają wszystkich skanów parafii
+        all_images = list(discovery)
+        if not all_images:
+            print("Nie znaleziono obrazów do przetworzenia")
+            return
+        duplicates = find_duplicates(
+            all_images, max_distance=dedupe_distance,
+            cache_path=target_path / HASH_FILE_NAME,
+        )
+        images = [p for p in all_images if p not in duplicates]
+        print(f"Duplikaty skanów (bez OCR): {len(duplicates)}")
+        print(f"\nObrazy do przetworzenia: {len(images)}")
+    else:
+        print(f"\nObrazy do przetworzenia: wyszukiwanie w {source_path} w tle")
     print("=" * 50)
 
     processed = 0
@@ -340,27 +550,27 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
     # Dynamiczny delay - zwiększaj gdy są błędy 429
     base_delay = 3  # sekundy
 
-    for i, image_path in enumerate(all_images):
-        remaining = total_images - i
-        print(f"\nPostęp: {i + 1}/{total_images} (pozostało: {remaining})")
+    for i, image_path in enumerate(images):
+        if discovery.done:
+            remaining = discovery.found - len(duplicates) - i
+            print(f"\nPostęp: {i + 1}/{discovery.found - len(duplicates)} (pozostało: {remaining})")
+        else:
+            remaining = None
+            print(f"\nPostęp: {i + 1}/{discovery.found}+ (wyszukiwanie obrazów trwa)")
         print(f"Obraz: {image_path.name}")
 
         # Określ strukturę folderów
         relative_path = image_path.relative_to(source_path)
-        if len(relative_path.parts) > 1:
-            parafia_name = relative_path.parts[0]
-        else:
-            parafia_name = "brak_parafii"
-
-        page_name = image_path.stem
-        dest_dir = target_path / parafia_name / page_name
+        dest_dir = page_dir(target_path, relative_path)
+        parafia_name = dest_dir.parent.name
         dest_dir.mkdir(parents=True, exist_ok=True)
 
         dest_json = dest_dir / "data.json"
         dest_image = dest_dir / "image.jpg"
+        event = new_event(image_path, parafia_name)
 
         # Sprawdź czy już przetworzone
-        if dest_json.exists():
+        if dest_json.exists() or (not write_files and dest_image.exists()):
             print(f"Już przetworzone - pomijam")
             try:
                 shutil.move(str(image_path), str(dest_image))
@@ -368,20 +578,37 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
                 pass
             processed += 1
             successful += 1
+            event["status"] = "pominiety"
+            event_log.write(finish_event(event))
             continue
 
         try:
             # Przetwarzanie z OCR
             start_time = time.time()
-            data = processor.process_image(str(image_path), max_retries=3)
+            data = process_with_cascade(
+                banded or engine,
+                str(image_path),
+                models=models,
+                thresholds=thresholds,
+                event=event,
+                raw_path=dest_dir / RAW_FILE_NAME,
+            )
             processing_time = time.time() - start_time
 
-            # Zapisz wyniki
-            with open(dest_json, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if data.get("do_ponowienia"):
+                data["plik_zrodlowy"] = relative_path.as_posix()
+
+            with stage(event, "zapis"):
+                # Zapisz wyniki (strony z lokalnego OCR zawsze – to z nich korzysta --ponow)
+                if write_files or data.get("do_ponowienia"):
+                    with open(dest_json, "w", encoding="utf-8") as f:
+                        json.dump(data, f, ensure_ascii=False, indent=2)
 
-            # Przenieś obraz
-            shutil.move(str(image_path), str(dest_image))
+                # Rekordy do bazy (tylko poprawnie sparsowana odpowiedź z API)
+                send_to_sink(sink, data, parafia_name, relative_path, image_url_prefix)
+
+                # Przenieś obraz
+                shutil.move(str(image_path), str(dest_image))
 
             # Statystyki
             processed += 1
@@ -390,12 +617,21 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
                 successful += 1
                 records = len(data["rekordy"]) if isinstance(data["rekordy"], list) else 0
                 print(f"Sukces ({processing_time:.1f}s)")
-                print(f"Rekordów: {records}")
+                print(f"Rekordów: {records} (model {data.get('model_ocr')})")
+                event["rekordy"] = records
+                if "error" in data:
+                    event["status"] = "blad_json"
+                else:
+                    event["status"] = "lokalny_ocr" if data.get("do_ponowienia") else "ok"
             else:
                 errors += 1
                 print(f"Częściowy sukces / błąd")
                 if "error" in data:
                     print(f"{data['error'][:100]}")
+                event["status"] = "blad"
+            if "error" in data:
+                event["blad"] = data["error"][:200]
+            event_log.write(finish_event(event))
 
             # Wyświetl statystyki kluczy
             print(f"Statystyki kluczy:")
@@ -410,13 +646,16 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
             if processor.stats['failed_429'] > 0:
                 current_delay = min(30, base_delay * (processor.stats['failed_429'] + 1))
 
-            if remaining > 0:
+            if remaining is None or remaining > 0:
                 print(f"Oczekiwanie {current_delay:.1f}s...")
                 time.sleep(current_delay)
 
         except Exception as e:
             errors += 1
             print(f"Błąd przetwarzania: {str(e)[:100]}")
+            event["status"] = "wyjatek"
+            event["blad"] = f"{type(e).__name__}: {str(e)[:200]}"
+            event_log.write(finish_event(event))
 
             # Zapisz błąd
             error_file = dest_dir / "error.txt"
@@ -425,6 +664,19 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
 
             # Nie przenoś obrazu przy błędzie
 
+    if not discovery.found:
+        print("Nie znaleziono obrazów do przetworzenia")
+        return
+    total_images = discovery.found - len(duplicates)
+
+    # Duplikaty po reprezentantach – odnośnik do ich wyników
+    linked = 0
+    for image_path, rep_path in duplicates.items():
+        try:
+            linked += link_duplicate(image_path, rep_path, source_path, target_path, event_log)
+        except OSError as e:
+            print(f"Duplikat {image_path}: {e}")
+
     # Podsumowanie
     print("\n" + "=" * 50)
     print("🎉 PRZETWARZANIE ZAKOŃCZONE")
@@ -434,7 +686,11 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
     print(f"   Przetworzone: {processed}")
     print(f"   Sukcesy: {successful}")
     print(f"   Błędy: {errors}")
-    print(f"   Pozostało w źródle: {total_images - processed}")
+    if dedupe_scans:
+        print(f"   Duplikaty podpięte: {linked}/{len(duplicates)}")
+    print(f"   Katalogi źródła: {discovery.stats['katalogi_czytane']} czytane, "
+          f"{discovery.stats['katalogi_z_pamieci']} bez zmian (z pamięci)")
+    print(f"   Pozostało w źródle: {total_images - processed + len(duplicates) - linked}")
 
     # Statystyki API
     print(f"\nSTATYSTYKI KLUCZY API:")
@@ -448,6 +704,11 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
     print(f"   Błędy 429 (quota): {processor.stats['failed_429']}")
     print(f"   Błędy 503 (serwer): {processor.stats['failed_503']}")
     print(f"   Rotacje kluczy: {processor.stats['keys_rotated']}")
+    if local_ocr:
+        print(f"   Strony z lokalnego OCR (do ponowienia): {engine.stats['lokalnie']}")
+    if bands:
+        print(f"   Strony w pasach: {banded.stats['strony_w_pasach']} "
+              f"({banded.stats['pasy']} pasów), w całości: {banded.stats['cale_strony']}")
 
     # Zapisz pełne podsumowanie
     summary = {
@@ -458,6 +719,10 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
         "błędy": errors,
         "klucze_użyte": len(active_keys),
         "statystyki_api": processor.stats,
+        "lokalny_ocr": engine.stats if local_ocr else None,
+        "pasy": banded.stats if bands else None,
+        "duplikaty": {"wykryte": len(duplicates), "podpiete": linked} if dedupe_scans else None,
+        "wyszukiwanie": discovery.stats,
         "użycie_kluczy": {f"...{k[-8:]}": v for k, v in processor.key_usage.items()},
         "błędy_kluczy": {f"...{k[-8:]}": v for k, v in processor.key_errors.items()},
         "folder_źródłowy": str(source_path),
@@ -469,12 +734,51 @@ def process_all_images_with_key_rotation(api_keys, source_root="zgony", target_r
         json.dump(summary, f, ensure_ascii=False, indent=2)
 
     print(f"\n📝 Pełne podsumowanie zapisano: {summary_file}")
+    print(f"📈 Zdarzenia per obraz: {event_log.path} (raport: python ocr_events.py raport)")
 
 
 
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR skanów zgony/<parafia>/... przez Gemini")
+    parser.add_argument("--do-bazy", action="store_true",
+                        help="zapisuj rekordy od razu do bazy (PG_DSN2 / PG_DSN)")
+    parser.add_argument("--partia", type=int, default=200, help="rekordów na zapis do bazy")
+    parser.add_argument("--co-ile", type=float, default=2.0,
+                        help="maks. sekund między zapisami do bazy")
+    parser.add_argument("--bez-plikow", action="store_true",
+                        help="nie zapisuj data.json dla stron (tylko z --do-bazy)")
+    parser.add_argument("--url-obrazow", default="/static",
+                        help="prefiks image_url (ścieżka obrazu względem zgony/)")
+    parser.add_argument("--modele", default=",".join(MODELS),
+                        help="poziomy kaskady modeli, od najtańszego (po przecinku)")
+    parser.add_argument("--min-rekordy", type=int, default=THRESHOLDS["min_rekordy"],
+                        help="mniej rekordów na stronie = eskalacja")
+    parser.add_argument("--max-rekordy", type=int, default=THRESHOLDS["max_rekordy"],
+                        help="więcej rekordów na stronie = eskalacja")
+    parser.add_argument("--max-brak", type=float, default=THRESHOLDS["max_brak"],
+                        help="maks. udział rekordów bez imienia/daty ('brak informacji')")
+    parser.add_argument("--min-daty", type=float, default=THRESHOLDS["min_daty"],
+                        help="min. udział rekordów z rozpoznaną datą zgonu")
+    parser.add_argument("--lokalny-ocr", action="store_true",
+                        help="przy wyczerpanym quota OCR przez tesseract (strony do ponowienia)")
+    parser.add_argument("--ponow", action="store_true",
+                        help="przetwórz ponownie przez API strony z lokalnego OCR")
+    parser.add_argument("--duplikaty", action="store_true",
+                        help="wykryj prawie identyczne skany (pHash) i wyślij do OCR tylko jeden z grupy")
+    parser.add_argument("--duplikaty-prog", type=int, default=MAX_DISTANCE,
+                        help="maks. odległość Hamminga hashy (z 64 bitów) dla duplikatu")
+    parser.add_argument("--pasy", action="store_true",
+                        help="gęste strony OCR-uj równolegle w poziomych pasach")
+    parser.add_argument("--wiersze-na-pas", type=int, default=ROWS_PER_STRIP,
+                        help="wierszy tabeli na pas (strony z mniejszą liczbą – w całości)")
+    parser.add_argument("--watki-wyszukiwania", type=int, default=WORKERS,
+                        help="wątków przeglądających katalogi zgony/ przy wyszukiwaniu skanów")
+    args = parser.parse_args()
+    if args.bez_plikow and not args.do_bazy:
+        parser.error("--bez-plikow wymaga --do-bazy")
+
     print("Gemini OCR Processor z rotacją kluczy API")
     print("=" * 50)
     print("""Aby program działał poprawnie:
@@ -485,19 +789,60 @@ if __name__ == "__main__":
     # Sprawdź klucze
     api_keys = gather_api_keys()
 
-    if not api_keys:
+    if not api_keys and (args.ponow or not args.lokalny_ocr):
         print("Nie znaleziono kluczy API!")
         exit(1)
 
     print(f"Znaleziono {len(api_keys)} kluczy API")
 
+    sink = None
+    if args.do_bazy:
+        from backfill import get_dsn
+        from db_sink import FAILED_FILE_NAME, DatabaseSink
+
+        sink = DatabaseSink(
+            get_dsn(),
+            batch_size=args.partia,
+            flush_interval=args.co_ile,
+            failed_path=Path("json_zgony") / FAILED_FILE_NAME,
+        )
+
+    models = [m.strip() for m in args.modele.split(",") if m.strip()]
+    thresholds = {
+        "min_rekordy": args.min_rekordy,
+        "max_rekordy": args.max_rekordy,
+        "max_brak": args.max_brak,
+        "min_daty": args.min_daty,
+    }
+
     # Uruchom przetwarzanie
     try:
-        process_all_images_with_key_rotation(
-            source_root="zgony",
-            target_root="json_zgony",
-            api_keys=api_keys
-        )
+        if args.ponow:
+            rerun_flagged(
+                api_keys,
+                target_root="json_zgony",
+                sink=sink,
+                image_url_prefix=args.url_obrazow,
+                models=models,
+                thresholds=thresholds,
+            )
+        else:
+            process_all_images_with_key_rotation(
+                source_root="zgony",
+                target_root="json_zgony",
+                api_keys=api_keys,
+                sink=sink,
+                write_files=not args.bez_plikow,
+                image_url_prefix=args.url_obrazow,
+                models=models,
+                thresholds=thresholds,
+                local_ocr=args.lokalny_ocr,
+                dedupe_scans=args.duplikaty,
+                dedupe_distance=args.duplikaty_prog,
+                bands=args.pasy,
+                rows_per_strip=args.wiersze_na_pas,
+                discovery_workers=args.watki_wyszukiwania,
+            )
     except KeyboardInterrupt:
         print("\nPrzerwano przez klawisz użytkownika")
     except Exception as e:
@@ -506,4 +851,12 @@ if __name__ == "__main__":
         print("1. Dodaj więcej kluczy API")
         print("2. Zwiększ delay między requestami")
         print("3. Przetwarzaj mniej obrazów dziennie")
-        print("4. Użyj płatnego planu w Google Cloud")
\ No newline at end of file
+        print("4. Użyj płatnego planu w Google Cloud")
+    finally:
+        if sink is not None:
+            sink.close()
+            print(f"\nZAPIS DO BAZY:")
+            print(f"   Rekordy: {sink.stats['rekordy']} w {sink.stats['partie']} partiach")
+            print(f"   Pominięte (bez imie_nazwisko): {sink.stats['pominiete']}")
+            print(f"   Niepoprawne (w {FAILED_FILE_NAME}): {sink.stats['niepoprawne']}")
+            print(f"   Nieudane partie: {sink.stats['bledy']}")
@@ -0,0 +1,321 @@
+"""
+Test obciążeniowy wyszukiwarki: stałe zestawy zapytań na działającą aplikację
+(np. gunicorn main:app na lokalnym Postgresie z danymi z generate_synthetic.py).
+
+Wyniki (percentyle opóźnień i przepustowość per endpoint) zapisywane są
+do bench_results/<data>_<commit>.json, żeby porównywać kolejne commity.
+
+Użycie:
+    python benchmark.py uruchom --url http://127.0.0.1:8000 --czas 60 --watki 16
+    python benchmark.py uruchom --zestaw wyszukiwanie --zadania 2000
+    python benchmark.py porownaj bench_results/a.json bench_results/b.json
+    python benchmark.py serwery --watki 64 --czas 60   # main.py (gunicorn) vs main_async.py (hypercorn)
+"""
+import argparse
+import json
+import random
+import shlex
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from generate_synthetic import FEMALE_NAMES, MALE_NAMES, SURNAMES
+from ocr_events import percentile
+
+RESULTS_DIR = Path("bench_results")
+
+PARISHES = [
+    "Parafia rzymskokatolickiej Albigowa",
+    "Parafia rzymskokatolickiej Matki Boskiej Zwycięskiej w Łodzi",
+    "Parafia rzymskokatolicka św. Jakuba w Warszawie (Ochota)",
+]
+
+
+def _surname(rng):
+    return rng.choice(SURNAMES)[rng.randint(0, 1)]
+
+
+# Każdy generator zwraca (nazwa endpointu, metoda, ścieżka, dane formularza | None).
+def _search_name(rng):
+    return ("search:nazwisko", "GET", "/search?" + urllib.parse.urlencode(
+        {"query": _surname(rng)}), None)
+
+
+def _search_fuzzy(rng):
+    name = rng.choice(FEMALE_NAMES + MALE_NAMES)
+    return ("search:fuzzy", "GET", "/search?" + urllib.parse.urlencode(
+        {"query": name, "fuzzy": "1"}), None)
+
+
+def _search_parish_years(rng):
+    y = rng.randint(1850, 1950)
+    return ("search:parafia+lata", "GET", "/search?" + urllib.parse.urlencode(
+        {"parafia": rng.choice(PARISHES), "year_from": y, "year_to": y + 5}), None)
+
+
+def _search_age_sorted(rng):
+    return ("search:wiek+sort", "GET", "/search?" + urllib.parse.urlencode(
+        {"query": _surname(rng), "age_from": 0, "age_to": 0, "sort_by": "year"}), None)
+
+
+def _export(rng):
+    return ("export", "POST", "/export", {
+        "parafia": rng.choice(PARISHES),
+        "year_from": str(rng.randint(1850, 1950)),
+    })
+
+
+def _mapa(rng):
+    return ("mapa", "GET", "/mapa", None)
+
+
+def _api_parafie(rng):
+    return ("api:parafie", "GET", "/api/parafie?bbox=14,49,24,55", None)
+
+
+def _statystyki(rng):
+    return ("statystyki", "GET", "/statystyki", None)
+
+
+# zestaw -> [(waga, generator)]
+MIXES = {
+    "mieszany": [
+        (40, _search_name), (15, _search_fuzzy), (15, _search_parish_years),
+        (10, _search_age_sorted), (5, _export), (5, _mapa), (5, _api_parafie),
+        (5, _statystyki),
+    ],
+    "wyszukiwanie": [
+        (50, _search_name), (20, _search_fuzzy), (20, _search_parish_years),
+        (10, _search_age_sorted),
+    ],
+    "eksport": [(1, _export)],
+    "mapa": [(1, _mapa), (3, _api_parafie)],
+    "statystyki": [(1, _statystyki)],
+}
+
+
+def _request(base_url, method, path, form, timeout):
+    data = urllib.parse.urlencode(form).encode() if form is not None else None
+    req = urllib.request.Request(base_url.rstrip("/") + path, data=data, method=method)
+    start = time.perf_counter()
+    size = 0
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            while True:
+                chunk = resp.read(65536)
+                if not chunk:
+                    break
+                size += len(chunk)
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - start, status, size
+
+
+def run(base_url, mix, threads=8, duration=None, requests=None, seed=1, timeout=120):
+    weights, generators = zip(*MIXES[mix])
+    lock = threading.Lock()
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    sizes = defaultdict(int)
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker(worker_id):
+        nonlocal issued
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            with lock:
+                if requests is not None and issued >= requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                issued += 1
+            name, method, path, form = rng.choices(generators, weights)[0](rng)
+            elapsed, status, size = _request(base_url, method, path, form, timeout)
+            with lock:
+                if 200 <= status < 400:
+                    samples[name].append(elapsed * 1000)
+                    sizes[name] += size
+                else:
+                    errors[name] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for i in range(threads):
+            pool.submit(worker, i)
+    wall = time.perf_counter() - start
+
+    endpoints = {}
+    for name in sorted(set(samples) | set(errors)):
+        ms = samples.get(name, [])
+        endpoints[name] = {
+            "zadania": len(ms),
+            "bledy": errors.get(name, 0),
+            "na_sekunde": round(len(ms) / wall, 2),
+            "p50_ms": percentile(ms, 50),
+            "p90_ms": percentile(ms, 90),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": round(max(ms), 1) if ms else None,
+            "sredni_rozmiar": round(sizes[name] / len(ms)) if ms else None,
+        }
+    total = sum(e["zadania"] for e in endpoints.values())
+    return {
+        "czas_s": round(wall, 2),
+        "zadania": total,
+        "na_sekunde": round(total / wall, 2),
+        "endpointy": endpoints,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "nieznany"
+
+
+def save_result(result, meta):
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_{meta['commit']}_{meta['zestaw']}.json"
+    with path.open("w", encoding="utf-8") as f:
+        json.dump({"meta": meta, **result}, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def print_result(result):
+    print(f"Łącznie: {result['zadania']} żądań w {result['czas_s']}s "
+          f"({result['na_sekunde']}/s)")
+    print(f"{'endpoint':24s} {'n':>7s} {'err':>5s} {'rps':>8s} "
+          f"{'p50':>9s} {'p90':>9s} {'p99':>9s}")
+    for name, e in result["endpointy"].items():
+        print(f"{name:24s} {e['zadania']:7d} {e['bledy']:5d} {e['na_sekunde']:8.1f} "
+              f"{e['p50_ms'] or 0:9.1f} {e['p90_ms'] or 0:9.1f} {e['p99_ms'] or 0:9.1f}")
+
+
+def compare(path_a, path_b):
+    a = json.loads(Path(path_a).read_text(encoding="utf-8"))
+    b = json.loads(Path(path_b).read_text(encoding="utf-8"))
+    print(f"A: {a['meta']['commit']} ({path_a})")
+    print(f"B: {b['meta']['commit']} ({path_b})")
+    print(f"{'endpoint':24s} {'metryka':8s} {'A':>10s} {'B':>10s} {'zmiana':>9s}")
+    for name in sorted(set(a["endpointy"]) | set(b["endpointy"])):
+        ea, eb = a["endpointy"].get(name, {}), b["endpointy"].get(name, {})
+        for metric in ("na_sekunde", "p50_ms", "p90_ms", "p99_ms"):
+            va, vb = ea.get(metric), eb.get(metric)
+            change = f"{(vb - va) / va * 100:+.1f}%" if va and vb is not None else "—"
+            print(f"{name:24s} {metric:8s} {va if va is not None else '—':>10} "
+                  f"{vb if vb is not None else '—':>10} {change:>9s}")
+
+
+SYNC_CMD = "gunicorn -w 4 --threads 1 -b 127.0.0.1:8001 main:app"
+ASYNC_CMD = "hypercorn -w 1 -b 127.0.0.1:8002 main_async:app"
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        _, status, _ = _request(base_url, "GET", "/mapa", None, timeout=2)
+        if status == 200:
+            return True
+        time.sleep(0.3)
+    return False
+
+
+def run_server(cmd, base_url, mix, **run_kwargs):
+    """Uruchamia serwer poleceniem cmd, mierzy zestaw i zatrzymuje serwer."""
+    proc = subprocess.Popen(shlex.split(cmd))
+    try:
+        if not wait_for_server(base_url):
+            raise RuntimeError(f"Serwer nie wystartował: {cmd}")
+        return run(base_url, mix, **run_kwargs)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy wyszukiwarki zgonów")
+    sub = parser.add_subparsers(dest="co", required=True)
+
+    r = sub.add_parser("uruchom")
+    r.add_argument("--url", default="http://127.0.0.1:8000")
+    r.add_argument("--zestaw", choices=sorted(MIXES), default="mieszany")
+    r.add_argument("--watki", type=int, default=8)
+    r.add_argument("--czas", type=float, default=None, help="czas trwania w sekundach")
+    r.add_argument("--zadania", type=int, default=None, help="liczba żądań")
+    r.add_argument("--ziarno", type=int, default=1)
+    r.add_argument("--opis", default="", help="dowolny opis (np. konfiguracja serwera)")
+
+    c = sub.add_parser("porownaj")
+    c.add_argument("a")
+    c.add_argument("b")
+
+    s = sub.add_parser("serwery", help="ten sam zestaw na main.py (sync) i main_async.py")
+    s.add_argument("--sync", default=SYNC_CMD, help="polecenie serwera sync")
+    s.add_argument("--async", dest="async_", default=ASYNC_CMD, help="polecenie serwera async")
+    s.add_argument("--zestaw", choices=sorted(MIXES), default="mieszany")
+    s.add_argument("--watki", type=int, default=64)
+    s.add_argument("--czas", type=float, default=30)
+    s.add_argument("--ziarno", type=int, default=1)
+
+    args = parser.parse_args()
+    if args.co == "porownaj":
+        compare(args.a, args.b)
+        return
+
+    if args.co == "serwery":
+        paths = []
+        for label, cmd in (("sync", args.sync), ("async", args.async_)):
+            url = "http://" + cmd.split("-b ", 1)[1].split()[0]
+            print(f"== {label}: {cmd}")
+            result = run_server(
+                cmd, url, args.zestaw, threads=args.watki, duration=args.czas, seed=args.ziarno
+            )
+            meta = {
+                "commit": git_commit(),
+                "zestaw": args.zestaw,
+                "url": url,
+                "watki": args.watki,
+                "ziarno": args.ziarno,
+                "opis": f"{label}: {cmd}",
+                "data": datetime.now().isoformat(timespec="seconds"),
+            }
+            print_result(result)
+            paths.append(save_result(result, meta))
+        compare(*paths)
+        return
+
+    if args.czas is None and args.zadania is None:
+        args.czas = 30
+    result = run(
+        args.url, args.zestaw, threads=args.watki, duration=args.czas,
+        requests=args.zadania, seed=args.ziarno,
+    )
+    meta = {
+        "commit": git_commit(),
+        "zestaw": args.zestaw,
+        "url": args.url,
+        "watki": args.watki,
+        "ziarno": args.ziarno,
+        "opis": args.opis,
+        "data": datetime.now().isoformat(timespec="seconds"),
+    }
+    print_result(result)
+    print(f"Zapisano: {save_result(result, meta)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Strumień zmian tabeli zgony dla serwisów lustrzanych (migrations/007_zmiany.sql).
+
+GET /api/changes?since=<seq>&limit=<n> zwraca NDJSON, po jednej linii na
+rekord zmieniony po since (kolejne zmiany jednego rekordu są sklejane
+w ostatnią), rosnąco po seq:
+
+    {"seq": 120, "op": "insert", "id": 5, "rekord": {...}}
+    {"seq": 121, "op": "update", "id": 7, "rekord": {...}}
+    {"seq": 130, "op": "delete", "id": 9}
+
+insert / update niosą pełny bieżący rekord – lustro robi upsert po id.
+Nagłówek X-Change-Seq to seq, do którego sięga odpowiedź; następne
+zapytanie: since = seq ostatniej linii (albo X-Change-Seq, gdy linii
+było mniej niż limit). since sprzed przycięcia dziennika = 410 – wtedy
+pełna kopia przez /snapshot albo /export i since = X-Change-Seq.
+
+Użycie:
+    python changes.py stan
+    python changes.py przytnij --dni 90
+"""
+import argparse
+import json
+import os
+
+import psycopg
+
+DEFAULT_LIMIT = int(os.getenv("CHANGES_LIMIT", "50000"))
+MAX_LIMIT = 500000
+FETCH_SIZE = 2000
+OPERATIONS = {"I": "insert", "U": "update"}
+
+RECORD_COLUMNS = [
+    "imie_nazwisko", "wiek", "miejsce_urodzenia", "data_zgonu", "przyczyna_zgonu",
+    "inne_wazne_informacje", "source_file", "image_url", "parafia",
+    "data_zgonu_d", "godzina_zgonu", "rok_zgonu", "wiek_dni",
+]
+
+CHANGES_SQL = f"""
+    SELECT c.seq, c.id, c.operacja, z.id IS NOT NULL AS istnieje,
+           {", ".join("z." + col for col in RECORD_COLUMNS[:-1])},
+           EXTRACT(EPOCH FROM z.wiek_interwal)::float8 / 86400 AS wiek_dni
+    FROM (
+        SELECT DISTINCT ON (id) seq, id, operacja
+        FROM zmiany_zgony
+        WHERE seq > %s AND seq <= %s
+        ORDER BY id, seq DESC
+    ) c
+    LEFT JOIN zgony z ON z.id = c.id
+    ORDER BY c.seq
+    LIMIT %s
+"""
+
+# po przycięciu całego dziennika najwyższy seq to przycieto_do
+STATE_SQL = """
+    SELECT GREATEST((SELECT max(seq) FROM zmiany_zgony), s.przycieto_do) AS seq,
+           s.przycieto_do
+    FROM zmiany_stan s
+"""
+
+
+class ChangesPruned(Exception):
+    """since sprzed przycięcia dziennika – lustro musi pobrać pełną kopię."""
+
+    def __init__(self, pruned_to):
+        super().__init__(f"Dziennik zmian przycięty do seq {pruned_to}")
+        self.pruned_to = pruned_to
+
+
+def _scalar(row):
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def feed_state(conn):
+    """(najwyższy seq, seq przycięcia dziennika)."""
+    row = conn.execute(STATE_SQL).fetchone()
+    return tuple(row.values()) if isinstance(row, dict) else tuple(row)
+
+
+def parse_args(args):
+    """(since, limit) z parametrów zapytania; ValueError przy błędnych."""
+    since = int(args.get("since", "0"))
+    limit = int(args.get("limit") or DEFAULT_LIMIT)
+    if since < 0 or limit < 1:
+        raise ValueError("since >= 0, limit >= 1")
+    return since, min(limit, MAX_LIMIT)
+
+
+def check_since(since, pruned_to):
+    if since < pruned_to:
+        raise ChangesPruned(pruned_to)
+
+
+def change_line(row) -> str:
+    """Linia NDJSON z wiersza CHANGES_SQL (dict_row)."""
+    if not row["istnieje"]:
+        item = {"seq": row["seq"], "op": "delete", "id": row["id"]}
+    else:
+        item = {
+            "seq": row["seq"],
+            "op": OPERATIONS.get(row["operacja"], "update"),
+            "id": row["id"],
+            "rekord": {col: row[col] for col in RECORD_COLUMNS},
+        }
+    return json.dumps(item, ensure_ascii=False, default=str) + "\n"
+
+
+def iter_changes(conn, since, upto, limit):
+    """Linie NDJSON przez kursor po stronie serwera (conn z dict_row, bez autocommit)."""
+    with conn.cursor(name="zmiany_zgony") as cur:
+        cur.itersize = FETCH_SIZE
+        cur.execute(CHANGES_SQL, (since, upto, limit))
+        for row in cur:
+            yield change_line(row)
+
+
+def log_table(conn, table, op):
+    """
+    Pozycje dziennika dla wszystkich rekordów tabeli spoza zgony (partycja
+    przed ATTACH / po DETACH – partitions.py); bez migracji 007 nic nie robi.
+    """
+    if _scalar(conn.execute("SELECT to_regclass('public.zmiany_zgony')").fetchone()) is None:
+        return 0
+    return _scalar(conn.execute(
+        "SELECT zgony_zapisz_zmiany(%s::regclass, %s)", (f"public.{table}", op)
+    ).fetchone())
+
+
+def prune(conn, days):
+    """Usuwa pozycje dziennika starsze niż days dni; zwraca (usunięte, przycieto_do)."""
+    conn.execute("SELECT zgony_zmiany_blokada()")
+    row = conn.execute(
+        """
+        SELECT COALESCE(max(seq), 0) FROM zmiany_zgony
+        WHERE zmieniono < now() - make_interval(days => %s)
+        """,
+        (days,),
+    ).fetchone()
+    upto = _scalar(row)
+    if not upto:
+        return 0, feed_state(conn)[1]
+    deleted = conn.execute("DELETE FROM zmiany_zgony WHERE seq <= %s", (upto,)).rowcount
+    conn.execute("UPDATE zmiany_stan SET przycieto_do = GREATEST(przycieto_do, %s)", (upto,))
+    return deleted, upto
+
+
+def main():
+    from backfill import get_dsn
+    from import_json_to_pg import mask_dsn
+
+    parser = argparse.ArgumentParser(description="Dziennik zmian tabeli zgony")
+    sub = parser.add_subparsers(dest="co", required=True)
+    sub.add_parser("stan", help="najwyższy seq i seq przycięcia")
+    cut = sub.add_parser("przytnij", help="usuń stare pozycje dziennika")
+    cut.add_argument("--dni", type=int, default=90, help="zostaw zmiany z ostatnich N dni")
+    args = parser.parse_args()
+
+    dsn = get_dsn()
+    print(f"Baza: {mask_dsn(dsn)}")
+    with psycopg.connect(dsn) as conn:
+        if args.co == "stan":
+            seq, pruned_to = feed_state(conn)
+            print(f"Najwyższy seq: {seq}, przycięto do: {pruned_to}")
+        else:
+            deleted, pruned_to = prune(conn, args.dni)
+            conn.commit()
+            print(f"Usunięto {deleted} pozycji, dziennik od seq > {pruned_to}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import threading
+
+# ---------- Wersja danych ----------
+#
+# Jedna liczba w tabeli wersja_danych (migrations/004_data_version.sql).
+# Każdy proces zmieniający rekordy (import, backfill, dedupe) podbija ją
+# w tej samej transakcji, a cache'e aplikacji trzymają wyniki pod kluczem
+# zawierającym wersję – po imporcie stare wpisy po prostu przestają pasować.
+
+
+def get_data_version(conn) -> int:
+    row = conn.execute("SELECT wersja FROM wersja_danych").fetchone()
+    if row is None:
+        return 0
+    return row["wersja"] if isinstance(row, dict) else row[0]
+
+
+async def aget_data_version(conn) -> int:
+    """get_data_version dla połączenia async (main_async.py)."""
+    cur = await conn.execute("SELECT wersja FROM wersja_danych")
+    row = await cur.fetchone()
+    if row is None:
+        return 0
+    return row["wersja"] if isinstance(row, dict) else row[0]
+
+
+def bump_data_version(conn) -> int:
+    """Podbija wersję; wywołać przed conn.commit() transakcji z importem."""
+    row = conn.execute(
+        """
+        UPDATE wersja_danych
+        SET wersja = wersja + 1,
+            zmieniono = now()
+        RETURNING wersja
+        """
+    ).fetchone()
+    return row["wersja"] if isinstance(row, dict) else row[0]
+
+
+class VersionedCache:
+    """
+    Słownik wyników w pamięci procesu, czyszczony przy zmianie wersji danych.
+    Wartość liczymy poza blokadą – równoległe żądania najwyżej policzą to samo.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, conn, key, compute):
+        version = get_data_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+            if key in self._data:
+                return self._data[key]
+
+        value = compute()
+        with self._lock:
+            if version == self._version:
+                self._data[key] = value
+        return value
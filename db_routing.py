@@ -0,0 +1,133 @@
+"""
+Połączenia dla tras wyszukiwarki: limit czasu zapytań, przerywanie zapytań
+po rozłączeniu klienta i kierowanie tras tylko do odczytu na replikę.
+
+- STATEMENT_TIMEOUTS – statement_timeout per trasa (zmienne PG_TIMEOUT_<TRASA>,
+  np. PG_TIMEOUT_EXPORT=2min); przekroczenie = QueryCanceled, a trasa
+  odpowiada 503 z prośbą o zawężenie filtrów,
+- PG_DSN_REPLICA – trasy z REPLICA_ENDPOINTS łączą się z repliką; gdy replika
+  nie odpowiada, przez REPLICA_RETRY_SECONDS wszystko idzie do bazy głównej
+  (import i pozostałe trasy zawsze korzystają z PG_DSN),
+- cancel_on_disconnect – wątek pilnujący gniazda klienta (gunicorn / serwer
+  deweloperski Werkzeug); po rozłączeniu wysyła do Postgresa cancel,
+  więc szeroki /export nie trzyma backendu do końca.
+
+W main_async.py rozłączenie klienta przerywa zadanie Quart, a psycopg sam
+wysyła cancel przy asyncio.CancelledError.
+"""
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg
+
+import metrics
+
+REPLICA_DSN = os.getenv("PG_DSN_REPLICA")
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("PG_REPLICA_CONNECT_TIMEOUT", "2"))
+REPLICA_RETRY_SECONDS = float(os.getenv("PG_REPLICA_RETRY", "30"))
+REPLICA_ENDPOINTS = {"search", "export", "statystyki", "mapa", "zmiany"}
+
+STATEMENT_TIMEOUTS = {
+    endpoint: os.getenv(f"PG_TIMEOUT_{endpoint.upper()}", default)
+    for endpoint, default in {
+        "search": "15s",
+        "export": "60s",
+        "statystyki": "30s",
+        "mapa": "10s",
+        "zmiany": "120s",
+    }.items()
+}
+
+# co ile wątek sprawdza gniazdo klienta
+DISCONNECT_POLL_SECONDS = 0.5
+
+_replica_down_until = 0.0
+
+log = logging.getLogger("zgony.db_routing")
+
+
+def statement_timeout(endpoint):
+    return STATEMENT_TIMEOUTS.get(endpoint)
+
+
+def use_replica(endpoint) -> bool:
+    return bool(REPLICA_DSN) and endpoint in REPLICA_ENDPOINTS and time.monotonic() >= _replica_down_until
+
+
+def mark_replica_down(error):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+    message = " ".join(str(error).split())[:100]
+    log.warning(
+        "Replika niedostępna (%s: %s), przez %.0fs zapytania idą do bazy głównej",
+        type(error).__name__, message, REPLICA_RETRY_SECONDS,
+    )
+
+
+def connect(dsn, endpoint=None, **kwargs):
+    """
+    Połączenie dla trasy: replika (gdy skonfigurowana i dostępna) albo dsn,
+    z statement_timeout trasy ustawionym na całą sesję.
+    """
+    timeout = statement_timeout(endpoint)
+    if timeout:
+        kwargs["options"] = f"-c statement_timeout={timeout}"
+    if use_replica(endpoint):
+        try:
+            conn = psycopg.connect(REPLICA_DSN, connect_timeout=REPLICA_CONNECT_TIMEOUT, **kwargs)
+            metrics.DB_CONNECTIONS.inc(endpoint, "replika")
+            return conn
+        except psycopg.OperationalError as e:
+            mark_replica_down(e)
+            metrics.DB_CONNECTIONS.inc(endpoint, "glowna_awaryjnie")
+            return psycopg.connect(dsn, **kwargs)
+    metrics.DB_CONNECTIONS.inc(endpoint or "inne", "glowna")
+    return psycopg.connect(dsn, **kwargs)
+
+
+def _client_gone(sock) -> bool:
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        # czytelne gniazdo bez danych = klient zamknął połączenie
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        return True
+
+
+@contextmanager
+def cancel_on_disconnect(conn, environ, endpoint=None):
+    """
+    Przerywa zapytania na conn, gdy klient się rozłączy (WSGI: gunicorn.socket
+    lub werkzeug.socket w environ). Bez dostępu do gniazda – nic nie robi.
+    """
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    if sock is None:
+        yield
+        return
+
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(DISCONNECT_POLL_SECONDS):
+            if _client_gone(sock):
+                metrics.QUERIES_CANCELLED.inc(endpoint or "inne", "rozlaczenie")
+                try:
+                    conn.cancel_safe()
+                except psycopg.Error:
+                    pass
+                return
+
+    watcher = threading.Thread(target=watch, name="cancel-on-disconnect", daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        done.set()
+        watcher.join()
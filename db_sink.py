@@ -0,0 +1,191 @@
+"""
+Zapis rekordów z OCR prosto do bazy (bez ręcznego wynik.json + importu).
+
+app.py wrzuca rekordy każdej strony do kolejki, a wątek w tle zbiera je
+w partie (BATCH_SIZE rekordów albo co FLUSH_INTERVAL sekund – co nastąpi pierwsze)
+i ładuje przez COPY, z parafią, source_file i image_url. Wersja danych
+jest podbijana najwyżej co VERSION_INTERVAL sekund (i przy close) – każde
+podbicie unieważnia cache wyników, statystyk, mapy i podpowiedzi, więc
+nie robimy tego przy każdej partii; nowa strona jest w wyszukiwarce po
+najwyżej pół minuty. Partia, której nie udało się zapisać, i rekord,
+którego nie da się zamienić na wiersz, trafiają do pliku NDJSON
+(FAILED_FILE_NAME) zamiast przepaść.
+"""
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+import psycopg
+
+from data_version import bump_data_version
+from import_json_to_pg import INSERT_COLUMNS, build_row_tuple
+from parishes import parish_key
+from partitions import ensure_partitions
+
+COLUMNS = INSERT_COLUMNS + ["image_url"]
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 2.0
+VERSION_INTERVAL = 30.0
+FAILED_FILE_NAME = "niezapisane_do_bazy.ndjson"
+
+_STOP = object()
+
+
+class DatabaseSink:
+    def __init__(self, dsn, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 failed_path=None, version_interval=VERSION_INTERVAL):
+        self.dsn = dsn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.version_interval = version_interval
+        self.failed_path = Path(failed_path) if failed_path else None
+        self.stats = {"rekordy": 0, "pominiete": 0, "niepoprawne": 0, "partie": 0, "bledy": 0}
+        # zapisane partie, po których wersja danych nie była jeszcze podbita
+        self._version_pending = False
+        self._last_bump = time.monotonic()
+        self._queue = queue.Queue()
+        self._conn = None
+        self._parish_names = None
+        self._thread = threading.Thread(target=self._run, name="db-sink", daemon=True)
+        self._thread.start()
+
+    def put(self, records, parafia, source_file, image_url=None):
+        """Rekordy jednej strony (lista słowników z odpowiedzi OCR)."""
+        for r in records or []:
+            if isinstance(r, dict):
+                self._queue.put((r, parafia, source_file, image_url))
+
+    def close(self):
+        """Zapisuje resztę kolejki i kończy wątek."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._conn is not None:
+            self._conn.close()
+
+    # ---------- wątek zapisu ----------
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            wake = [t for t in (deadline, self._bump_deadline()) if t is not None]
+            timeout = max(0.0, min(wake) - time.monotonic()) if wake else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(batch)
+                if self._version_pending:
+                    self._bump_version()
+                return
+            if item is not None:
+                try:
+                    row = self._row(*item)
+                except Exception as e:  # zły rekord z OCR nie może zatrzymać wątku
+                    self.stats["niepoprawne"] += 1
+                    print(f"Rekord niezapisany ({item[2]}): {type(e).__name__}: {e}")
+                    self._save_failed_record(*item)
+                else:
+                    if row is None:
+                        self.stats["pominiete"] += 1
+                    else:
+                        batch.append(row)
+                        if deadline is None:
+                            deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+            elif not batch:
+                deadline = None
+
+            bump_at = self._bump_deadline()
+            if bump_at is not None and time.monotonic() >= bump_at:
+                self._bump_version()
+
+    def _bump_deadline(self):
+        return self._last_bump + self.version_interval if self._version_pending else None
+
+    def _bump_version(self):
+        # przy błędzie kolejna próba po version_interval (bez pętli ponowień)
+        self._last_bump = time.monotonic()
+        try:
+            conn = self._connection()
+            bump_data_version(conn)
+            conn.commit()
+            self._version_pending = False
+        except Exception as e:
+            print(f"Podbicie wersji danych nieudane: {type(e).__name__}: {e}")
+            self._reset_connection()
+
+    def _row(self, record, parafia, source_file, image_url):
+        row = build_row_tuple({**record, "parafia": self._parish_name(parafia)}, source_file)
+        if row is None:
+            return None
+        return (*row, image_url)
+
+    def _parish_name(self, folder_name):
+        """Nazwa z gazetera parafii (parishes.py), gdy folder ma inną pisownię."""
+        if self._parish_names is None:
+            try:
+                rows = self._connection().execute("SELECT klucz, nazwa FROM parafie").fetchall()
+                self._parish_names = dict(rows)
+            except psycopg.Error:
+                self._reset_connection()
+                self._parish_names = {}
+        return self._parish_names.get(parish_key(folder_name), folder_name)
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg.connect(self.dsn)
+        return self._conn
+
+    def _reset_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg.Error:
+                pass
+        self._conn = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        parish_i, year_i = COLUMNS.index("parafia"), COLUMNS.index("rok_zgonu")
+        try:
+            conn = self._connection()
+            ensure_partitions(conn, {(r[parish_i], r[year_i]) for r in batch})
+            with conn.cursor() as cur:
+                with cur.copy(f"COPY zgony ({', '.join(COLUMNS)}) FROM STDIN") as copy:
+                    for row in batch:
+                        copy.write_row(row)
+            conn.commit()
+            self.stats["rekordy"] += len(batch)
+            self.stats["partie"] += 1
+            self._version_pending = True
+        except Exception as e:
+            self.stats["bledy"] += 1
+            print(f"Zapis do bazy nieudany ({len(batch)} rekordów): {type(e).__name__}: {e}")
+            self._reset_connection()
+            self._save_failed(batch)
+
+    def _save_failed(self, batch):
+        if self.failed_path is None:
+            return
+        self.failed_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.failed_path.open("a", encoding="utf-8") as f:
+            for row in batch:
+                f.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, default=str) + "\n")
+
+    def _save_failed_record(self, record, parafia, source_file, image_url):
+        if self.failed_path is None:
+            return
+        self.failed_path.parent.mkdir(parents=True, exist_ok=True)
+        item = {"rekord": record, "parafia": parafia, "source_file": source_file, "image_url": image_url}
+        with self.failed_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
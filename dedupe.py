@@ -0,0 +1,269 @@
+"""
+Wykrywanie duplikatów osób w tabeli 'zgony' (nakładające się przebiegi OCR,
+równoległe księgi cywilne i kościelne).
+
+Zadanie offline, przyrostowe:
+  1. bierze rekordy o id większym niż w dedupe_stan,
+  2. liczy im klucz blokowania (kod fonetyczny nazwiska + rok zgonu,
+     a gdy roku brak – kod imienia),
+  3. porównuje parami tylko rekordy w tych samych blokach
+     (co najmniej jeden rekord z pary musi być nowy),
+  4. łączy pary powyżej progu w klastry i zapisuje je w zgony_klastry.
+
+Użycie:
+    python dedupe.py               # tylko nowe rekordy
+    python dedupe.py --od-nowa     # przelicz wszystko
+    python dedupe.py --prog 0.85
+"""
+import argparse
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import psycopg
+from psycopg.rows import dict_row
+
+from backfill import get_dsn
+from data_version import bump_data_version
+from import_json_to_pg import mask_dsn
+from name_matching import normalize_name, phonetic_pl
+from polish_dates import parse_age, parse_death_date
+
+DEFAULT_THRESHOLD = 0.8
+# nowe rekordy czytane partiami (run)
+BATCH_SIZE = 5000
+
+# wagi cech przy ocenie pary (suma = 1.0)
+WEIGHTS = {
+    "imie_nazwisko": 0.5,
+    "wiek": 0.2,
+    "data_zgonu": 0.2,
+    "miejsce_urodzenia": 0.1,
+}
+
+MISSING_VALUES = {"", "brak informacji", "brak danych", "brak"}
+
+
+def block_key(row) -> str:
+    """
+    Kod fonetyczny ostatniego członu (nazwiska) + rok zgonu. Bez roku blok
+    zbierałby wszystkie takie rekordy nazwiska (porównania rosną z kwadratem),
+    więc dochodzi kod pierwszego członu (imienia).
+    """
+    parts = normalize_name(row["imie_nazwisko"]).split()
+    surname = phonetic_pl(parts[-1]) if parts else ""
+    year = parse_death_date(row["data_zgonu"]).year
+    if year is not None:
+        return f"{surname}:{year}"
+    given = phonetic_pl(parts[0]) if len(parts) > 1 else ""
+    return f"{surname}:?:{given}"
+
+
+def _clean(value) -> str:
+    value = normalize_name(value or "")
+    return "" if value in MISSING_VALUES else value
+
+
+def score_pair(a, b):
+    """
+    Podobieństwo dwóch rekordów w skali 0..1.
+    Cechy, których brakuje w którymkolwiek rekordzie, nie są liczone
+    (wagi pozostałych są przeskalowane).
+    """
+    scores = {
+        "imie_nazwisko": SequenceMatcher(
+            None, _clean(a["imie_nazwisko"]), _clean(b["imie_nazwisko"])
+        ).ratio(),
+    }
+
+    age_a, age_b = parse_age(a["wiek"]), parse_age(b["wiek"])
+    if age_a and age_b:
+        # różnica do roku to zwykle "wyliczony" wiek lub błąd odczytu
+        diff = abs(age_a.total_years - age_b.total_years)
+        scores["wiek"] = 1.0 if diff < 0.1 else 0.5 if diff <= 1 else 0.0
+
+    date_a, date_b = parse_death_date(a["data_zgonu"]), parse_death_date(b["data_zgonu"])
+    if date_a.day and date_b.day:
+        days = abs((date_a.day - date_b.day).days)
+        scores["data_zgonu"] = 1.0 if days == 0 else 0.5 if days <= 3 else 0.0
+    elif date_a.year and date_b.year:
+        scores["data_zgonu"] = 0.5 if date_a.year == date_b.year else 0.0
+
+    place_a, place_b = _clean(a["miejsce_urodzenia"]), _clean(b["miejsce_urodzenia"])
+    if place_a and place_b:
+        scores["miejsce_urodzenia"] = SequenceMatcher(None, place_a, place_b).ratio()
+
+    total_weight = sum(WEIGHTS[k] for k in scores)
+    return sum(WEIGHTS[k] * v for k, v in scores.items()) / total_weight
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # reprezentantem klastra zostaje najmniejsze id
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+RECORD_COLUMNS = """
+    id, imie_nazwisko, wiek, miejsce_urodzenia, data_zgonu, parafia, blok_dedupe
+"""
+
+
+def _pairs(block_rows, new_ids):
+    """Pary z bloku, w których co najmniej jeden rekord jest nowy (bez par stary–stary)."""
+    new = [r for r in block_rows if r["id"] in new_ids]
+    old = [r for r in block_rows if r["id"] not in new_ids]
+    for i, a in enumerate(new):
+        for b in old:
+            yield a, b
+        for b in new[i + 1:]:
+            yield a, b
+
+
+def run_batch(conn, new_rows, threshold):
+    """Kroki 1–5 dla jednej partii nowych rekordów; zwraca (porównania, bloki, linki)."""
+    # 1) klucze blokowania dla nowych rekordów
+    for r in new_rows:
+        r["blok_dedupe"] = block_key(r)
+    with conn.cursor() as cur:
+        cur.executemany(
+            "UPDATE zgony SET blok_dedupe = %s WHERE id = %s",
+            [(r["blok_dedupe"], r["id"]) for r in new_rows],
+        )
+
+    new_ids = {r["id"] for r in new_rows}
+    blocks = sorted({r["blok_dedupe"] for r in new_rows})
+
+    # 2) wszystkie rekordy (stare + nowe) z dotkniętych bloków
+    rows = conn.execute(
+        f"SELECT {RECORD_COLUMNS} FROM zgony WHERE blok_dedupe = ANY(%s)",
+        (blocks,),
+    ).fetchall()
+    by_block = defaultdict(list)
+    for r in rows:
+        by_block[r["blok_dedupe"]].append(r)
+
+    # 3) istniejące klastry rekordów z tych bloków
+    uf = UnionFind()
+    existing = conn.execute(
+        "SELECT id, klaster_id FROM zgony_klastry WHERE id = ANY(%s)",
+        ([r["id"] for r in rows],),
+    ).fetchall()
+    for link in existing:
+        uf.union(link["id"], link["klaster_id"])
+
+    # 4) porównania parami wewnątrz bloków
+    best_score = {}
+    compared = 0
+    for block_rows in by_block.values():
+        for a, b in _pairs(block_rows, new_ids):
+            compared += 1
+            s = score_pair(a, b)
+            if s >= threshold:
+                uf.union(a["id"], b["id"])
+                for rid in (a["id"], b["id"]):
+                    best_score[rid] = max(best_score.get(rid, 0.0), s)
+
+    # 5) zapis klastrów (tylko klastry z więcej niż jednym rekordem)
+    clusters = defaultdict(list)
+    for rid in uf.parent:
+        clusters[uf.find(rid)].append(rid)
+
+    links = [
+        (rid, root, best_score.get(rid))
+        for root, members in clusters.items()
+        if len(members) > 1
+        for rid in members
+    ]
+    with conn.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO zgony_klastry (id, klaster_id, wynik)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (id) DO UPDATE
+            SET klaster_id = EXCLUDED.klaster_id,
+                wynik = COALESCE(EXCLUDED.wynik, zgony_klastry.wynik)
+            """,
+            links,
+        )
+
+    conn.execute(
+        "UPDATE dedupe_stan SET ostatnie_id = %s, uruchomiono = now()",
+        (max(new_ids),),
+    )
+    conn.commit()
+    return compared, len(blocks), len(links)
+
+
+def run(conn, threshold=DEFAULT_THRESHOLD, from_scratch=False, batch_size=BATCH_SIZE):
+    """
+    Nowe rekordy idą partiami po id (po każdej commit i przesunięcie
+    dedupe_stan) – pamięć zależy od partii i dotkniętych bloków, nie od
+    liczby nowych rekordów. Rekordy z wcześniejszych partii są dla
+    kolejnych "stare", więc każda para jest porównana raz.
+    """
+    if from_scratch:
+        conn.execute("DELETE FROM zgony_klastry")
+        conn.execute("UPDATE zgony SET blok_dedupe = NULL WHERE blok_dedupe IS NOT NULL")
+        conn.execute("UPDATE dedupe_stan SET ostatnie_id = 0")
+        conn.commit()
+
+    last_id = conn.execute("SELECT ostatnie_id FROM dedupe_stan").fetchone()["ostatnie_id"]
+
+    new_total = compared = blocks = links = 0
+    while True:
+        new_rows = conn.execute(
+            f"SELECT {RECORD_COLUMNS} FROM zgony WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+        ).fetchall()
+        if not new_rows:
+            break
+        batch_compared, batch_blocks, batch_links = run_batch(conn, new_rows, threshold)
+        new_total += len(new_rows)
+        compared += batch_compared
+        blocks += batch_blocks
+        links += batch_links
+        last_id = new_rows[-1]["id"]
+
+    if not new_total:
+        print("Brak nowych rekordów.")
+        return 0
+    if links:
+        bump_data_version(conn)
+        conn.commit()
+
+    print(
+        f"Nowe rekordy: {new_total}, bloki: {blocks}, "
+        f"porównania: {compared}, zapisane powiązania: {links}"
+    )
+    return links
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wykrywanie duplikatów w tabeli zgony")
+    parser.add_argument("--prog", type=float, default=DEFAULT_THRESHOLD,
+                        help="minimalne podobieństwo pary (0..1)")
+    parser.add_argument("--od-nowa", action="store_true",
+                        help="usuń klastry i przelicz wszystkie rekordy")
+    args = parser.parse_args()
+
+    dsn = get_dsn()
+    print(f"Baza: {mask_dsn(dsn)}")
+    with psycopg.connect(dsn, row_factory=dict_row) as conn:
+        run(conn, threshold=args.prog, from_scratch=args.od_nowa)
+
+
+if __name__ == "__main__":
+    main()
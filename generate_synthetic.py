@@ -0,0 +1,230 @@
+"""
+Generator syntetycznych rekordów 'zgony' do testów wydajności.
+
+Rekordy mają te same formaty tekstowe co dane z OCR (daty "29 grudnia 1939,
+godzina niewiadoma", wiek "2 miesiące 2 dni", "53 lata (przybliżony,
+wyliczony)", odmiany pisowni imion), a parafie są losowane z rozkładem
+zbliżonym do prawdziwego (wagi z aktualnej bazy albo z listy poniżej).
+Kolumny pochodne (klucze imion, daty typowane) są liczone tak jak przy
+imporcie, a rekordy ładowane przez COPY.
+
+Użycie:
+    python generate_synthetic.py --rekordy 2000000
+    python generate_synthetic.py --rekordy 100000 --ziarno 7 --usun
+"""
+import argparse
+import random
+import time
+
+import psycopg
+
+from data_version import bump_data_version
+from name_matching import name_keys
+from partitions import ensure_partitions
+from polish_dates import typed_columns
+
+SOURCE_FILE = "syntetyczne"
+
+# parafie i ich względna liczność, gdy baza jest pusta
+DEFAULT_PARISHES = [
+    ("Parafia rzymskokatolickiej Albigowa", 30),
+    ("Parafia rzymskokatolickiej Matki Boskiej Zwycięskiej w Łodzi", 25),
+    ("Parafia rzymskokatolicka św. Jakuba w Warszawie (Ochota)", 20),
+    ("Parafia Rzymskokatolicka w Mogile", 10),
+    ("Parafia Rzymskokatolicka w Opocznie", 8),
+    ("Parafia Rzymskokatolicka w Sokołowie Małopolskim", 8),
+    ("parafia rzymskokatolicka w Sokołowie małopolskim", 2),
+    ("Okręg Bożniczy w Skierniewicach", 5),
+    ("Urząd Stanu Cywilnego Białogórzyno", 4),
+    ("Urząd Stanu Cywilnego Nowy Tomyśl - obwód wiejski", 4),
+    ("Parafia rzymskokatolicka w Wronczynie", 3),
+    ("Parafia rzymskokatolicka w Jeżewie", 3),
+]
+
+FEMALE_NAMES = [
+    "Marianna", "Maryanna", "Maryjanna", "Józefa", "Katarzyna", "Agnieszka",
+    "Anna", "Zofia", "Franciszka", "Jadwiga", "Helena", "Stanisława",
+    "Magdalena", "Rozalia", "Apolonia", "Karolina", "Teresa", "Ewa", "Barbara",
+]
+MALE_NAMES = [
+    "Jan", "Józef", "Stanisław", "Wojciech", "Franciszek", "Antoni", "Jakub",
+    "Tomasz", "Walenty", "Grzegorz", "Michał", "Piotr", "Andrzej", "Kazimierz",
+    "Bolesław", "Teodor", "Ignacy", "Maciej", "Ksawery", "Xawery",
+]
+# nazwiska: (forma męska, forma żeńska)
+SURNAMES = [
+    ("Kowalski", "Kowalska"), ("Nowak", "Nowak"), ("Wiśniewski", "Wiśniewska"),
+    ("Kuźniak", "Kuźniak"), ("Kuzniak", "Kuzniak"), ("Szpunar", "Szpunar"),
+    ("Rublewski", "Rublewska"), ("Dymitrzyk", "Dymitrzyk"), ("Przela", "Przela"),
+    ("Bubelnik", "Bubelnik"), ("Kłodkiewicz", "Kłodkiewicz"), ("Grzyb", "Grzyb"),
+    ("Gżyb", "Gżyb"), ("Mazur", "Mazur"), ("Wójcik", "Wójcik"), ("Krawczyk", "Krawczyk"),
+    ("Zieliński", "Zielińska"), ("Lewandowski", "Lewandowska"), ("Dąbrowski", "Dąbrowska"),
+    ("Kozłowski", "Kozłowska"), ("Jankowski", "Jankowska"), ("Byttner", "Byttner"),
+]
+BIRTHPLACES = [
+    "brak informacji", "Albigowa", "Łańcut", "Warszawa", "Łódź", "Opoczno",
+    "Kraków", "Mogiła", "Strzyżów", "Skierniewice", "Nowy Tomyśl", "Wronczyn",
+]
+CAUSES = [
+    "brak informacji", "gruźlica", "gruźlica płuc", "zapalenie płuc", "starość",
+    "słabość wrodzona", "dyzenteria", "tyfus", "cholera", "ospa", "koklusz",
+    "zapalenie mózgu", "surowicze zapalenie opon mózgowych", "rak", "niewydolność serca",
+    "wyniszczenie organizmu", "osłabienie", "gruźlica, wyniszczenie organizmu",
+    "zapalenie płuc i osłabienie", "kamica żółciowa", "astma",
+]
+MONTHS_GENITIVE = [
+    "stycznia", "lutego", "marca", "kwietnia", "maja", "czerwca",
+    "lipca", "sierpnia", "września", "października", "listopada", "grudnia",
+]
+DAYPARTS = ["rano", "w nocy", "wieczorem", "po południu"]
+NOTES = [
+    "Syn {f} i {m}.", "Córka {f} i {m}.", "Wdowa po {f}.", "Mąż {m}.",
+    "Rolnik. Katolik.", "Robotnik.", "Pogrzebana na cmentarzu parafialnym.",
+]
+
+
+def plural(n, one, few, many):
+    """Polska odmiana liczebnika: 1 rok, 2 lata, 5 lat, 22 lata, 12 lat."""
+    if n == 1:
+        return one
+    if n % 10 in (2, 3, 4) and n % 100 not in (12, 13, 14):
+        return few
+    return many
+
+
+def random_date_text(rng, year):
+    day, month = rng.randint(1, 28), rng.randint(1, 12)
+    style = rng.random()
+    if style < 0.55:
+        text = f"{day} {MONTHS_GENITIVE[month - 1]} {year}"
+    elif style < 0.8:
+        text = f"{day:02d}.{month:02d}.{year}"
+    elif style < 0.9:
+        text = f"{day} {MONTHS_GENITIVE[month - 1]} {year}, godzina niewiadoma"
+    elif style < 0.98:
+        text = (
+            f"{day} {MONTHS_GENITIVE[month - 1]} {year}, "
+            f"{rng.randint(1, 12)}:{rng.choice(['00', '30'])} {rng.choice(DAYPARTS)}"
+        )
+    else:
+        text = "brak informacji"
+    return text
+
+
+def random_age_text(rng):
+    r = rng.random()
+    if r < 0.25:  # dzieci poniżej roku
+        months, days = rng.randint(0, 11), rng.randint(0, 29)
+        parts = []
+        if months:
+            parts.append(f"{months} {plural(months, 'miesiąc', 'miesiące', 'miesięcy')}")
+        if days or not parts:
+            days = days or 1
+            parts.append(f"{days} {plural(days, 'dzień', 'dni', 'dni')}")
+        return " ".join(parts)
+    if r < 0.3:
+        weeks = rng.randint(1, 4)
+        return f"{weeks} {plural(weeks, 'tydzień', 'tygodnie', 'tygodni')}"
+    if r < 0.35:
+        return "brak informacji"
+    years = int(min(max(rng.gauss(55, 22), 1), 105))
+    text = f"{years} {plural(years, 'rok', 'lata', 'lat')}"
+    if rng.random() < 0.2:
+        text += " (przybliżony, wyliczony)"
+    return text
+
+
+def random_record(rng, parishes, weights):
+    female = rng.random() < 0.5
+    first = rng.choice(FEMALE_NAMES if female else MALE_NAMES)
+    surname = rng.choice(SURNAMES)[1 if female else 0]
+    name = f"{first} {surname}"
+
+    year = int(min(max(rng.gauss(1915, 30), 1800), 1960))
+    data_zgonu = random_date_text(rng, year)
+    wiek = random_age_text(rng)
+    note = rng.choice(NOTES).format(f=rng.choice(MALE_NAMES), m=rng.choice(FEMALE_NAMES))
+
+    return (
+        name,
+        wiek,
+        rng.choice(BIRTHPLACES),
+        rng.choices(parishes, weights)[0],
+        data_zgonu,
+        rng.choice(CAUSES),
+        note,
+        SOURCE_FILE,
+        *name_keys(name),
+        *typed_columns(data_zgonu, wiek),
+    )
+
+
+COLUMNS = [
+    "imie_nazwisko", "wiek", "miejsce_urodzenia", "parafia", "data_zgonu",
+    "przyczyna_zgonu", "inne_wazne_informacje", "source_file",
+    "imie_nazwisko_norm", "imie_nazwisko_fon",
+    "data_zgonu_d", "godzina_zgonu", "rok_zgonu", "wiek_interwal",
+]
+
+
+def parish_distribution(conn):
+    rows = conn.execute(
+        """
+        SELECT parafia, COUNT(*)
+        FROM zgony
+        WHERE parafia IS NOT NULL AND TRIM(parafia) <> ''
+          AND source_file IS DISTINCT FROM %s
+        GROUP BY parafia
+        """,
+        (SOURCE_FILE,),
+    ).fetchall()
+    if len(rows) < 2:
+        rows = DEFAULT_PARISHES
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+
+def generate(conn, count, seed=1, batch=50_000):
+    rng = random.Random(seed)
+    parishes, weights = parish_distribution(conn)
+    ensure_partitions(conn, {(p, y) for p in parishes for y in range(1800, 1961, 10)})
+    conn.commit()
+    start = time.perf_counter()
+    done = 0
+    while done < count:
+        n = min(batch, count - done)
+        with conn.cursor() as cur:
+            with cur.copy(f"COPY zgony ({', '.join(COLUMNS)}) FROM STDIN") as copy:
+                for _ in range(n):
+                    copy.write_row(random_record(rng, parishes, weights))
+        conn.commit()
+        done += n
+        rate = done / (time.perf_counter() - start)
+        print(f"Wygenerowano {done}/{count} rekordów ({rate:.0f}/s)")
+    bump_data_version(conn)
+    conn.commit()
+
+
+def main():
+    from backfill import get_dsn
+
+    parser = argparse.ArgumentParser(description="Syntetyczne rekordy zgony (COPY)")
+    parser.add_argument("--rekordy", type=int, default=1_000_000)
+    parser.add_argument("--ziarno", type=int, default=1, help="ziarno losowania")
+    parser.add_argument("--partia", type=int, default=50_000, help="rekordów na COPY")
+    parser.add_argument("--usun", action="store_true",
+                        help="najpierw usuń poprzednio wygenerowane rekordy")
+    args = parser.parse_args()
+
+    with psycopg.connect(get_dsn()) as conn:
+        if args.usun:
+            deleted = conn.execute(
+                "DELETE FROM zgony WHERE source_file = %s", (SOURCE_FILE,)
+            ).rowcount
+            conn.commit()
+            print(f"Usunięto {deleted} syntetycznych rekordów.")
+        generate(conn, args.rekordy, seed=args.ziarno, batch=args.partia)
+        conn.execute("ANALYZE zgony")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,32 @@ from urllib.parse import urlsplit, urlunsplit
 import psycopg
 from psycopg import errors
 
+from data_version import bump_data_version
+from name_matching import name_keys
+from partitions import ensure_partitions
+from polish_dates import typed_columns
+
 # Plik JSON z danymi (lista rekordów)
 JSON_PATH = Path("wynik.json")  # plik w tym samym folderze co skrypt
 
+# kolejność wartości w krotce z build_row_tuple
+INSERT_COLUMNS = [
+    "imie_nazwisko",
+    "wiek",
+    "miejsce_urodzenia",
+    "parafia",
+    "data_zgonu",
+    "przyczyna_zgonu",
+    "inne_wazne_informacje",
+    "source_file",
+    "imie_nazwisko_norm",
+    "imie_nazwisko_fon",
+    "data_zgonu_d",
+    "godzina_zgonu",
+    "rok_zgonu",
+    "wiek_interwal",
+]
+
 
 def mask_dsn(dsn: str) -> str:
     """
@@ -50,10 +73,12 @@ def build_row_tuple(r: dict, source_file: str):
 
     Oczekiwane kolumny:
     imie_nazwisko, wiek, miejsce_urodzenia, parafia,
-    data_zgonu, przyczyna_zgonu, inne_wazne_informacje, source_file
+    data_zgonu, przyczyna_zgonu, inne_wazne_informacje, source_file,
+    imie_nazwisko_norm, imie_nazwisko_fon (klucze do wyszukiwania "fuzzy"),
+    data_zgonu_d, godzina_zgonu, rok_zgonu, wiek_interwal (polish_dates.py)
 
     Obsługuje zarówno "nowe" klucze JSON, jak i "stare":
-      - miejsce_urodzenia  <- r["miejsce_urodzenia"] lub r["data_miejsce_urodzenia"]
+      - miejsce_urodzenia  <- r["miejsce_urodzenia"], r["miejsce urodzenia"] lub r["data_miejsce_urodzenia"]
       - data_zgonu         <- r["data_zgonu"] lub r["data_przyczyna_zgonu"]
       - przyczyna_zgonu    <- r["przyczyna_zgonu"] lub r["data_przyczyna_zgonu"]
       - inne_wazne_inf.    <- r["inne_wazne_informacje"] lub r["dodatkowe_informacje"]
@@ -68,6 +93,7 @@ def build_row_tuple(r: dict, source_file: str):
     # próba wzięcia „nowego” pola, a jeśli go nie ma – starego
     miejsce_urodzenia = (
         r.get("miejsce_urodzenia")
+        or r.get("miejsce urodzenia")  # klucz z promptu OCR (app.py)
         or r.get("data_miejsce_urodzenia")
         or None
     )
@@ -101,6 +127,8 @@ def build_row_tuple(r: dict, source_file: str):
         przyczyna_zgonu,
         inne_wazne_informacje,
         source_file,
+        *name_keys(imie_nazwisko),
+        *typed_columns(data_zgonu, wiek),
     )
 
 
@@ -138,24 +166,18 @@ def main():
             print(f"Pominięto {skipped} rekordów bez imie_nazwisko.")
         return
 
-    insert_sql = """
-        INSERT INTO zgony (
-            imie_nazwisko,
-            wiek,
-            miejsce_urodzenia,
-            parafia,
-            data_zgonu,
-            przyczyna_zgonu,
-            inne_wazne_informacje,
-            source_file
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    insert_sql = f"""
+        INSERT INTO zgony ({", ".join(INSERT_COLUMNS)})
+        VALUES ({", ".join(["%s"] * (len(INSERT_COLUMNS) - 1))}, %s::interval)
     """
 
     try:
         with psycopg.connect(dsn) as conn:
             with conn.cursor() as cur:
+                # partycje parafii / dekad (migrations/006_partycje.sql)
+                ensure_partitions(conn, {(r[3], r[12]) for r in data})  # parafia, rok_zgonu
                 cur.executemany(insert_sql, data)
+            bump_data_version(conn)
             conn.commit()
     except Exception as e:
         raise RuntimeError(
@@ -0,0 +1,383 @@
+"""
+Tryb async wyszukiwarki (ASGI): te same trasy i szablony co main.py,
+ale /search, /export i strona główna to korutyny na puli połączeń
+psycopg_pool.AsyncConnectionPool – jeden proces obsługuje setki
+jednoczesnych klientów zamiast jednego na worker.
+
+Mapa parafii i statystyki korzystają z synchronicznych cache'y
+(parishes.py, analytics.py – numpy), więc idą do wątku przez
+asyncio.to_thread.
+
+Limity czasu zapytań i replika jak w main.py (db_routing.py): trasy
+z REPLICA_ENDPOINTS biorą połączenie z puli repliki (PG_DSN_REPLICA),
+a gdy ta nie odpowiada – z puli głównej. Rozłączenie klienta przerywa
+zadanie, a psycopg wysyła wtedy cancel do Postgresa.
+
+/search i /export wykonują zapytania jako instrukcje przygotowane na
+połączeniu z puli, nazwane po kombinacji filtrów (prepared.py).
+
+Uruchomienie:
+    hypercorn -w 2 -b 0.0.0.0:8000 main_async:app
+Porównanie z main.py pod gunicornem: python benchmark.py serwery
+"""
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from quart import Quart, abort, g, jsonify, make_response, render_template, request, send_file
+
+import analytics
+import changes
+import db_routing
+import main
+import map_clusters
+import metrics
+import parishes
+import prepared
+import result_cache
+import snapshot
+
+app = Quart(__name__)
+
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "2"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "20"))
+
+pool = AsyncConnectionPool(
+    main.DSN,
+    min_size=PG_POOL_MIN,
+    max_size=PG_POOL_MAX,
+    kwargs={"row_factory": dict_row, "cursor_factory": metrics.AsyncInstrumentedCursor},
+    configure=prepared.configure,
+    open=False,
+)
+
+replica_pool = None
+if db_routing.REPLICA_DSN:
+    replica_pool = AsyncConnectionPool(
+        db_routing.REPLICA_DSN,
+        min_size=0,
+        max_size=PG_POOL_MAX,
+        kwargs={
+            "row_factory": dict_row,
+            "cursor_factory": metrics.AsyncInstrumentedCursor,
+            "connect_timeout": db_routing.REPLICA_CONNECT_TIMEOUT,
+        },
+        configure=prepared.configure,
+        open=False,
+    )
+
+
+@app.before_serving
+async def _open_pool():
+    await pool.open()
+    if replica_pool is not None:
+        await replica_pool.open()
+
+
+@app.after_serving
+async def _close_pool():
+    await pool.close()
+    if replica_pool is not None:
+        await replica_pool.close()
+
+
+@asynccontextmanager
+async def connection(endpoint=None):
+    """
+    Połączenie z puli dla trasy: replika albo baza główna, z statement_timeout
+    trasy ustawionym na bieżącą transakcję (połączenia wracają do puli).
+    """
+    async with AsyncExitStack() as stack:
+        conn = None
+        target = "glowna"
+        if replica_pool is not None and db_routing.use_replica(endpoint):
+            try:
+                conn = await stack.enter_async_context(
+                    replica_pool.connection(timeout=db_routing.REPLICA_CONNECT_TIMEOUT)
+                )
+                target = "replika"
+            except (PoolTimeout, psycopg.OperationalError) as e:
+                db_routing.mark_replica_down(e)
+                target = "glowna_awaryjnie"
+        if conn is None:
+            conn = await stack.enter_async_context(pool.connection())
+        metrics.DB_CONNECTIONS.inc(endpoint or "inne", target)
+
+        timeout = db_routing.statement_timeout(endpoint)
+        if timeout:
+            await conn.execute("SELECT set_config('statement_timeout', %s, true)", (timeout,))
+        try:
+            yield conn
+        except asyncio.CancelledError:
+            metrics.QUERIES_CANCELLED.inc(endpoint or "inne", "rozlaczenie")
+            raise
+
+
+@app.errorhandler(psycopg.errors.QueryCanceled)
+async def query_canceled(e):
+    if "statement timeout" in str(e):
+        metrics.QUERIES_CANCELLED.inc(request.endpoint or "inne", "limit_czasu")
+    return "Zapytanie trwało zbyt długo – zawęź filtry wyszukiwania.", 503
+
+
+# ---------- Metryki (jak metrics.init_app, dla Quart) ----------
+
+
+@app.before_request
+async def _start_timer():
+    g._metrics_start = time.perf_counter()
+
+
+@app.after_request
+async def _record_request(response):
+    start = g.pop("_metrics_start", None)
+    if start is not None:
+        rule = request.url_rule
+        route = rule.rule if rule is not None else "<brak trasy>"
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start, route, request.method, str(response.status_code)
+        )
+        if response.content_length is not None:
+            metrics.RESPONSE_BYTES.observe(response.content_length, route)
+    return response
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return metrics.render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+# ---------- Dane do formularza ----------
+
+
+async def get_parish_names(conn):
+    cur = await conn.execute(
+        """
+        SELECT DISTINCT parafia
+        FROM zgony
+        WHERE parafia IS NOT NULL
+          AND parafia <> ''
+        ORDER BY parafia
+        """
+    )
+    return [r["parafia"] for r in await cur.fetchall()]
+
+
+async def get_causes(conn):
+    cur = await conn.execute(
+        """
+        SELECT DISTINCT przyczyna_zgonu
+        FROM zgony
+        WHERE przyczyna_zgonu IS NOT NULL
+          AND TRIM(przyczyna_zgonu) <> ''
+        ORDER BY 1
+        """
+    )
+    return [r["przyczyna_zgonu"] for r in await cur.fetchall()]
+
+
+# ---------- Routy ----------
+
+
+@app.get("/")
+async def home():
+    async with pool.connection() as conn:
+        parish_names = await get_parish_names(conn)
+        causes = await get_causes(conn)
+    return await render_template(
+        "index.html",
+        parishes=parish_names,
+        results=None,
+        causes=causes,
+        **main.EMPTY_FORM,
+    )
+
+
+@app.route("/search", methods=["GET", "POST"])
+async def search():
+    data = await request.form if request.method == "POST" else request.args
+    form = main.read_form(data)
+    args = main.filter_args(form)
+
+    async with pool.connection() as conn:
+        parish_names = await get_parish_names(conn)
+        causes = await get_causes(conn)
+
+        if main.is_empty_search(args):
+            return await render_template(
+                "index.html",
+                parishes=parish_names,
+                results=None,
+                causes=causes,
+                **{
+                    **main.EMPTY_FORM,
+                    "sort_by": form["sort_by"],
+                    "sort_dir": form["sort_dir"],
+                    "fuzzy": form["fuzzy"],
+                    "collapse": form["collapse"],
+                },
+            )
+
+    sql, params = main.search_sql(args, form["sort_by"], form["sort_dir"])
+    order = main.order_expression(form["sort_by"], form["sort_dir"])
+    statement = prepared.combination("search", args, order)
+
+    async with connection("search") as conn:
+
+        async def run_query():
+            cur = await prepared.aexecute(conn, sql, params, statement)
+            return await cur.fetchall()
+
+        signature = result_cache.filter_signature(*args)
+        key = ("search", signature, order, 1)
+        results = await main.results_cache.aget_or_compute(conn, key, run_query)
+
+    return await render_template(
+        "index.html",
+        parishes=parish_names,
+        results=main.add_highlight(results, form["query"]),
+        causes=causes,
+        **form,
+    )
+
+
+@app.get("/api/podpowiedzi")
+async def api_podpowiedzi():
+    limit = main.to_int_or_none((request.args.get("n") or "").strip()) or main.name_index.DEFAULT_LIMIT
+    # indeks jest synchroniczny (sprawdzanie wersji danych, przebudowa) – w wątku
+    hints = await asyncio.to_thread(main.autocomplete.lookup, request.args.get("q") or "", limit)
+    return jsonify([{"imie_nazwisko": name, "count": count} for name, count in hints])
+
+
+@app.post("/export")
+async def export():
+    args = main.filter_args(main.read_form(await request.form))
+    sql, params = main.export_sql(args)
+
+    async with connection("export") as conn:
+
+        async def build_csv():
+            cur = await prepared.aexecute(conn, sql, params, prepared.combination("export", args))
+            return main.rows_to_csv(await cur.fetchall())
+
+        signature = result_cache.filter_signature(*args)
+        csv_data = await main.results_cache.aget_or_compute(conn, ("export", signature), build_csv)
+
+    response = await make_response("\ufeff" + csv_data)
+    response.headers["Content-Disposition"] = "attachment; filename=zgony.csv"
+    response.headers["Content-Type"] = "text/csv; charset=utf-8"
+    return response
+
+
+@app.get("/mapa")
+async def mapa():
+    async with pool.connection() as conn:
+        causes = await get_causes(conn)
+    return await render_template("map.html", causes=causes)
+
+
+@app.get("/api/parafie")
+async def api_parafie():
+    bbox_arg = request.args.get("bbox")
+    bbox = parishes.parse_bbox(bbox_arg)
+    if bbox_arg and bbox is None:
+        return jsonify({"error": "bbox: oczekiwano min_lng,min_lat,max_lng,max_lat"}), 400
+    return jsonify(await asyncio.to_thread(main.get_parishes, bbox))
+
+
+@app.get("/api/mapa/<int:z>/<int:x>/<int:y>.geojson")
+async def api_mapa_kafelek(z, x, y):
+    if not map_clusters.tile_valid(z, x, y):
+        return jsonify({"error": "niepoprawny kafelek z/x/y"}), 400
+    filters = main.tile_filters(request.args)
+    geojson = await asyncio.to_thread(main.get_cluster_tile, z, x, y, *filters)
+    response = jsonify(geojson)
+    response.headers["Content-Type"] = "application/geo+json"
+    return response
+
+
+@app.get("/api/changes")
+async def api_changes():
+    try:
+        since, limit = changes.parse_args(request.args)
+    except ValueError:
+        return jsonify({"error": "since i limit muszą być liczbami (since >= 0, limit >= 1)"}), 400
+
+    stack = AsyncExitStack()
+    conn = await stack.enter_async_context(connection("zmiany"))
+    try:
+        cur = await conn.execute(changes.STATE_SQL)
+        state = await cur.fetchone()
+        upto = state["seq"]
+        changes.check_since(since, state["przycieto_do"])
+    except changes.ChangesPruned as e:
+        await stack.aclose()
+        return jsonify({"error": str(e), "przycieto_do": e.pruned_to}), 410
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    async def stream():
+        # połączenie wraca do puli po ostatniej linii (albo rozłączeniu klienta)
+        async with stack:
+            async with conn.cursor(name="zmiany_zgony") as named:
+                named.itersize = changes.FETCH_SIZE
+                await named.execute(changes.CHANGES_SQL, (since, upto, limit))
+                async for row in named:
+                    yield changes.change_line(row)
+
+    response = await make_response(stream())
+    response.headers["Content-Type"] = "application/x-ndjson"
+    response.headers["X-Change-Seq"] = str(upto)
+    return response
+
+
+@app.get("/snapshot")
+async def snapshot_manifest():
+    manifest = await asyncio.to_thread(snapshot.latest_manifest)
+    if manifest is None:
+        return jsonify({"error": "brak migawki – uruchom python snapshot.py"}), 404
+    return jsonify(snapshot.with_urls(manifest))
+
+
+@app.get("/snapshot/v<int:version>/<path:name>")
+async def snapshot_file(version, name):
+    path = await asyncio.to_thread(snapshot.file_path, version, name)
+    if path is None:
+        abort(404)
+    return await send_file(
+        path.resolve(),
+        mimetype=snapshot.MIMETYPES.get(path.suffix),
+        conditional=True,
+        cache_timeout=main.SNAPSHOT_MAX_AGE,
+    )
+
+
+def _statistics():
+    with main.connect("statystyki", row_factory=dict_row) as conn:
+        return main.statistics_data(conn)
+
+
+@app.get("/statystyki")
+async def statystyki():
+    data = await asyncio.to_thread(_statistics)
+    async with pool.connection() as conn:
+        parish_names = await get_parish_names(conn)
+    return await render_template("statystyki.html", parishes=parish_names, **data)
+
+
+def _parish_stats(parafia):
+    with main.connect("statystyki", row_factory=dict_row) as conn:
+        return analytics.parish_stats(conn, parafia)
+
+
+@app.get("/statystyki/parafia/<path:parafia>")
+async def statystyki_parafii(parafia):
+    series = await asyncio.to_thread(_parish_stats, parafia)
+    if series is None:
+        abort(404)
+    return await render_template("statystyki_parafii.html", series=series)
@@ -0,0 +1,125 @@
+"""
+Klastry parafii dla mapy (GeoJSON per kafelek z/x/y, jak kafelki OSM).
+
+Parafie z gazetera (parishes.py) są grupowane w siatce CLUSTER_PX pikseli
+na danym zoomie; siatka dzieli kafelek 256 px bez reszty, więc klaster
+nigdy nie leży na dwóch kafelkach. Od CLUSTER_MAX_ZOOM każda parafia jest
+osobnym punktem. Liczby aktów można zawęzić do przedziału lat i przyczyny
+zgonu.
+
+Cache (main.results_cache, klucz z wersją danych – import go unieważnia):
+  ("klastry_liczby", rok_od, rok_do, przyczyna) – liczby aktów per parafia,
+  ("klastry", z, x, y, rok_od, rok_do, przyczyna) – gotowy GeoJSON kafelka.
+"""
+import math
+from collections import defaultdict
+
+from data_version import VersionedCache
+from parishes import parish_key
+
+TILE_PX = 256
+CLUSTER_PX = 64
+CLUSTER_MAX_ZOOM = 12
+MAX_ZOOM = 18
+
+_points_cache = VersionedCache()
+
+
+def tile_valid(z, x, y) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _world_px(lat, lng, z):
+    """Współrzędne w pikselach Web Mercator na zoomie z."""
+    size = TILE_PX * 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lng + 180.0) / 360.0 * size
+    s = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * size
+    return x, y
+
+
+def parish_points(conn):
+    """{klucz: (nazwa, lat, lng)} z gazetera – raz na wersję danych."""
+
+    def compute():
+        rows = conn.execute(
+            "SELECT klucz, nazwa, polozenie[1] AS lat, polozenie[0] AS lng FROM parafie"
+        ).fetchall()
+        return {r["klucz"]: (r["nazwa"], r["lat"], r["lng"]) for r in rows}
+
+    return _points_cache.get_or_compute(conn, ("parish_points",), compute)
+
+
+def parish_counts(conn, y_from=None, y_to=None, cause=None):
+    """{klucz: (liczba aktów, [nazwy z tabeli zgony])} dla filtra lat / przyczyny."""
+    sql = """
+        SELECT parafia, COUNT(*) AS count
+        FROM zgony
+        WHERE parafia IS NOT NULL
+          AND TRIM(parafia) <> ''
+    """
+    params = []
+    if y_from is not None and y_to is not None:
+        sql += " AND rok_zgonu BETWEEN %s AND %s"
+        params.extend([y_from, y_to])
+    if cause:
+        sql += " AND przyczyna_zgonu = %s"
+        params.append(cause)
+    sql += " GROUP BY parafia"
+
+    counts = defaultdict(int)
+    names = defaultdict(list)
+    for r in conn.execute(sql, params).fetchall():
+        key = parish_key(r["parafia"])
+        counts[key] += r["count"]
+        names[key].append(r["parafia"])
+    return {key: (counts[key], names[key]) for key in counts}
+
+
+def tile_geojson(points, counts, z, x, y):
+    """FeatureCollection klastrów kafelka (points: parish_points, counts: parish_counts)."""
+    cell_px = 1 if z >= CLUSTER_MAX_ZOOM else CLUSTER_PX
+    x0, y0 = x * TILE_PX, y * TILE_PX
+    cells = defaultdict(list)
+    for key, (count, names) in counts.items():
+        point = points.get(key)
+        if point is None or not count:
+            continue
+        name, lat, lng = point
+        px, py = _world_px(lat, lng, z)
+        if not (x0 <= px < x0 + TILE_PX and y0 <= py < y0 + TILE_PX):
+            continue
+        cell = (int(px // cell_px), int(py // cell_px)) if cell_px > 1 else key
+        cells[cell].append((names[0] if len(names) == 1 else name, lat, lng, count))
+
+    features = []
+    for members in cells.values():
+        total = sum(m[3] for m in members)
+        # punkt klastra: średnia położeń ważona liczbą aktów
+        lat = sum(m[1] * m[3] for m in members) / total
+        lng = sum(m[2] * m[3] for m in members) / total
+        properties = {"count": total, "parafie": len(members)}
+        if len(members) == 1:
+            properties["parafia"] = members[0][0]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(lng, 6), round(lat, 6)]},
+            "properties": properties,
+        })
+    features.sort(key=lambda f: -f["properties"]["count"])
+    return {"type": "FeatureCollection", "features": features}
+
+
+def cluster_tile(conn, cache, z, x, y, y_from=None, y_to=None, cause=None):
+    """GeoJSON kafelka przez cache wyników (cache: result_cache.ResultCache)."""
+    cause = (cause or "").strip()
+    flt = (y_from, y_to, cause)
+
+    def compute():
+        counts = cache.get_or_compute(
+            conn, ("klastry_liczby", *flt), lambda: parish_counts(conn, *flt)
+        )
+        return tile_geojson(parish_points(conn), counts, z, x, y)
+
+    return cache.get_or_compute(conn, ("klastry", z, x, y, *flt), compute)
@@ -0,0 +1,330 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import psycopg
+from psycopg.rows import tuple_row
+from flask import before_render_template, g, request, template_rendered
+
+# ---------- Metryki (format tekstowy Prometheusa, /metrics) ----------
+#
+# - czas obsługi żądania per trasa (histogram), rozmiar odpowiedzi,
+# - czas renderowania szablonów Jinja,
+# - czas i liczba wierszy per "kształt" zapytania SQL (znormalizowany tekst,
+#   więc każda kombinacja filtrów z build_filters_sql to osobna seria),
+# - log wolnych zapytań z planem EXPLAIN (próg: SLOW_QUERY_MS, domyślnie 500 ms),
+# - przygotowane zapytania wyszukiwarki (prepared.py): wykonania i czas
+#   planowania wobec czasu wykonania per kombinacja filtrów.
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+BYTE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 50_000_000)
+PLAN_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+
+slow_log = logging.getLogger("zgony.slow_query")
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket_counts..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = _labels(self.label_names + ("le",), labels + (bound,))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            lbl = _labels(self.label_names, labels)
+            yield f"{self.name}_sum{lbl} {series[-1]}"
+            yield f"{self.name}_count{lbl} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Info:
+    """Seria stała (=1) z etykietami opisującymi id, np. pełny kształt zapytania."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = set()
+        self._lock = threading.Lock()
+
+    def set(self, *labels):
+        with self._lock:
+            self._values.add(labels)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        with self._lock:
+            items = sorted(self._values)
+        for labels in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} 1"
+
+
+REQUEST_SECONDS = Histogram(
+    "zgony_http_request_duration_seconds",
+    "Czas obsługi żądania HTTP.",
+    ("route", "method", "status"),
+)
+RESPONSE_BYTES = Histogram(
+    "zgony_http_response_bytes",
+    "Rozmiar odpowiedzi HTTP w bajtach (bez odpowiedzi strumieniowych).",
+    ("route",),
+    BYTE_BUCKETS,
+)
+TEMPLATE_SECONDS = Histogram(
+    "zgony_template_render_seconds",
+    "Czas renderowania szablonu Jinja.",
+    ("template",),
+)
+QUERY_SECONDS = Histogram(
+    "zgony_db_query_duration_seconds",
+    "Czas wykonania zapytania SQL (per kształt zapytania).",
+    ("query",),
+)
+QUERY_ROWS = Histogram(
+    "zgony_db_query_rows",
+    "Liczba wierszy zwróconych / zmienionych przez zapytanie.",
+    ("query",),
+    ROW_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    "zgony_db_slow_queries_total",
+    "Zapytania dłuższe niż SLOW_QUERY_MS.",
+    ("query",),
+)
+RESULT_CACHE_LOOKUPS = Counter(
+    "zgony_result_cache_lookups_total",
+    "Odczyty cache wyników (result_cache.py) wg rodzaju i wyniku.",
+    ("kind", "result"),
+)
+DB_CONNECTIONS = Counter(
+    "zgony_db_connections_total",
+    "Połączenia tras z bazą wg celu (db_routing.py: replika / główna).",
+    ("endpoint", "target"),
+)
+QUERIES_CANCELLED = Counter(
+    "zgony_db_queries_cancelled_total",
+    "Zapytania przerwane (limit czasu trasy albo rozłączenie klienta).",
+    ("endpoint", "reason"),
+)
+PREPARED_EXECUTIONS = Counter(
+    "zgony_prepared_executions_total",
+    "Wykonania przygotowanych zapytań wyszukiwarki (prepared.py) wg kombinacji filtrów.",
+    ("statement",),
+)
+PREPARED_PREPARES = Counter(
+    "zgony_prepared_prepares_total",
+    "Przygotowania zapytań (pierwsze użycie kombinacji na połączeniu z puli).",
+    ("statement",),
+)
+PREPARED_SECONDS = Histogram(
+    "zgony_prepared_execute_seconds",
+    "Czas wykonania przygotowanego zapytania (po stronie klienta).",
+    ("statement",),
+)
+PREPARED_PLAN_SECONDS = Histogram(
+    "zgony_prepared_plan_seconds",
+    "Próbkowany czas planowania: przygotowana instrukcja (prepared) i sam tekst (text).",
+    ("statement", "mode"),
+    PLAN_BUCKETS,
+)
+PREPARED_PLANS = Counter(
+    "zgony_prepared_plans_total",
+    "Rodzaj planu przygotowanej instrukcji w próbce (generic / custom).",
+    ("statement", "plan"),
+)
+QUERY_INFO = Info(
+    "zgony_db_query_info",
+    "Znormalizowany tekst zapytania dla identyfikatora z etykiety query.",
+    ("query", "sql"),
+)
+
+REGISTRY = [
+    REQUEST_SECONDS,
+    RESPONSE_BYTES,
+    TEMPLATE_SECONDS,
+    QUERY_SECONDS,
+    QUERY_ROWS,
+    SLOW_QUERIES,
+    RESULT_CACHE_LOOKUPS,
+    DB_CONNECTIONS,
+    QUERIES_CANCELLED,
+    PREPARED_EXECUTIONS,
+    PREPARED_PREPARES,
+    PREPARED_SECONDS,
+    PREPARED_PLAN_SECONDS,
+    PREPARED_PLANS,
+    QUERY_INFO,
+]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ---------- Zapytania SQL ----------
+
+
+def query_shape(sql) -> tuple:
+    """(krótki id, znormalizowany tekst) – parametry są poza tekstem (%s)."""
+    if not isinstance(sql, str):
+        sql = sql.as_string(None) if hasattr(sql, "as_string") else str(sql)
+    shape = _WS_RE.sub(" ", sql).strip()
+    return hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12], shape
+
+
+def record_query(sql, params, seconds, rows, conn=None):
+    query_id, shape = query_shape(sql)
+    QUERY_INFO.set(query_id, shape)
+    QUERY_SECONDS.observe(seconds, query_id)
+    if rows is not None and rows >= 0:
+        QUERY_ROWS.observe(rows, query_id)
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(query_id)
+        plan = explain(conn, sql, params) if conn is not None else ""
+        slow_log.warning(
+            "Wolne zapytanie %s (%.0f ms, wierszy: %s): %s\nParametry: %r\nPlan:\n%s",
+            query_id, seconds * 1000, rows, shape, params, plan,
+        )
+
+
+def explain(conn, sql, params) -> str:
+    """Plan (bez ANALYZE – nie wykonujemy zapytania drugi raz)."""
+    query_id, shape = query_shape(sql)
+    if not shape.lower().startswith(("select", "with")):
+        return "(EXPLAIN tylko dla SELECT)"
+    try:
+        with psycopg.ClientCursor(conn, row_factory=tuple_row) as cur:
+            cur.execute("EXPLAIN " + shape, params)
+            return "\n".join(r[0] for r in cur.fetchall())
+    except Exception as e:  # plan jest tylko dodatkiem do logu
+        return f"(EXPLAIN nieudany: {type(e).__name__}: {e})"
+
+
+class InstrumentedCursor(psycopg.Cursor):
+    """Kursor mierzący czas i liczbę wierszy każdego execute()."""
+
+    def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        result = super().execute(query, params, **kwargs)
+        elapsed = time.perf_counter() - start
+        record_query(query, params, elapsed, self.rowcount, self.connection)
+        return result
+
+
+class AsyncInstrumentedCursor(psycopg.AsyncCursor):
+    """Jak InstrumentedCursor, dla main_async.py (bez EXPLAIN w logu wolnych zapytań)."""
+
+    async def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        result = await super().execute(query, params, **kwargs)
+        elapsed = time.perf_counter() - start
+        record_query(query, params, elapsed, self.rowcount)
+        return result
+
+
+# ---------- Flask ----------
+
+
+def _route_label():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "<brak trasy>"
+
+
+def init_app(app):
+    """Podpina pomiary żądań i szablonów oraz trasę /metrics."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            route = _route_label()
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                route,
+                request.method,
+                str(response.status_code),
+            )
+            if not response.is_streamed and response.content_length is not None:
+                RESPONSE_BYTES.observe(response.content_length, route)
+        return response
+
+    def _template_start(sender, template, context, **extra):
+        g.setdefault("_metrics_templates", {})[template.name] = time.perf_counter()
+
+    def _template_done(sender, template, context, **extra):
+        start = g.get("_metrics_templates", {}).pop(template.name, None)
+        if start is not None:
+            TEMPLATE_SECONDS.observe(time.perf_counter() - start, template.name)
+
+    before_render_template.connect(_template_start, app)
+    template_rendered.connect(_template_done, app)
+
+    @app.get("/metrics")
+    def metrics():
+        return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
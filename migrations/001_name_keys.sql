@@ -0,0 +1,19 @@
+-- Klucze do wyszukiwania odmian pisowni imion i nazwisk (tryb "fuzzy").
+-- Wartości liczy Python (name_matching.py) przy imporcie;
+-- dla istniejących rekordów: python backfill.py nazwy
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/001_name_keys.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE public.zgony
+    ADD COLUMN IF NOT EXISTS imie_nazwisko_norm text,
+    ADD COLUMN IF NOT EXISTS imie_nazwisko_fon text[];
+
+-- fragment tekstu bez polskich znaków (LIKE '%lodz%')
+CREATE INDEX IF NOT EXISTS zgony_imie_nazwisko_norm_trgm
+    ON public.zgony USING gin (imie_nazwisko_norm gin_trgm_ops);
+
+-- kody fonetyczne członów (imie_nazwisko_fon @> ARRAY[...])
+CREATE INDEX IF NOT EXISTS zgony_imie_nazwisko_fon_gin
+    ON public.zgony USING gin (imie_nazwisko_fon);
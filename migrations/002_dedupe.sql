@@ -0,0 +1,34 @@
+-- Wykrywanie duplikatów osób (dedupe.py).
+--
+-- blok_dedupe – klucz blokowania (kod fonetyczny nazwiska + rok zgonu);
+--               porównujemy tylko rekordy z tym samym blokiem.
+-- zgony_klastry – rekordy uznane za tę samą osobę; klaster_id to
+--               najmniejsze id w klastrze (rekord "reprezentant").
+-- dedupe_stan – ostatnie przetworzone id (przyrostowe uruchomienia).
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/002_dedupe.sql
+
+ALTER TABLE public.zgony
+    ADD COLUMN IF NOT EXISTS blok_dedupe text;
+
+CREATE INDEX IF NOT EXISTS zgony_blok_dedupe_idx
+    ON public.zgony (blok_dedupe);
+
+CREATE TABLE IF NOT EXISTS public.zgony_klastry (
+    id integer PRIMARY KEY REFERENCES public.zgony (id) ON DELETE CASCADE,
+    klaster_id integer NOT NULL,
+    wynik real
+);
+
+CREATE INDEX IF NOT EXISTS zgony_klastry_klaster_idx
+    ON public.zgony_klastry (klaster_id);
+
+CREATE TABLE IF NOT EXISTS public.dedupe_stan (
+    jeden boolean PRIMARY KEY DEFAULT true CHECK (jeden),
+    ostatnie_id integer NOT NULL DEFAULT 0,
+    uruchomiono timestamptz
+);
+
+INSERT INTO public.dedupe_stan (jeden, ostatnie_id)
+VALUES (true, 0)
+ON CONFLICT (jeden) DO NOTHING;
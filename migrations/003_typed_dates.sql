@@ -0,0 +1,19 @@
+-- Kolumny typowane z tekstowych data_zgonu / wiek (polish_dates.py).
+-- Wypełniane przy imporcie; dla istniejących rekordów: python backfill.py daty
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/003_typed_dates.sql
+
+ALTER TABLE public.zgony
+    ADD COLUMN IF NOT EXISTS data_zgonu_d date,
+    ADD COLUMN IF NOT EXISTS godzina_zgonu time,
+    ADD COLUMN IF NOT EXISTS rok_zgonu smallint,
+    ADD COLUMN IF NOT EXISTS wiek_interwal interval;
+
+CREATE INDEX IF NOT EXISTS zgony_rok_zgonu_idx
+    ON public.zgony (rok_zgonu);
+
+CREATE INDEX IF NOT EXISTS zgony_data_zgonu_d_idx
+    ON public.zgony (data_zgonu_d);
+
+CREATE INDEX IF NOT EXISTS zgony_wiek_interwal_idx
+    ON public.zgony (wiek_interwal);
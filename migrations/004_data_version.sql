@@ -0,0 +1,15 @@
+-- Wersja danych – podbijana przy każdym zatwierdzonym imporcie / przeliczeniu
+-- (data_version.bump_data_version). Cache'e w aplikacji (analytics.py itd.)
+-- używają jej jako klucza, więc po imporcie same się unieważniają.
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/004_data_version.sql
+
+CREATE TABLE IF NOT EXISTS public.wersja_danych (
+    jeden boolean PRIMARY KEY DEFAULT true CHECK (jeden),
+    wersja bigint NOT NULL DEFAULT 1,
+    zmieniono timestamptz NOT NULL DEFAULT now()
+);
+
+INSERT INTO public.wersja_danych (jeden, wersja)
+VALUES (true, 1)
+ON CONFLICT (jeden) DO NOTHING;
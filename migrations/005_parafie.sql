@@ -0,0 +1,34 @@
+-- Gazeter parafii (zamiast słownika PARISH_COORDS w main.py).
+--
+-- klucz     – name_matching.normalize_name(nazwa): małe litery, bez polskich
+--             znaków; tym samym kluczem łączymy parafie z tabeli zgony,
+--             więc różnice wielkości liter nie gubią parafii na mapie.
+-- polozenie – point(długość, szerokość) z indeksem GiST
+--             (zapytania o prostokąt widoku mapy: polozenie <@ box(...)).
+--
+-- Kolejne parafie: python parishes.py dodaj "Nazwa parafii" <szer> <dł>
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/005_parafie.sql
+
+CREATE TABLE IF NOT EXISTS public.parafie (
+    klucz text PRIMARY KEY,
+    nazwa text NOT NULL,
+    polozenie point NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS parafie_polozenie_gist
+    ON public.parafie USING gist (polozenie);
+
+INSERT INTO public.parafie (klucz, nazwa, polozenie) VALUES
+    ('parafia rzymskokatolicka w sokolowie malopolskim', 'Parafia Rzymskokatolicka w Sokołowie Małopolskim', point(22.11804, 50.22737)),
+    ('parafia rzymskokatolickiej albigowa', 'Parafia rzymskokatolickiej Albigowa', point(22.22941, 50.01461)),
+    ('parafia rzymskokatolickiej matki boskiej zwycieskiej w lodzi', 'Parafia rzymskokatolickiej Matki Boskiej Zwycięskiej w Łodzi', point(19.44508, 51.75811)),
+    ('parafia rzymskokatolicka sw jakuba w warszawie ochota', 'Parafia rzymskokatolicka św. Jakuba w Warszawie (Ochota)', point(20.98717, 52.21999)),
+    ('parafia rzymskokatolicka w mogile', 'Parafia Rzymskokatolicka w Mogile', point(20.05334, 50.06468)),
+    ('okreg bozniczy w skierniewicach', 'Okręg Bożniczy w Skierniewicach', point(20.14356, 51.95469)),
+    ('urzad stanu cywilnego bialogorzyno', 'Urząd Stanu Cywilnego Białogórzyno', point(15.9896492, 54.0048044)),
+    ('parafia rzymskokatolicka w opocznie', 'Parafia Rzymskokatolicka w Opocznie', point(20.2781093, 51.3856947)),
+    ('parafia rzymskokatolicka w jezewie', 'Parafia rzymskokatolicka w Jeżewie', point(18.494549, 53.5102519)),
+    ('parafia rzymskokatolicka w wronczynie', 'Parafia rzymskokatolicka w Wronczynie', point(17.2114643, 52.505744)),
+    ('urzad stanu cywilnego nowy tomysl obwod wiejski', 'Urząd Stanu Cywilnego Nowy Tomyśl - obwód wiejski', point(16.1291, 52.31583))
+ON CONFLICT (klucz) DO NOTHING;
@@ -0,0 +1,142 @@
+-- Partycjonowanie tabeli zgony: lista po parafii, podpartycje zakresowe
+-- po dekadzie roku zgonu (rok_zgonu z migrations/003_typed_dates.sql).
+--
+--   zgony                          PARTITION BY LIST (parafia)
+--     zgony_p_<md5 parafii>        PARTITION BY RANGE (rok_zgonu)
+--       zgony_p_<md5>_1890         rok_zgonu 1890–1899
+--       zgony_p_<md5>_inne         brak roku / dekada bez własnej partycji
+--     zgony_inne                   DEFAULT (brak parafii / nowa parafia)
+--
+-- Warunki z main.build_filters_sql (parafia = ..., rok_zgonu BETWEEN ...)
+-- pozwalają plannerowi pominąć pozostałe partycje.
+--
+-- Klucz główny tabeli partycjonowanej musiałby zawierać parafię i rok
+-- (kolumny dopuszczające NULL), więc id ma zwykły indeks, a zgony_klastry
+-- traci klucz obcy do zgony – czyszczeniem zajmuje się partitions.py.
+--
+-- Nowe parafie i dekady: partitions.py (wywoływane przez import_json_to_pg.py),
+-- przeładowanie jednej parafii: python partitions.py przeladuj "Parafia ..." plik.json
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/006_partycje.sql
+-- (wymaga 001–003; przepisuje całą tabelę w jednej transakcji)
+
+BEGIN;
+
+-- nazwa partycji parafii (identyfikator ≤ 63 znaki, niezależny od pisowni)
+CREATE OR REPLACE FUNCTION public.zgony_nazwa_partycji(p_parafia text)
+RETURNS text
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT 'zgony_p_' || left(md5(p_parafia), 12)
+$$;
+
+-- partycja parafii z podpartycją domyślną; istniejąca – bez zmian
+CREATE OR REPLACE FUNCTION public.zgony_dodaj_parafie(p_parafia text)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    nazwa text := public.zgony_nazwa_partycji(p_parafia);
+BEGIN
+    IF to_regclass('public.' || nazwa) IS NOT NULL THEN
+        RETURN nazwa;
+    END IF;
+
+    -- rekordy tej parafii, które trafiły wcześniej do zgony_inne
+    CREATE TEMP TABLE zgony_przenoszone ON COMMIT DROP AS
+        SELECT * FROM public.zgony_inne WHERE parafia = p_parafia;
+    DELETE FROM public.zgony_inne WHERE parafia = p_parafia;
+
+    EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.zgony FOR VALUES IN (%L)
+         PARTITION BY RANGE (rok_zgonu)',
+        nazwa, p_parafia
+    );
+    EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.%I DEFAULT',
+        nazwa || '_inne', nazwa
+    );
+
+    INSERT INTO public.zgony SELECT * FROM zgony_przenoszone;
+    DROP TABLE zgony_przenoszone;
+    RETURN nazwa;
+END
+$$;
+
+-- podpartycja dekady (np. 1890 -> 1890..1899) w partycji parafii
+CREATE OR REPLACE FUNCTION public.zgony_dodaj_dekade(p_parafia text, p_dekada int)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    rodzic text := public.zgony_dodaj_parafie(p_parafia);
+    nazwa text := rodzic || '_' || p_dekada;
+BEGIN
+    IF to_regclass('public.' || nazwa) IS NOT NULL THEN
+        RETURN nazwa;
+    END IF;
+
+    -- rekordy z tej dekady leżące w podpartycji domyślnej
+    EXECUTE format(
+        'CREATE TEMP TABLE zgony_przenoszone ON COMMIT DROP AS
+         SELECT * FROM public.%I WHERE rok_zgonu >= %s AND rok_zgonu < %s',
+        rodzic || '_inne', p_dekada, p_dekada + 10
+    );
+    EXECUTE format(
+        'DELETE FROM public.%I WHERE rok_zgonu >= %s AND rok_zgonu < %s',
+        rodzic || '_inne', p_dekada, p_dekada + 10
+    );
+
+    EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.%I FOR VALUES FROM (%s) TO (%s)',
+        nazwa, rodzic, p_dekada, p_dekada + 10
+    );
+
+    INSERT INTO public.zgony SELECT * FROM zgony_przenoszone;
+    DROP TABLE zgony_przenoszone;
+    RETURN nazwa;
+END
+$$;
+
+-- ---------- Przepisanie istniejącej tabeli ----------
+
+ALTER TABLE public.zgony RENAME TO zgony_stara;
+ALTER TABLE public.zgony_klastry DROP CONSTRAINT IF EXISTS zgony_klastry_id_fkey;
+
+CREATE TABLE public.zgony (LIKE public.zgony_stara INCLUDING DEFAULTS)
+    PARTITION BY LIST (parafia);
+
+CREATE TABLE public.zgony_inne PARTITION OF public.zgony DEFAULT;
+
+SELECT count(public.zgony_dodaj_dekade(parafia, dekada))
+FROM (
+    SELECT DISTINCT parafia, (rok_zgonu / 10) * 10 AS dekada
+    FROM public.zgony_stara
+    WHERE parafia IS NOT NULL
+      AND rok_zgonu IS NOT NULL
+) d;
+
+SELECT count(public.zgony_dodaj_parafie(parafia))
+FROM (SELECT DISTINCT parafia FROM public.zgony_stara WHERE parafia IS NOT NULL) p;
+
+INSERT INTO public.zgony SELECT * FROM public.zgony_stara;
+
+ALTER SEQUENCE public.zgony_id_seq OWNED BY public.zgony.id;
+DROP TABLE public.zgony_stara;
+
+-- indeksy z 001–003 (tworzone na każdej partycji)
+CREATE INDEX zgony_id_idx ON public.zgony (id);
+CREATE INDEX zgony_imie_nazwisko_norm_trgm
+    ON public.zgony USING gin (imie_nazwisko_norm gin_trgm_ops);
+CREATE INDEX zgony_imie_nazwisko_fon_gin
+    ON public.zgony USING gin (imie_nazwisko_fon);
+CREATE INDEX zgony_blok_dedupe_idx ON public.zgony (blok_dedupe);
+CREATE INDEX zgony_rok_zgonu_idx ON public.zgony (rok_zgonu);
+CREATE INDEX zgony_data_zgonu_d_idx ON public.zgony (data_zgonu_d);
+CREATE INDEX zgony_wiek_interwal_idx ON public.zgony (wiek_interwal);
+
+UPDATE public.wersja_danych SET wersja = wersja + 1, zmieniono = now();
+
+COMMIT;
+
+ANALYZE public.zgony;
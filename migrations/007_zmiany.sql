@@ -0,0 +1,132 @@
+-- Dziennik zmian tabeli zgony dla serwisów lustrzanych (/api/changes, changes.py).
+--
+-- zmiany_zgony – jedna pozycja na wstawiony / zmieniony / usunięty rekord,
+--   seq rośnie monotonicznie. Wypełniają ją wyzwalacze na poziomie instrukcji
+--   (tabele przejściowe – COPY z db_sink.py to jeden INSERT do dziennika),
+--   a przeładowanie / odłączenie partycji (partitions.py) wywołuje
+--   zgony_zapisz_zmiany, bo DETACH / ATTACH nie uruchamia wyzwalaczy.
+-- Blokada doradcza do końca transakcji: transakcje zmieniające zgony
+--   dopisują do dziennika po kolei, więc widoczny seq N oznacza, że wszystkie
+--   mniejsze są już zatwierdzone (albo wycofane) – lustro nie zgubi zmian
+--   czytając "seq > ostatni".
+-- zmiany_stan.przycieto_do – do tego seq dziennik jest przycięty
+--   (python changes.py przytnij); starsze ?since= dostają 410.
+--
+-- Rekordy istniejące przed migracją trafiają do dziennika jako wstawienia.
+--
+-- Uruchomienie: psql "$PG_DSN" -f migrations/007_zmiany.sql
+-- (tabela partycjonowana z 006 też – wyzwalacze są na tabeli zgony)
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.zmiany_zgony (
+    seq bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    id integer NOT NULL,
+    operacja "char" NOT NULL CHECK (operacja IN ('I', 'U', 'D')),
+    zmieniono timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS zmiany_zgony_zmieniono_idx
+    ON public.zmiany_zgony (zmieniono);
+
+CREATE TABLE IF NOT EXISTS public.zmiany_stan (
+    jeden boolean PRIMARY KEY DEFAULT true CHECK (jeden),
+    przycieto_do bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO public.zmiany_stan (jeden) VALUES (true)
+ON CONFLICT (jeden) DO NOTHING;
+
+-- kolejka zapisujących do dziennika (do końca transakcji)
+CREATE OR REPLACE FUNCTION public.zgony_zmiany_blokada()
+RETURNS void
+LANGUAGE sql
+AS $$
+    SELECT pg_advisory_xact_lock(hashtext('public.zmiany_zgony'))
+$$;
+
+CREATE OR REPLACE FUNCTION public.zgony_loguj_wstawione()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM nowe) THEN
+        PERFORM public.zgony_zmiany_blokada();
+        INSERT INTO public.zmiany_zgony (id, operacja)
+        SELECT id, 'I' FROM nowe ORDER BY id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION public.zgony_loguj_zmienione()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM nowe) THEN
+        PERFORM public.zgony_zmiany_blokada();
+        INSERT INTO public.zmiany_zgony (id, operacja)
+        SELECT id, 'U' FROM nowe ORDER BY id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION public.zgony_loguj_usuniete()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM stare) THEN
+        PERFORM public.zgony_zmiany_blokada();
+        INSERT INTO public.zmiany_zgony (id, operacja)
+        SELECT id, 'D' FROM stare ORDER BY id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- rekordy tabeli poza zgony (partycja przed ATTACH / po DETACH)
+CREATE OR REPLACE FUNCTION public.zgony_zapisz_zmiany(p_tabela regclass, p_operacja "char")
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    dopisane bigint;
+BEGIN
+    PERFORM public.zgony_zmiany_blokada();
+    EXECUTE format(
+        'INSERT INTO public.zmiany_zgony (id, operacja) SELECT id, %L FROM %s ORDER BY id',
+        p_operacja, p_tabela
+    );
+    GET DIAGNOSTICS dopisane = ROW_COUNT;
+    RETURN dopisane;
+END
+$$;
+
+DROP TRIGGER IF EXISTS zgony_zmiany_wstawione ON public.zgony;
+CREATE TRIGGER zgony_zmiany_wstawione
+    AFTER INSERT ON public.zgony
+    REFERENCING NEW TABLE AS nowe
+    FOR EACH STATEMENT EXECUTE FUNCTION public.zgony_loguj_wstawione();
+
+DROP TRIGGER IF EXISTS zgony_zmiany_zmienione ON public.zgony;
+CREATE TRIGGER zgony_zmiany_zmienione
+    AFTER UPDATE ON public.zgony
+    REFERENCING NEW TABLE AS nowe
+    FOR EACH STATEMENT EXECUTE FUNCTION public.zgony_loguj_zmienione();
+
+DROP TRIGGER IF EXISTS zgony_zmiany_usuniete ON public.zgony;
+CREATE TRIGGER zgony_zmiany_usuniete
+    AFTER DELETE ON public.zgony
+    REFERENCING OLD TABLE AS stare
+    FOR EACH STATEMENT EXECUTE FUNCTION public.zgony_loguj_usuniete();
+
+-- stan początkowy: wszystko, co już jest w tabeli
+INSERT INTO public.zmiany_zgony (id, operacja)
+SELECT id, 'I' FROM public.zgony
+WHERE NOT EXISTS (SELECT 1 FROM public.zmiany_zgony)
+ORDER BY id;
+
+COMMIT;
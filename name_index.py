@@ -0,0 +1,176 @@
+"""
+Podpowiedzi imion i nazwisk (autouzupełnianie pola query).
+
+Indeks w pamięci procesu: posortowana lista kluczy (imie_nazwisko_norm
+i każdy jego sufiks od początku słowa – "jan kowalski" jest też pod
+"kowalski", bo zwykle wpisuje się nazwisko) i bisect po prefiksie.
+Dla prefiksów pasujących do więcej niż DIRECT_SCAN kluczy TOP-N jest
+policzone przy budowie; pozostałe to dwa bisecty i heapq.nsmallest
+po co najwyżej DIRECT_SCAN pozycjach – bez bazy, poniżej milisekundy.
+
+- AUTOCOMPLETE_MAX_NAMES – limit różnych nazwisk (zostają najczęstsze),
+- AUTOCOMPLETE_CHECK_SECONDS – co ile sprawdzamy wersję danych; po imporcie
+  indeks jest przebudowywany w tle, a do końca przebudowy działa stary.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from data_version import get_data_version
+from name_matching import normalize_name
+
+MAX_NAMES = int(os.getenv("AUTOCOMPLETE_MAX_NAMES", "300000"))
+CHECK_SECONDS = float(os.getenv("AUTOCOMPLETE_CHECK_SECONDS", "5"))
+# prefiksy z większą liczbą kluczy mają TOP-N policzone przy budowie
+DIRECT_SCAN = 512
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+log = logging.getLogger("zgony.autocomplete")
+
+
+class NameIndex:
+    """Niezmienny po zbudowaniu: przebudowa tworzy nowy obiekt."""
+
+    def __init__(self, rows, version=None, max_names=MAX_NAMES):
+        """rows: (imie_nazwisko_norm, imie_nazwisko, liczba) – wiele zapisów jednego klucza."""
+        self.version = version
+        counts = defaultdict(int)
+        spellings = defaultdict(dict)
+        for norm, name, count in rows:
+            if not norm:
+                continue
+            counts[norm] += count
+            spellings[norm][name] = spellings[norm].get(name, 0) + count
+
+        top = heapq.nlargest(max_names, counts.items(), key=lambda kv: kv[1])
+        # wyświetlana nazwa: najczęstsza pisownia danego klucza
+        self.names = [max(spellings[norm].items(), key=lambda kv: kv[1])[0] for norm, _ in top]
+        self.counts = array("I", (count for _, count in top))
+
+        entries = []
+        for i, (norm, _) in enumerate(top):
+            entries.append((norm, i))
+            for pos, ch in enumerate(norm):
+                if ch == " ":
+                    entries.append((norm[pos + 1:], i))
+        entries.sort()
+        self.keys = [k for k, _ in entries]
+        self.ids = array("I", (i for _, i in entries))
+
+        # TOP-N dla "ciężkich" prefiksów (zakres > DIRECT_SCAN kluczy);
+        # id to miejsce w rankingu liczności, więc TOP-N = N najmniejszych id
+        self._tops = {}
+        if self.keys:
+            self._build_tops(0, len(self.keys), 0)
+
+    def _build_tops(self, lo, hi, depth):
+        """TOP id zakresu [lo, hi) kluczy o wspólnym prefiksie długości depth."""
+        if hi - lo <= DIRECT_SCAN:
+            return heapq.nsmallest(MAX_LIMIT, set(self.ids[lo:hi]))
+        keys = self.keys
+        candidates = set()
+        i = lo
+        while i < hi and len(keys[i]) == depth:  # klucz równy prefiksowi
+            candidates.add(self.ids[i])
+            i += 1
+        while i < hi:
+            j = bisect_right(keys, keys[i][:depth + 1] + "\uffff", i, hi)
+            candidates.update(self._build_tops(i, j, depth + 1))
+            i = j
+        top = heapq.nsmallest(MAX_LIMIT, candidates)
+        self._tops[keys[lo][:depth]] = array("I", top)
+        return top
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, text, limit=DEFAULT_LIMIT):
+        """[(imie_nazwisko, liczba rekordów)] dla nazwisk zaczynających się od text."""
+        prefix = normalize_name(text)
+        limit = max(1, min(limit, MAX_LIMIT))
+        if not prefix:
+            return []
+        top = self._tops.get(prefix)
+        if top is not None:
+            ids = top[:limit]
+        else:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_right(self.keys, prefix + "\uffff", lo)
+            ids = heapq.nsmallest(limit, set(self.ids[lo:hi]))
+        return [(self.names[i], self.counts[i]) for i in ids]
+
+
+def load_rows(conn):
+    cur = conn.execute(
+        """
+        SELECT imie_nazwisko_norm, imie_nazwisko, COUNT(*) AS liczba
+        FROM zgony
+        WHERE imie_nazwisko_norm IS NOT NULL
+          AND imie_nazwisko_norm <> ''
+        GROUP BY imie_nazwisko_norm, imie_nazwisko
+        """
+    )
+    for row in cur:
+        yield tuple(row.values()) if isinstance(row, dict) else row
+
+
+class AutocompleteService:
+    """
+    Trzyma bieżący NameIndex; connect() daje połączenie do sprawdzenia wersji
+    danych i przebudowy. Pierwsze wywołanie buduje indeks synchronicznie.
+    """
+
+    def __init__(self, connect, max_names=MAX_NAMES, check_seconds=CHECK_SECONDS):
+        self.connect = connect
+        self.max_names = max_names
+        self.check_seconds = check_seconds
+        self.index = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def _build(self, conn):
+        version = get_data_version(conn)
+        return NameIndex(load_rows(conn), version=version, max_names=self.max_names)
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                with self.connect() as conn:
+                    self.index = self._build(conn)
+            except Exception as e:
+                log.exception("Przebudowa indeksu podpowiedzi nieudana: %s: %s", type(e).__name__, e)
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name="autocomplete-rebuild", daemon=True).start()
+
+    def current(self):
+        if self.index is None:
+            with self._lock:
+                if self.index is None:
+                    with self.connect() as conn:
+                        self.index = self._build(conn)
+                    self._checked = time.monotonic()
+            return self.index
+
+        now = time.monotonic()
+        if now - self._checked >= self.check_seconds and not self._rebuilding:
+            with self._lock:
+                if now - self._checked >= self.check_seconds and not self._rebuilding:
+                    self._checked = now
+                    with self.connect() as conn:
+                        stale = get_data_version(conn) != self.index.version
+                    if stale:
+                        self._rebuilding = True
+                        self._rebuild_in_background()
+        return self.index
+
+    def lookup(self, text, limit=DEFAULT_LIMIT):
+        return self.current().lookup(text, limit)
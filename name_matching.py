@@ -0,0 +1,134 @@
+import re
+import unicodedata
+
+# ---------- Normalizacja imion i nazwisk ----------
+#
+# Klucze liczone przy imporcie (import_json_to_pg.py / backfill.py) i przy
+# wyszukiwaniu (main.build_filters_sql, tryb "fuzzy"):
+#   - imie_nazwisko_norm – tekst bez polskich znaków, małe litery,
+#   - imie_nazwisko_fon  – tablica kodów fonetycznych (po jednym na człon).
+
+# litery, których NFKD nie rozkłada na literę + znak diakrytyczny
+_EXTRA_UNACCENT = str.maketrans({
+    "ł": "l", "Ł": "L",
+    "ß": "ss",
+    "æ": "ae", "Æ": "AE",
+    "ø": "o", "Ø": "O",
+})
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Reguły polskiej pisowni stosowane przed kodowaniem:
+# "Woyciech" -> "wojciech", "Kayetan" -> "kajetan",
+# "Maryjanna", "Maryanna", "Marjanna" -> "marianna",
+# "Joseph" -> "josef", "Xawery" -> "ksawery" itd.
+_POLISH_RULES = [
+    (re.compile(r"(?<=[aeou])y"), "j"),
+    (re.compile(r"[iy]j(?=[aeiouy])"), "i"),
+    (re.compile(r"(?<=[^aeiouy])j(?=[aeiou])"), "i"),
+    (re.compile(r"y"), "i"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"th"), "t"),
+    (re.compile(r"qu"), "kw"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"v"), "w"),
+    (re.compile(r"ck"), "k"),
+]
+
+# Tabela kodów w stylu Daitcha–Mokotoffa, uproszczona pod polską pisownię
+# (bez rozgałęzień – każda grupa liter ma jeden kod; sz/cz/rz/ż/dz -> 4).
+_DM_CODES = [
+    ("szcz", "4"),
+    ("drz", "4"),
+    ("dz", "4"),
+    ("ds", "4"),
+    ("ts", "4"),
+    ("tz", "4"),
+    ("cz", "4"),
+    ("cs", "4"),
+    ("sz", "4"),
+    ("rz", "4"),
+    ("zs", "4"),
+    ("ch", "5"),
+    ("kh", "5"),
+    ("c", "4"),
+    ("s", "4"),
+    ("z", "4"),
+    ("k", "5"),
+    ("g", "5"),
+    ("q", "5"),
+    ("h", "5"),
+    ("d", "3"),
+    ("t", "3"),
+    ("l", "8"),
+    ("m", "6"),
+    ("n", "6"),
+    ("b", "7"),
+    ("p", "7"),
+    ("f", "7"),
+    ("w", "7"),
+    ("r", "9"),
+    ("j", "1"),
+]
+_DM_RE = re.compile("|".join(code for code, _ in _DM_CODES) + "|[aeiou]")
+_DM_MAP = dict(_DM_CODES)
+
+PHONETIC_LEN = 6
+
+
+def unaccent_pl(text: str) -> str:
+    """Usuwa polskie (i inne łacińskie) znaki diakrytyczne: "Łódź" -> "Lodz"."""
+    if not text:
+        return ""
+    text = text.translate(_EXTRA_UNACCENT)
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_name(text: str) -> str:
+    """
+    Klucz tekstowy: małe litery, bez diakrytyków, bez interpunkcji,
+    pojedyncze spacje. "Grzegorz (Jerzy) Dymitrzyk" -> "grzegorz jerzy dymitrzyk".
+    """
+    return _NON_ALNUM_RE.sub(" ", unaccent_pl(text).lower()).strip()
+
+
+def phonetic_pl(word: str) -> str:
+    """
+    Kod fonetyczny pojedynczego słowa (6 cyfr, jak w Daitchu–Mokotoffie).
+    Samogłoski kodowane są tylko na początku słowa (0), sąsiadujące
+    identyczne kody są sklejane, wynik dopełniany zerami.
+    """
+    word = normalize_name(word).replace(" ", "")
+    if not word:
+        return ""
+    for pattern, repl in _POLISH_RULES:
+        word = pattern.sub(repl, word)
+
+    code = []
+    last = None
+    for m in _DM_RE.finditer(word):
+        part = m.group(0)
+        if part in "aeiou":
+            if m.start() == 0:
+                code.append("0")
+            last = None
+            continue
+        digit = _DM_MAP[part]
+        if digit != last:
+            code.append(digit)
+        last = digit
+
+    return "".join(code)[:PHONETIC_LEN].ljust(PHONETIC_LEN, "0")
+
+
+def phonetic_codes(text: str) -> list:
+    """Posortowana lista unikalnych kodów fonetycznych członów imienia i nazwiska."""
+    return sorted(
+        {phonetic_pl(word) for word in normalize_name(text).split() if len(word) >= 2}
+    )
+
+
+def name_keys(text: str):
+    """Para (imie_nazwisko_norm, imie_nazwisko_fon) liczona przy imporcie."""
+    return normalize_name(text), phonetic_codes(text)
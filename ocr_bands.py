@@ -0,0 +1,220 @@
+"""
+OCR gęstych stron tabelarycznych w poziomych pasach.
+
+Strona z kilkudziesięcioma wierszami to długa odpowiedź modelu – wolna
+i częściej ucięta. BandedOCR:
+
+- row_bands – wiersze tabeli z profilu poziomego (udział ciemnych pikseli
+  w każdym wierszu pikseli); separatory to białe odstępy i linie tabeli,
+- split_points – cięcia w odstępach między wierszami, po ROWS_PER_STRIP
+  wierszy na pas (co najwyżej MAX_STRIPS pasów); każdy pas zachodzi na
+  sąsiednie o jeden wiersz (mediana odstępu wierszy), więc wiersz przy cięciu
+  jest w całości przynajmniej w jednym pasie,
+- pasy idą równolegle do opakowanego silnika (ocr_engines.OCREngine),
+- merge_strips – rekordy w kolejności pasów; na styku pasów rekord z
+  tym samym imieniem i nazwiskiem (albo uciętym prefiksem) i zgodną datą
+  jest jeden – zostaje pełniejszy.
+
+Strony z mniej niż 2 * ROWS_PER_STRIP wierszami idą w całości. Gdy któryś
+pas się nie powiedzie (błąd / brak rekordów), strona idzie w całości.
+
+Wymaga pakietu pillow (pip install pillow). app.py --pasy.
+"""
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from name_matching import normalize_name
+from ocr_engines import MISSING, OCREngine
+from ocr_events import stage
+from ocr_json import FAILED, OK, REPAIRED
+
+ROWS_PER_STRIP = int(os.getenv("OCR_PASY_WIERSZE", "15"))
+MAX_STRIPS = int(os.getenv("OCR_PASY_MAX", "6"))
+
+# piksel "ciemny" (skala szarości 0-255)
+INK_LEVEL = 128
+# wiersz pikseli z mniejszym udziałem tuszu to odstęp, z większym – linia tabeli
+GAP_INK = 0.01
+LINE_INK = 0.8
+MIN_ROW_PX = 8
+# ile rekordów z końca / początku pasów porównujemy na styku
+MERGE_WINDOW = 3
+
+_JSON_RANK = {None: 0, OK: 1, REPAIRED: 2, FAILED: 3}
+
+
+def row_bands(gray):
+    """[(góra, dół)] wierszy tekstu; gray – tablica HxW w skali szarości."""
+    ink = (gray < INK_LEVEL).mean(axis=1)
+    text = (ink > GAP_INK) & (ink < LINE_INK)
+    bands = []
+    start = None
+    for y, is_text in enumerate(text):
+        if is_text and start is None:
+            start = y
+        elif not is_text and start is not None:
+            if y - start >= MIN_ROW_PX:
+                bands.append((start, y))
+            start = None
+    if start is not None and len(text) - start >= MIN_ROW_PX:
+        bands.append((start, len(text)))
+    return bands
+
+
+def split_points(bands, height, rows_per_strip=ROWS_PER_STRIP, max_strips=MAX_STRIPS):
+    """[(góra, dół)] pasów z zakładką albo [] gdy strony nie warto dzielić."""
+    strips = min(max_strips, len(bands) // rows_per_strip)
+    if strips < 2:
+        return []
+    # zakładka = typowy odstęp między początkami wierszy, czyli jeden pełny wiersz
+    overlap = int(np.median(np.diff([t for t, _ in bands])))
+    per_strip = len(bands) / strips
+    cuts = [0]
+    for k in range(1, strips):
+        i = round(k * per_strip)
+        # środek odstępu między wierszem i-1 a i
+        cuts.append((bands[i - 1][1] + bands[i][0]) // 2)
+    cuts.append(height)
+    return [
+        (max(0, cuts[k] - overlap), min(height, cuts[k + 1] + overlap))
+        for k in range(strips)
+    ]
+
+
+def _filled(record):
+    return sum(1 for v in record.values() if v and v != MISSING)
+
+
+def _same_record(a, b):
+    name_a = normalize_name(a.get("imie_nazwisko") or "")
+    name_b = normalize_name(b.get("imie_nazwisko") or "")
+    if not name_a or not name_b:
+        return False
+    short, long = sorted((name_a, name_b), key=len)
+    # wiersz ucięty na krawędzi pasu: prefiks nazwiska
+    if not (short == long or (len(short) >= 4 and long.startswith(short))):
+        return False
+    date_a = (a.get("data_zgonu") or MISSING).strip().lower()
+    date_b = (b.get("data_zgonu") or MISSING).strip().lower()
+    return date_a == date_b or MISSING in (date_a, date_b)
+
+
+def merge_strips(strip_records):
+    """Rekordy pasów (w kolejności od góry) bez powtórzeń z zakładek."""
+    merged = []
+    for records in strip_records:
+        tail_start = max(0, len(merged) - MERGE_WINDOW)
+        for pos, record in enumerate(records):
+            if pos < MERGE_WINDOW:
+                match = next(
+                    (j for j in range(tail_start, len(merged)) if _same_record(merged[j], record)),
+                    None,
+                )
+                if match is not None:
+                    if _filled(record) > _filled(merged[match]):
+                        merged[match] = record
+                    continue
+            merged.append(record)
+    return merged
+
+
+def _merge_events(event, strip_events):
+    """Pasy szły równolegle: etapy to maksimum, próby i bajty – suma."""
+    event["pasy"] = len(strip_events)
+    event["proby"] = event.get("proby", 0) + sum(e.get("proby", 0) for e in strip_events)
+    event["bajty_obrazu"] = sum(e.get("bajty_obrazu") or 0 for e in strip_events)
+    event["bajty_odpowiedzi"] = sum(e.get("bajty_odpowiedzi") or 0 for e in strip_events)
+    for e in strip_events:
+        if e.get("klucz"):
+            event["klucz"] = e["klucz"]
+        if _JSON_RANK.get(e.get("json"), 0) > _JSON_RANK.get(event.get("json"), 0):
+            event["json"] = e["json"]
+        for key in ("silnik", "do_ponowienia"):
+            if e.get(key):
+                event[key] = e[key]
+    stages = event.setdefault("etapy_ms", {})
+    for name in {n for e in strip_events for n in e.get("etapy_ms", {})}:
+        longest = max(e.get("etapy_ms", {}).get(name, 0.0) for e in strip_events)
+        stages[name] = round(stages.get(name, 0.0) + longest, 1)
+
+
+class BandedOCR(OCREngine):
+    """Opakowanie silnika: gęste strony w pasach, pozostałe bez zmian."""
+
+    def __init__(self, engine, rows_per_strip=ROWS_PER_STRIP, max_strips=MAX_STRIPS):
+        try:
+            from PIL import Image
+        except ImportError as e:
+            raise RuntimeError("Tryb pasów wymaga pakietu pillow (pip install pillow)") from e
+        self._image = Image
+        self.engine = engine
+        self.rows_per_strip = rows_per_strip
+        self.max_strips = max_strips
+        self.stats = {"strony_w_pasach": 0, "pasy": 0, "cale_strony": 0}
+
+    @property
+    def name(self):
+        return self.engine.name
+
+    def process_image(self, image_path, max_retries=3, event=None, raw_path=None, model=None):
+        with self._image.open(image_path) as img:
+            img = img.convert("RGB")
+        with stage(event, "pasy"):
+            strips = split_points(
+                row_bands(np.asarray(img.convert("L"))), img.height,
+                self.rows_per_strip, self.max_strips,
+            )
+        if strips:
+            data = self._process_strips(img, strips, max_retries, event, raw_path, model)
+            if data is not None:
+                return data
+        self.stats["cale_strony"] += 1
+        return self.engine.process_image(
+            image_path, max_retries=max_retries, event=event, raw_path=raw_path, model=model
+        )
+
+    def _process_strips(self, img, strips, max_retries, event, raw_path, model):
+        strip_events = [{"etapy_ms": {}} for _ in strips]
+        with tempfile.TemporaryDirectory(prefix="pasy_") as tmp:
+            paths = []
+            for k, (top, bottom) in enumerate(strips):
+                path = Path(tmp) / f"pas_{k}.jpg"
+                img.crop((0, top, img.width, bottom)).save(path, quality=90)
+                paths.append(path)
+
+            def run(k):
+                return self.engine.process_image(
+                    str(paths[k]), max_retries=max_retries, event=strip_events[k],
+                    raw_path=Path(tmp) / f"pas_{k}.txt", model=model,
+                )
+
+            with ThreadPoolExecutor(max_workers=len(strips)) as pool:
+                results = list(pool.map(run, range(len(strips))))
+
+        if event is not None:
+            _merge_events(event, strip_events)
+        # pas ma co najmniej rows_per_strip wierszy tabeli – pusty wynik to błąd odczytu
+        if any("error" in r or not isinstance(r.get("rekordy"), list) or not r["rekordy"]
+               for r in results):
+            print("   Pas nieudany – strona w całości")
+            return None
+
+        data = {"rekordy": merge_strips([r["rekordy"] for r in results]), "pasy": len(strips)}
+        for r in results:
+            for key in ("naprawiono_json", "silnik_ocr", "do_ponowienia"):
+                if r.get(key):
+                    data[key] = r[key]
+        if raw_path is not None:
+            # ocr_json.py napraw czyta odpowiedz.txt – po scaleniu to już poprawny JSON
+            with open(raw_path, "w", encoding="utf-8") as f:
+                json.dump({"rekordy": data["rekordy"]}, f, ensure_ascii=False)
+        self.stats["strony_w_pasach"] += 1
+        self.stats["pasy"] += len(strips)
+        print(f"   {len(strips)} pasów, rekordów po scaleniu: {len(data['rekordy'])} "
+              f"(przed: {sum(len(r['rekordy']) for r in results)})")
+        return data
@@ -0,0 +1,129 @@
+"""
+Kaskada modeli OCR: strona trafia najpierw do najtańszego modelu, a wynik
+jest sprawdzany (validate_page). Do mocniejszego modelu idą tylko strony,
+które nie przeszły walidacji – czyste, drukowane księgi kończą na pierwszym
+poziomie, gęste łacińskie rękopisy eskalują.
+
+Walidacja strony:
+  - liczba rekordów w przedziale [min_rekordy, max_rekordy],
+  - udział rekordów, w których wymagane pola (REQUIRED_FIELDS) to
+    "brak informacji", nie większy niż max_brak,
+  - udział rekordów z datą zgonu rozpoznaną przez polish_dates
+    (co najmniej rok) nie mniejszy niż min_daty.
+
+Poziomy: zmienna OCR_MODELE (lista po przecinku, od najtańszego) albo
+app.py --modele; progi: app.py --min-rekordy / --max-rekordy / --max-brak /
+--min-daty. Model, poziom i powody eskalacji trafiają do zdarzeń OCR
+(ocr_events.py) i do data.json (model_ocr).
+"""
+import os
+from pathlib import Path
+
+from polish_dates import parse_death_date
+
+MODELS = [
+    m.strip()
+    for m in os.getenv("OCR_MODELE", "gemini-2.5-flash-lite,gemini-2.5-flash").split(",")
+    if m.strip()
+]
+
+THRESHOLDS = {
+    "min_rekordy": 1,
+    "max_rekordy": 60,
+    "max_brak": 0.3,
+    "min_daty": 0.6,
+}
+
+REQUIRED_FIELDS = ("imie_nazwisko", "data_zgonu")
+MISSING = "brak informacji"
+
+
+def _missing(value) -> bool:
+    return not isinstance(value, str) or not value.strip() or value.strip().lower() == MISSING
+
+
+def validate_page(data, thresholds=None):
+    """Lista problemów (pusta = strona przyjęta)."""
+    t = {**THRESHOLDS, **(thresholds or {})}
+    if "error" in data:
+        return [f"błąd: {str(data['error'])[:100]}"]
+    records = data.get("rekordy")
+    if not isinstance(records, list):
+        return ["brak listy rekordów"]
+
+    problems = []
+    n = len(records)
+    if n < t["min_rekordy"]:
+        problems.append(f"rekordów {n} < {t['min_rekordy']}")
+    elif n > t["max_rekordy"]:
+        problems.append(f"rekordów {n} > {t['max_rekordy']}")
+    if not n:
+        return problems
+
+    missing = sum(any(_missing(r.get(f)) for f in REQUIRED_FIELDS) for r in records)
+    if missing / n > t["max_brak"]:
+        problems.append(f"braki wymaganych pól: {missing}/{n}")
+
+    dated = sum(
+        not _missing(r.get("data_zgonu")) and parse_death_date(r["data_zgonu"]).year is not None
+        for r in records
+    )
+    if dated / n < t["min_daty"]:
+        problems.append(f"rozpoznane daty: {dated}/{n}")
+    return problems
+
+
+def process_with_cascade(processor, image_path, models=None, thresholds=None,
+                         event=None, raw_path=None, max_retries=3):
+    """
+    Przetwarza stronę kolejnymi modelami aż do wyniku bez problemów.
+    Gdy żaden poziom nie przejdzie walidacji, zwracany jest wynik najwyższego
+    poziomu, który nie skończył się błędem (a gdy takiego nie ma – ostatni).
+    """
+    models = models or MODELS
+    if event is None:
+        event = {}
+    attempts = []
+    chosen = None
+    for tier, model in enumerate(models):
+        tier_raw = None if raw_path is None else Path(f"{raw_path}.{tier}")
+        data = processor.process_image(
+            image_path, max_retries=max_retries, event=event, raw_path=tier_raw, model=model
+        )
+        problems = validate_page(data, thresholds)
+        attempts.append({
+            "model": model, "poziom": tier, "problemy": problems,
+            "json": event.pop("json", None), "data": data, "raw": tier_raw,
+        })
+        if problems:
+            print(f"   {model}: {'; '.join(problems)}"
+                  + (" – eskaluję" if tier + 1 < len(models) else ""))
+        if "error" not in data or chosen is None or "error" in chosen["data"]:
+            chosen = attempts[-1]
+        # wynik silnika lokalnego (ocr_engines.FallbackOCR) – wyższe poziomy
+        # też poszłyby lokalnie, strona i tak czeka na ponowienie przez API
+        if not problems or data.get("do_ponowienia"):
+            break
+
+    # surowa odpowiedź wybranego poziomu zostaje jako RAW_FILE_NAME
+    for a in attempts:
+        if a["raw"] is None or not a["raw"].exists():
+            continue
+        if a is chosen:
+            a["raw"].replace(raw_path)
+        else:
+            a["raw"].unlink()
+
+    data = chosen["data"]
+    # strona z lokalnego OCR (ocr_engines.FallbackOCR): zamiast modelu nazwa silnika
+    model = data.get("silnik_ocr", chosen["model"])
+    event["model"] = model
+    event["poziom"] = chosen["poziom"]
+    if chosen["json"] is not None:
+        event["json"] = chosen["json"]
+    if len(attempts) > 1:
+        event["kaskada"] = [
+            {"model": a["model"], "problemy": a["problemy"]} for a in attempts
+        ]
+    data["model_ocr"] = model
+    return data
@@ -0,0 +1,187 @@
+"""
+Silniki OCR za wspólnym interfejsem process_image(...) -> {"rekordy": [...]}.
+
+- GeminiOCRProcessor (app.py) – model przez API, z rotacją kluczy,
+- TesseractEngine – lokalny OCR na CPU (pakiety pytesseract i pillow oraz
+  program tesseract z danymi języka, np. apt install tesseract-ocr-pol)
+  i regułowy ekstraktor pól dla tabelarycznych ksiąg USC (extract_records),
+- FallbackOCR – gdy wszystkie klucze API mają wyczerpane quota, zamiast
+  czekać strony idą do silnika lokalnego. Takie strony mają w data.json
+  "do_ponowienia": true i silnik_ocr; nie trafiają do bazy
+  (app.py --do-bazy), a python app.py --ponow przetwarza je ponownie przez API.
+"""
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from ocr_events import stage
+from polish_dates import parse_age, parse_death_date
+
+TESSERACT_LANG = os.getenv("OCR_TESSERACT_LANG", "pol")
+# co ile sekund po wyczerpaniu quota próbujemy znowu API
+API_RETRY_SECONDS = float(os.getenv("OCR_API_RETRY", "300"))
+
+MISSING = "brak informacji"
+
+
+class QuotaExhausted(Exception):
+    """Wszystkie klucze API mają wyczerpane quota (GeminiOCRProcessor bez czekania)."""
+
+
+class OCREngine(ABC):
+    """Interfejs silnika; name trafia do data.json (silnik_ocr) i zdarzeń OCR."""
+
+    name = "?"
+
+    @abstractmethod
+    def process_image(self, image_path, max_retries=3, event=None, raw_path=None, model=None):
+        """Słownik jak data.json ("rekordy" albo "error"); raw_path – surowa odpowiedź."""
+
+
+# ---------- Tesseract + reguły ----------
+
+_SPLIT_RE = re.compile(r"\s*\|\s*|\s{2,}|\t")
+_NAME_RE = re.compile(r"[A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+(?:[- ][A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+)+")
+_AGE_RE = re.compile(
+    r"\b\d{1,3}\s*(?:lat|lata|rok|roku|mies|tyg|dni|dzie|godz|jahr|annor|mens|dies)\w*\.?",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"^\d{1,3}$")
+
+
+def _record(name, age=MISSING, date=MISSING, rest=()):
+    return {
+        "imie_nazwisko": name,
+        "wiek": age,
+        "miejsce urodzenia": MISSING,
+        "data_zgonu": date,
+        "przyczyna_zgonu": MISSING,
+        "inne_wazne_informacje": " | ".join(rest) if rest else MISSING,
+    }
+
+
+def extract_records(text):
+    """
+    Reguły dla tabelarycznych ksiąg (wiersz = osoba): wiersz z datą
+    rozpoznaną przez polish_dates i imieniem z nazwiskiem (co najmniej dwa
+    słowa z wielkiej litery) to rekord; wiek – komórka z "lat", "mies."
+    itp. albo sama liczba po nazwisku. Pozostałe komórki idą do
+    inne_wazne_informacje.
+    """
+    records = []
+    for line in (text or "").splitlines():
+        cells = [c.strip() for c in _SPLIT_RE.split(line) if c and c.strip()]
+        if not cells:
+            continue
+        name = date = age = None
+        rest = []
+        for cell in cells:
+            if date is None and parse_death_date(cell).year is not None:
+                date = cell
+            elif age is None and (_AGE_RE.search(cell) and parse_age(cell)):
+                age = cell
+            elif age is None and name is not None and _NUMBER_RE.match(cell) and int(cell) <= 120:
+                # sama liczba po nazwisku; przed nazwiskiem to numer aktu
+                age = f"{cell} lat"
+            elif name is None and _NAME_RE.search(cell):
+                name = _NAME_RE.search(cell).group(0)
+                leftover = cell.replace(name, "").strip(" ,;")
+                if leftover:
+                    rest.append(leftover)
+            elif not _NUMBER_RE.match(cell):  # numery porządkowe aktów pomijamy
+                rest.append(cell)
+        if name and date:
+            records.append(_record(name, age or MISSING, date, rest))
+    return records
+
+
+class TesseractEngine(OCREngine):
+    name = "tesseract"
+
+    def __init__(self, lang=TESSERACT_LANG):
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError as e:
+            raise RuntimeError(
+                "Lokalny OCR wymaga pakietów pytesseract i pillow "
+                "(pip install pytesseract pillow) oraz programu tesseract"
+            ) from e
+        self._tesseract = pytesseract
+        self._image = Image
+        self.lang = lang
+
+    def process_image(self, image_path, max_retries=3, event=None, raw_path=None, model=None):
+        with stage(event, "ocr_lokalny"):
+            with self._image.open(image_path) as img:
+                # --psm 6: jeden blok tekstu – wiersze tabeli zostają wierszami
+                text = self._tesseract.image_to_string(img, lang=self.lang, config="--psm 6")
+        # raw_path pomijamy – to nie jest odpowiedź JSON (ocr_json.py napraw)
+        if event is not None:
+            event["bajty_odpowiedzi"] = len(text.encode("utf-8"))
+        return {"rekordy": extract_records(text)}
+
+
+# ---------- API z zapasowym silnikiem lokalnym ----------
+
+
+class FallbackOCR(OCREngine):
+    """
+    primary: GeminiOCRProcessor(wait_on_exhausted=False), fallback: np. TesseractEngine.
+    Po QuotaExhausted przez API_RETRY_SECONDS wszystkie strony idą do fallback,
+    potem klucze dostają kolejną szansę. BandedOCR wywołuje process_image
+    z kilku wątków – przerwa w API i statystyki są pod blokadą.
+    """
+
+    def __init__(self, primary, fallback, retry_seconds=API_RETRY_SECONDS):
+        self.primary = primary
+        self.fallback = fallback
+        self.retry_seconds = retry_seconds
+        self._api_retry_at = 0.0
+        self.stats = {"api": 0, "lokalnie": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return "api"
+
+    def _api_available(self):
+        if not self.primary.api_keys:
+            return False
+        with self._lock:
+            if time.monotonic() < self._api_retry_at:
+                return False
+            if not self._api_retry_at:
+                return True
+            # koniec przerwy – klucze zeruje tylko pierwszy wątek
+            self._api_retry_at = 0.0
+            self.primary.reset_key_errors()
+        print("Ponowna próba API po przerwie na lokalnym OCR")
+        return True
+
+    def process_image(self, image_path, max_retries=3, event=None, raw_path=None, model=None):
+        if self._api_available():
+            try:
+                data = self.primary.process_image(
+                    image_path, max_retries=max_retries, event=event, raw_path=raw_path, model=model
+                )
+                with self._lock:
+                    self.stats["api"] += 1
+                return data
+            except QuotaExhausted:
+                with self._lock:
+                    self._api_retry_at = time.monotonic() + self.retry_seconds
+                print(f"Quota wyczerpane na wszystkich kluczach – lokalny OCR ({self.fallback.name}) "
+                      f"przez {self.retry_seconds:.0f}s")
+
+        data = self.fallback.process_image(image_path, event=event, raw_path=raw_path)
+        with self._lock:
+            self.stats["lokalnie"] += 1
+        data["silnik_ocr"] = self.fallback.name
+        data["do_ponowienia"] = True
+        if event is not None:
+            event["silnik"] = self.fallback.name
+            event["do_ponowienia"] = True
+        return data
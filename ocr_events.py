@@ -0,0 +1,220 @@
+"""
+Zdarzenia przetwarzania OCR (NDJSON, jedna linia na obraz) i raport z nich.
+
+Każde zdarzenie zawiera m.in.:
+  ts, obraz, parafia, status, klucz (ostatnie 8 znaków), proby,
+  bajty_obrazu, bajty_odpowiedzi, rekordy, etapy_ms {odczyt_pliku, api,
+  czyszczenie_json, zapis}, calkowity_ms, blad,
+  json (ok / naprawiony / blad – wynik ocr_json.parse_response),
+  model, poziom (kaskada modeli, ocr_cascade.py), kaskada (próby przy eskalacji),
+  silnik, do_ponowienia (lokalny OCR przy wyczerpanym quota, ocr_engines.py),
+  duplikat_strony (status "duplikat" – skan bez OCR, scan_dedupe.py),
+  pasy (strona OCR-owana w pasach, ocr_bands.py; etapy to najdłuższy pas).
+
+Użycie:
+    python ocr_events.py raport json_zgony/zdarzenia_ocr.ndjson
+    python ocr_events.py raport json_zgony/zdarzenia_ocr.ndjson --okno 15
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+EVENTS_FILE_NAME = "zdarzenia_ocr.ndjson"
+PERCENTILES = (50, 90, 99)
+
+
+class EventLog:
+    """Dopisywanie zdarzeń do pliku NDJSON (bezpieczne dla wielu wątków)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, event: dict):
+        event.setdefault("ts", datetime.now().isoformat(timespec="milliseconds"))
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def new_event(image_path, parafia=None) -> dict:
+    return {
+        "obraz": str(image_path),
+        "parafia": parafia,
+        "status": None,
+        "klucz": None,
+        "proby": 0,
+        "bajty_obrazu": None,
+        "bajty_odpowiedzi": None,
+        "rekordy": None,
+        "etapy_ms": {},
+        "_start": time.perf_counter(),
+    }
+
+
+@contextmanager
+def stage(event, name):
+    """Mierzy etap i dodaje jego czas (ms) do event["etapy_ms"][name]."""
+    if event is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        stages = event.setdefault("etapy_ms", {})
+        stages[name] = round(stages.get(name, 0.0) + elapsed, 1)
+
+
+def finish_event(event) -> dict:
+    start = event.pop("_start", None)
+    if start is not None:
+        event["calkowity_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return event
+
+
+# ---------- Raport ----------
+
+
+def read_events(path):
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return round(values[lo] + (values[hi] - values[lo]) * (k - lo), 1)
+
+
+def _pcts(values):
+    return {f"p{p}": percentile(values, p) for p in PERCENTILES}
+
+
+def build_report(events, window_minutes=10):
+    events = list(events)
+    if not events:
+        return {"zdarzenia": 0}
+
+    totals = [e["calkowity_ms"] for e in events if e.get("calkowity_ms") is not None]
+    by_stage = defaultdict(list)
+    for e in events:
+        for name, ms in (e.get("etapy_ms") or {}).items():
+            by_stage[name].append(ms)
+
+    # przepustowość w oknach czasowych
+    windows = defaultdict(lambda: {"obrazy": 0, "rekordy": 0, "czasy": []})
+    for e in events:
+        ts = datetime.fromisoformat(e["ts"]).timestamp()
+        bucket = datetime.fromtimestamp(ts - ts % (window_minutes * 60))
+        w = windows[bucket]
+        w["obrazy"] += 1
+        w["rekordy"] += e.get("rekordy") or 0
+        if e.get("calkowity_ms") is not None:
+            w["czasy"].append(e["calkowity_ms"])
+
+    keys = defaultdict(lambda: {"obrazy": 0, "proby": 0, "bledy": 0})
+    for e in events:
+        k = keys[e.get("klucz") or "brak"]
+        k["obrazy"] += 1
+        k["proby"] += e.get("proby") or 0
+        k["bledy"] += e.get("status") not in ("ok", "pominiety", "lokalny_ocr", "duplikat")
+
+    json_results = Counter(e["json"] for e in events if e.get("json"))
+    parsed = sum(json_results.values())
+
+    return {
+        "zdarzenia": len(events),
+        "statusy": dict(Counter(e.get("status") for e in events)),
+        "json": dict(json_results),
+        "modele": dict(Counter(e["model"] for e in events if e.get("model"))),
+        "eskalacje": sum(1 for e in events if e.get("kaskada")),
+        "do_ponowienia": sum(1 for e in events if e.get("do_ponowienia")),
+        # strony, które bez naprawy wymagałyby ponownego OCR
+        "json_odzyskane_proc": (
+            round(json_results["naprawiony"] / (parsed - json_results["ok"]) * 100, 1)
+            if parsed > json_results["ok"] else None
+        ),
+        "rekordy": sum(e.get("rekordy") or 0 for e in events),
+        "proby": dict(sorted(Counter(e.get("proby") or 0 for e in events).items())),
+        "calkowity_ms": _pcts(totals),
+        "etapy_ms": {name: _pcts(v) for name, v in sorted(by_stage.items())},
+        "bajty_odpowiedzi": _pcts(
+            [e["bajty_odpowiedzi"] for e in events if e.get("bajty_odpowiedzi")]
+        ),
+        "klucze": dict(keys),
+        "okna": [
+            {
+                "od": bucket.isoformat(timespec="minutes"),
+                "obrazy": w["obrazy"],
+                "obrazy_na_minute": round(w["obrazy"] / window_minutes, 2),
+                "rekordy": w["rekordy"],
+                **_pcts(w["czasy"]),
+            }
+            for bucket, w in sorted(windows.items())
+        ],
+    }
+
+
+def print_report(report):
+    if not report.get("zdarzenia"):
+        print("Brak zdarzeń.")
+        return
+    print(f"Zdarzenia: {report['zdarzenia']}  rekordy: {report['rekordy']}")
+    print(f"Statusy: {report['statusy']}")
+    if report.get("json"):
+        print(f"Parsowanie JSON: {report['json']}  "
+              f"odzyskane bez ponownego OCR: {report['json_odzyskane_proc']}%")
+    if report.get("modele"):
+        print(f"Modele (strony): {report['modele']}  eskalowane strony: {report['eskalacje']}")
+    if report.get("do_ponowienia"):
+        print(f"Strony z lokalnego OCR (do ponowienia przez API): {report['do_ponowienia']}")
+    print(f"Liczba prób na obraz: {report['proby']}")
+    print(f"Czas całkowity [ms]: {report['calkowity_ms']}")
+    print("Etapy [ms]:")
+    for name, p in report["etapy_ms"].items():
+        print(f"   {name:18s} {p}")
+    print(f"Bajty odpowiedzi: {report['bajty_odpowiedzi']}")
+    print("Klucze:")
+    for key, k in report["klucze"].items():
+        print(f"   {key}: {k['obrazy']} obrazów, {k['proby']} prób, {k['bledy']} błędów")
+    print("Przepustowość w czasie:")
+    for w in report["okna"]:
+        print(
+            f"   {w['od']}  {w['obrazy']:5d} obr. ({w['obrazy_na_minute']}/min)  "
+            f"rekordy {w['rekordy']:6d}  p50 {w['p50']} ms  p90 {w['p90']} ms  p99 {w['p99']} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raport ze zdarzeń OCR (NDJSON)")
+    sub = parser.add_subparsers(dest="co", required=True)
+    rep = sub.add_parser("raport")
+    rep.add_argument("plik", nargs="?", default=f"json_zgony/{EVENTS_FILE_NAME}")
+    rep.add_argument("--okno", type=int, default=10, help="szerokość okna w minutach")
+    rep.add_argument("--json", action="store_true", help="wypisz raport jako JSON")
+    args = parser.parse_args()
+
+    report = build_report(read_events(args.plik), window_minutes=args.okno)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Odpowiedź modelu OCR -> {"rekordy": [...]}.
+
+- RESPONSE_SCHEMA – schemat przekazywany jako response_schema (app.py),
+  więc model zwraca JSON o tej strukturze zamiast polegać na prompcie,
+- parse_response – parsowanie z naprawą typowych usterek: otoczka ```json,
+  tekst przed/po JSON-ie, przecinki przed ] i }, odpowiedź ucięta w połowie
+  (zostają kompletne rekordy, nawiasy są domykane),
+- pełne surowe odpowiedzi zapisuje app.py (RAW_FILE_NAME obok data.json),
+  a polecenie "napraw" parsuje je ponownie offline, bez wywołań API.
+
+Użycie:
+    python ocr_json.py napraw json_zgony            # tylko raport
+    python ocr_json.py napraw json_zgony --zapisz   # nadpisz data.json odzyskanych stron
+"""
+import argparse
+import json
+from pathlib import Path
+
+RAW_FILE_NAME = "odpowiedz.txt"
+
+RECORD_FIELDS = [
+    "imie_nazwisko",
+    "wiek",
+    "miejsce urodzenia",
+    "data_zgonu",
+    "przyczyna_zgonu",
+    "inne_wazne_informacje",
+]
+
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "rekordy": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {field: {"type": "STRING"} for field in RECORD_FIELDS},
+                "required": RECORD_FIELDS,
+                "propertyOrdering": RECORD_FIELDS,
+            },
+        }
+    },
+    "required": ["rekordy"],
+}
+
+# wynik parsowania
+OK = "ok"
+REPAIRED = "naprawiony"
+FAILED = "blad"
+
+
+def _remove_trailing_commas(text):
+    """Usuwa przecinki przed } i ] (poza napisami)."""
+    out = []
+    in_string = escape = False
+    pending = None  # indeks w out przecinka, po którym były tylko białe znaki
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            out.append(ch)
+            continue
+        if ch in "}]" and pending is not None:
+            out[pending] = ""
+        if ch == ",":
+            pending = len(out)
+        elif not ch.isspace():
+            pending = None
+        if ch == '"':
+            in_string = True
+        out.append(ch)
+    return "".join(out)
+
+
+def _strip_fences(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+        if text.startswith("json"):
+            text = text[4:]
+        text = text.rstrip()
+        if text.endswith("```"):
+            text = text[:-3]
+    return text.strip()
+
+
+def _close_truncated(text):
+    """
+    Ucięty JSON: obcina do ostatniego kompletnego elementu tablicy
+    i domyka otwarte nawiasy. None, gdy nie ma czego ratować.
+    """
+    stack = []
+    in_string = escape = False
+    cut = None  # (pozycja, stos) po ostatnim zamkniętym elemencie tablicy
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                return text[: i + 1]  # kompletny JSON, dalej śmieci
+            if stack[-1] == "[":
+                cut = (i + 1, list(stack))
+    if cut is None:
+        return None
+    pos, open_brackets = cut
+    closing = "".join("]" if b == "[" else "}" for b in reversed(open_brackets))
+    return text[:pos] + closing
+
+
+def _normalize(data):
+    if isinstance(data, list):
+        data = {"rekordy": data}
+    if not isinstance(data, dict) or not isinstance(data.get("rekordy"), list):
+        raise ValueError("brak listy 'rekordy'")
+    data["rekordy"] = [r for r in data["rekordy"] if isinstance(r, dict)]
+    return data
+
+
+def parse_response(text):
+    """
+    (dane, wynik, błąd): wynik to OK, REPAIRED albo FAILED (dane = None).
+    """
+    text = _strip_fences(text or "")
+    try:
+        return _normalize(json.loads(text)), OK, None
+    except (json.JSONDecodeError, ValueError) as e:
+        first_error = e
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return None, FAILED, f"Błąd parsowania JSON: {first_error}"
+    candidate = _remove_trailing_commas(text[start:])
+
+    for attempt in (candidate, _close_truncated(candidate)):
+        if not attempt:
+            continue
+        try:
+            return _normalize(json.loads(_remove_trailing_commas(attempt))), REPAIRED, None
+        except (json.JSONDecodeError, ValueError):
+            continue
+    return None, FAILED, f"Błąd parsowania JSON: {first_error}"
+
+
+# ---------- Ponowne parsowanie offline ----------
+
+
+def reparse_dir(root, save=False):
+    """Przechodzi strony z RAW_FILE_NAME; zwraca liczniki wyników."""
+    counts = {OK: 0, REPAIRED: 0, FAILED: 0, "odzyskane": 0, "nadal_bledne": 0}
+    for raw_path in sorted(Path(root).rglob(RAW_FILE_NAME)):
+        page_dir = raw_path.parent
+        data_path = page_dir / "data.json"
+        was_failed = False
+        if data_path.exists():
+            try:
+                was_failed = "error" in json.loads(data_path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                was_failed = True
+
+        data, result, error = parse_response(raw_path.read_text(encoding="utf-8"))
+        counts[result] += 1
+        if not was_failed:
+            continue
+        if data is None:
+            counts["nadal_bledne"] += 1
+            print(f"   nadal błędna: {page_dir} ({error})")
+            continue
+        counts["odzyskane"] += 1
+        print(f"   odzyskana: {page_dir} ({len(data['rekordy'])} rekordów)")
+        if save:
+            if result == REPAIRED:
+                data["naprawiono_json"] = True
+            data_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parsowanie zapisanych odpowiedzi OCR")
+    sub = parser.add_subparsers(dest="co", required=True)
+    fix = sub.add_parser("napraw", help="ponowne parsowanie odpowiedzi bez wywołań API")
+    fix.add_argument("katalog", nargs="?", default="json_zgony")
+    fix.add_argument("--zapisz", action="store_true", help="nadpisz data.json odzyskanych stron")
+    args = parser.parse_args()
+
+    counts = reparse_dir(args.katalog, save=args.zapisz)
+    total = counts[OK] + counts[REPAIRED] + counts[FAILED]
+    print(f"Odpowiedzi: {total}  poprawne: {counts[OK]}  naprawione: {counts[REPAIRED]}  "
+          f"nie do naprawienia: {counts[FAILED]}")
+    failed_before = counts["odzyskane"] + counts["nadal_bledne"]
+    if failed_before:
+        rate = counts["odzyskane"] / failed_before * 100
+        print(f"Strony z błędem: {failed_before}, odzyskane bez ponownego OCR: "
+              f"{counts['odzyskane']} ({rate:.0f}%)")
+    if counts["odzyskane"] and not args.zapisz:
+        print("Uruchom z --zapisz, żeby nadpisać data.json odzyskanych stron.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Gazeter parafii: tabela parafie (migrations/005_parafie.sql) z kluczem
+znormalizowanej nazwy i położeniem (point + indeks GiST).
+
+Użycie:
+    python parishes.py dodaj "Parafia rzymskokatolicka w Jeżewie" 53.5102519 18.494549
+    python parishes.py brakujace     # parafie z tabeli zgony bez współrzędnych
+"""
+import argparse
+from collections import defaultdict
+
+import psycopg
+from psycopg.rows import dict_row
+
+from data_version import VersionedCache, bump_data_version
+from name_matching import normalize_name
+
+_counts_cache = VersionedCache()
+
+
+def parish_key(name) -> str:
+    """Klucz parafii: jak name_matching.normalize_name (wielkość liter, diakrytyki)."""
+    return normalize_name(name or "")
+
+
+def parish_counts(conn):
+    """
+    {klucz: (liczba aktów, [nazwy z tabeli zgony])} – liczone raz na wersję danych.
+    Różne zapisy tej samej parafii sumują się pod jednym kluczem.
+    """
+
+    def compute():
+        rows = conn.execute(
+            """
+            SELECT parafia, COUNT(*) AS count
+            FROM zgony
+            WHERE parafia IS NOT NULL
+              AND TRIM(parafia) <> ''
+            GROUP BY parafia
+            """
+        ).fetchall()
+        counts = defaultdict(int)
+        names = defaultdict(list)
+        for r in rows:
+            key = parish_key(r["parafia"])
+            counts[key] += r["count"]
+            names[key].append(r["parafia"])
+        return {key: (counts[key], names[key]) for key in counts}
+
+    return _counts_cache.get_or_compute(conn, ("parish_counts",), compute)
+
+
+def find_parishes(conn, bbox=None):
+    """
+    Parafie z gazetera (opcjonalnie tylko w prostokącie
+    bbox = (min_lng, min_lat, max_lng, max_lat)), które mają akty w bazie.
+    """
+    sql = """
+        SELECT klucz, nazwa, polozenie[1] AS lat, polozenie[0] AS lng
+        FROM parafie
+    """
+    params = []
+    if bbox is not None:
+        sql += " WHERE polozenie <@ box(point(%s, %s), point(%s, %s))"
+        params.extend(bbox)
+    sql += " ORDER BY nazwa"
+
+    counts = parish_counts(conn)
+    stats = []
+    for r in conn.execute(sql, params).fetchall():
+        count, names = counts.get(r["klucz"], (0, []))
+        if not count:
+            continue
+        stats.append(
+            {
+                "parafia": names[0] if len(names) == 1 else r["nazwa"],
+                "count": count,
+                "lat": r["lat"],
+                "lng": r["lng"],
+            }
+        )
+    return stats
+
+
+def parse_bbox(value):
+    """"min_lng,min_lat,max_lng,max_lat" -> krotka floatów albo None."""
+    try:
+        parts = [float(v) for v in (value or "").split(",")]
+    except ValueError:
+        return None
+    if len(parts) != 4:
+        return None
+    min_lng, min_lat, max_lng, max_lat = parts
+    return (
+        min(min_lng, max_lng),
+        min(min_lat, max_lat),
+        max(min_lng, max_lng),
+        max(min_lat, max_lat),
+    )
+
+
+def add_parish(conn, name, lat, lng):
+    conn.execute(
+        """
+        INSERT INTO parafie (klucz, nazwa, polozenie)
+        VALUES (%s, %s, point(%s, %s))
+        ON CONFLICT (klucz) DO UPDATE
+        SET nazwa = EXCLUDED.nazwa,
+            polozenie = EXCLUDED.polozenie
+        """,
+        (parish_key(name), name, lng, lat),
+    )
+    # nowe położenie -> nowe klastry mapy (map_clusters.py)
+    bump_data_version(conn)
+    conn.commit()
+
+
+def missing_parishes(conn):
+    known = {r["klucz"] for r in conn.execute("SELECT klucz FROM parafie").fetchall()}
+    return sorted(
+        (names[0], count)
+        for key, (count, names) in parish_counts(conn).items()
+        if key not in known
+    )
+
+
+def main():
+    from backfill import get_dsn
+
+    parser = argparse.ArgumentParser(description="Gazeter parafii")
+    sub = parser.add_subparsers(dest="co", required=True)
+    add = sub.add_parser("dodaj", help="dodaj / popraw parafię")
+    add.add_argument("nazwa")
+    add.add_argument("lat", type=float)
+    add.add_argument("lng", type=float)
+    sub.add_parser("brakujace", help="parafie z aktami, ale bez współrzędnych")
+    args = parser.parse_args()
+
+    with psycopg.connect(get_dsn(), row_factory=dict_row) as conn:
+        if args.co == "dodaj":
+            add_parish(conn, args.nazwa, args.lat, args.lng)
+            print(f"Zapisano: {args.nazwa} ({parish_key(args.nazwa)})")
+        else:
+            missing = missing_parishes(conn)
+            for name, count in missing:
+                print(f"{count:8d}  {name}")
+            if not missing:
+                print("Wszystkie parafie mają współrzędne.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Partycje tabeli zgony (migrations/006_partycje.sql): parafia -> dekada.
+
+- ensure_partitions – zakłada brakujące partycje parafii / dekad przed
+  importem (import_json_to_pg.py, generate_synthetic.py); na bazie bez
+  migracji 006 nic nie robi,
+- reload_parish – przeładowanie jednej parafii: nowe rekordy ładowane są
+  do osobnej tabeli (z własnymi podpartycjami dekad), potem w jednej krótkiej
+  transakcji stara partycja jest odłączana, a nowa dołączana. Pozostałe
+  parafie są w tym czasie normalnie dostępne.
+
+Użycie:
+    python partitions.py lista
+    python partitions.py przeladuj "Parafia rzymskokatolicka w Jeżewie" jezewo.json
+    python partitions.py odlacz "Parafia rzymskokatolicka w Jeżewie"   # -> tabela zgony_odl_...
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+import psycopg
+from psycopg import errors, sql
+
+from changes import log_table
+from data_version import bump_data_version
+
+# ile czekamy na blokadę przy DETACH/ATTACH, zanim spróbujemy ponownie
+LOCK_TIMEOUT = "3s"
+LOCK_RETRIES = 20
+
+
+def _scalar(row):
+    if row is None:
+        return None
+    return row[0] if isinstance(row, tuple) else next(iter(row.values()))
+
+
+def is_partitioned(conn) -> bool:
+    return bool(_scalar(conn.execute(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table
+            WHERE partrelid = 'public.zgony'::regclass
+        )
+        """
+    ).fetchone()))
+
+
+def decade(year):
+    return (year // 10) * 10 if year is not None else None
+
+
+def partition_name(conn, parafia) -> str:
+    return _scalar(conn.execute("SELECT zgony_nazwa_partycji(%s)", (parafia,)).fetchone())
+
+
+def ensure_partitions(conn, parish_years):
+    """
+    parish_years: pary (parafia, rok_zgonu) importowanych rekordów.
+    Zakłada partycje, których jeszcze nie ma (bez commita).
+    """
+    if not is_partitioned(conn):
+        return 0
+    created = 0
+    parishes = {p for p, _ in parish_years if p is not None}
+    decades = {(p, decade(y)) for p, y in parish_years if p is not None and y is not None}
+    for parafia in sorted(parishes):
+        created += _ensure(conn, "SELECT zgony_dodaj_parafie(%s)", (parafia,))
+    for parafia, dekada in sorted(decades):
+        created += _ensure(conn, "SELECT zgony_dodaj_dekade(%s, %s)", (parafia, dekada))
+    return created
+
+
+def _ensure(conn, query, params) -> int:
+    before = _count_partitions(conn)
+    conn.execute(query, params)
+    return _count_partitions(conn) - before
+
+
+def _count_partitions(conn) -> int:
+    return _scalar(conn.execute(
+        "SELECT count(*) FROM pg_partition_tree('public.zgony') WHERE isleaf"
+    ).fetchone())
+
+
+def list_partitions(conn):
+    """(parafia, liczba rekordów, liczba podpartycji) dla każdej partycji parafii."""
+    rows = conn.execute(
+        """
+        SELECT pg_get_expr(c.relpartbound, c.oid) AS granica,
+               c.relname,
+               (SELECT count(*) FROM pg_partition_tree(c.oid) t WHERE t.isleaf) AS podpartycje
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.zgony'::regclass
+        ORDER BY c.relname
+        """
+    ).fetchall()
+    result = []
+    for r in rows:
+        bound, name, subparts = (r if isinstance(r, tuple) else tuple(r.values()))
+        count = _scalar(conn.execute(
+            sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(name))
+        ).fetchone())
+        result.append((bound, name, count, subparts))
+    return result
+
+
+def _with_lock_retry(conn, action):
+    """
+    DETACH / ATTACH potrzebują krótkiej blokady tabeli zgony; zamiast czekać
+    w kolejce za długim eksportem (i blokować nowe zapytania) ponawiamy.
+    """
+    for attempt in range(1, LOCK_RETRIES + 1):
+        try:
+            with conn.transaction():
+                conn.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                return action()
+        except errors.LockNotAvailable:
+            print(f"Tabela zgony zajęta, ponawiam ({attempt}/{LOCK_RETRIES})...")
+            time.sleep(1)
+    raise RuntimeError("Nie udało się uzyskać blokady tabeli zgony.")
+
+
+def _rename_tree(conn, old, new):
+    """Zmienia nazwę tabeli i jej podpartycji: <old>_1890 -> <new>_1890."""
+    children = conn.execute(
+        "SELECT relid::regclass::text FROM pg_partition_tree(%s) WHERE level = 1",
+        (f"public.{old}",),
+    ).fetchall()
+    for row in children:
+        child = _scalar(row)
+        if child.startswith(old + "_"):
+            conn.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                sql.Identifier(child), sql.Identifier(new + child[len(old):])
+            ))
+    conn.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+        sql.Identifier(old), sql.Identifier(new)
+    ))
+
+
+_INDEX_HEAD_RE = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON ONLY public\.zgony ")
+
+
+def _create_parent_indexes(conn, table):
+    """Odpowiedniki indeksów tabeli zgony na tabeli table (nazwy nadaje Postgres)."""
+    rows = conn.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = 'public.zgony'::regclass
+        ORDER BY indexrelid
+        """
+    ).fetchall()
+    target = sql.Identifier(table).as_string(conn)
+    for row in rows:
+        definition = _scalar(row)
+        statement, found = _INDEX_HEAD_RE.subn(
+            lambda m: f"CREATE {m.group(1) or ''}INDEX ON {target} ", definition
+        )
+        if not found:
+            raise RuntimeError(f"Nieobsługiwana definicja indeksu zgony: {definition}")
+        conn.execute(statement)
+
+
+def reload_parish(conn, parafia, rows):
+    """
+    rows: krotki jak import_json_to_pg.build_row_tuple (kolumny INSERT_COLUMNS).
+    Zwraca liczbę załadowanych rekordów.
+    """
+    from import_json_to_pg import INSERT_COLUMNS
+
+    if not is_partitioned(conn):
+        raise RuntimeError("Tabela zgony nie jest partycjonowana (migrations/006_partycje.sql).")
+
+    parish_idx = INSERT_COLUMNS.index("parafia")
+    year_idx = INSERT_COLUMNS.index("rok_zgonu")
+    other = {r[parish_idx] for r in rows} - {parafia}
+    if other:
+        raise ValueError(f"Rekordy z innych parafii w pliku: {sorted(map(str, other))}")
+
+    target = partition_name(conn, parafia)
+    staging = f"{target}_nowa"
+    staging_id = sql.Identifier(staging)
+
+    # 1) nowa tabela z podpartycjami dekad – poza tabelą zgony, bez blokad
+    conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(staging_id))
+    conn.execute(
+        sql.SQL(
+            "CREATE TABLE {} (LIKE zgony INCLUDING DEFAULTS) PARTITION BY RANGE (rok_zgonu)"
+        ).format(staging_id)
+    )
+    conn.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} DEFAULT").format(
+        sql.Identifier(f"{staging}_inne"), staging_id
+    ))
+    for dekada in sorted({decade(r[year_idx]) for r in rows if r[year_idx] is not None}):
+        conn.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})").format(
+            sql.Identifier(f"{staging}_{dekada}"), staging_id,
+            sql.Literal(dekada), sql.Literal(dekada + 10),
+        ))
+    # CHECK zgodny z granicą partycji – ATTACH nie musi skanować tabeli
+    conn.execute(
+        sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} CHECK (parafia IS NOT NULL AND parafia = {})").format(
+            staging_id, sql.Identifier(f"{staging}_parafia"), sql.Literal(parafia)
+        )
+    )
+    with conn.cursor() as cur:
+        with cur.copy(
+            sql.SQL("COPY {} ({}) FROM STDIN").format(
+                staging_id, sql.SQL(", ").join(map(sql.Identifier, INSERT_COLUMNS))
+            )
+        ) as copy:
+            for r in rows:
+                copy.write_row(r)
+    conn.commit()
+    # indeksy jak na zgony, budowane po COPY i przed zamianą – ATTACH tylko je
+    # podpina, zamiast budować (GIN / trigramy) pod blokadą tabeli zgony
+    _create_parent_indexes(conn, staging)
+    conn.commit()
+
+    # 2) zamiana partycji w jednej krótkiej transakcji
+    def swap():
+        exists = conn.execute("SELECT to_regclass(%s)", (f"public.{target}",)).fetchone()
+        old_name = None
+        if _scalar(exists) is not None:
+            old_name = f"{target}_stara"
+            conn.execute(sql.SQL("ALTER TABLE zgony DETACH PARTITION {}").format(
+                sql.Identifier(target)
+            ))
+            _rename_tree(conn, target, old_name)
+        # nazwy podpartycji jak w zgony_dodaj_dekade (<partycja>_<dekada>)
+        _rename_tree(conn, staging, target)
+        conn.execute(
+            sql.SQL("ALTER TABLE zgony ATTACH PARTITION {} FOR VALUES IN ({})").format(
+                sql.Identifier(target), sql.Literal(parafia)
+            )
+        )
+        if old_name is not None:
+            conn.execute(
+                sql.SQL("DELETE FROM zgony_klastry WHERE id IN (SELECT id FROM {})").format(
+                    sql.Identifier(old_name)
+                )
+            )
+            log_table(conn, old_name, "D")
+        # ATTACH nie uruchamia wyzwalaczy dziennika zmian (migrations/007_zmiany.sql)
+        log_table(conn, target, "I")
+        bump_data_version(conn)
+        return old_name
+
+    old_name = _with_lock_retry(conn, swap)
+    conn.commit()
+
+    # 3) stara partycja jest już poza tabelą zgony – usuwamy bez blokowania innych
+    if old_name is not None:
+        conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(old_name)))
+        conn.commit()
+    conn.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(target)))
+    conn.commit()
+    return len(rows)
+
+
+def detach_parish(conn, parafia) -> str:
+    """Odłącza partycję parafii do osobnej tabeli zgony_odl_<...>; zwraca jej nazwę."""
+    target = partition_name(conn, parafia)
+    detached = target.replace("zgony_p_", "zgony_odl_", 1)
+
+    def detach():
+        conn.execute(sql.SQL("ALTER TABLE zgony DETACH PARTITION {}").format(sql.Identifier(target)))
+        _rename_tree(conn, target, detached)
+        log_table(conn, detached, "D")
+        bump_data_version(conn)
+
+    _with_lock_retry(conn, detach)
+    conn.commit()
+    return detached
+
+
+def main():
+    from backfill import get_dsn
+    from import_json_to_pg import build_row_tuple, load_json_rows
+
+    parser = argparse.ArgumentParser(description="Partycje tabeli zgony")
+    sub = parser.add_subparsers(dest="co", required=True)
+    sub.add_parser("lista", help="partycje parafii z liczbą rekordów")
+    rel = sub.add_parser("przeladuj", help="zastąp rekordy parafii rekordami z pliku JSON")
+    rel.add_argument("parafia")
+    rel.add_argument("plik", type=Path)
+    det = sub.add_parser("odlacz", help="odłącz partycję parafii do osobnej tabeli")
+    det.add_argument("parafia")
+    args = parser.parse_args()
+
+    with psycopg.connect(get_dsn()) as conn:
+        if args.co == "lista":
+            for bound, name, count, subparts in list_partitions(conn):
+                print(f"{count:9d}  {subparts:3d} podpartycji  {name}  {bound}")
+        elif args.co == "przeladuj":
+            rows = []
+            for r in load_json_rows(args.plik):
+                r = {**r, "parafia": r.get("parafia") or args.parafia}
+                row = build_row_tuple(r, args.plik.name)
+                if row is not None:
+                    rows.append(row)
+            count = reload_parish(conn, args.parafia, rows)
+            print(f"Przeładowano parafię {args.parafia}: {count} rekordów.")
+        else:
+            print(f"Odłączono do tabeli {detach_parish(conn, args.parafia)}.")
+
+
+if __name__ == "__main__":
+    main()
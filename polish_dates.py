@@ -0,0 +1,243 @@
+import re
+from datetime import date, time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from name_matching import unaccent_pl
+
+# ---------- Parser dat, godzin i wieku z tekstu aktów ----------
+#
+# Wartości typu:
+#   data_zgonu: "29 grudnia 1939, godzina niewiadoma", "26 stycznia 1876, 12:00 w nocy",
+#               "14.07.1942", "1942-07-14", "14 VII 1942", "lipiec 1942", "1942"
+#   wiek:       "75 lat", "2 miesiące 2 dni", "1 rok 6 miesięcy",
+#               "53 lata (przybliżony, wyliczony)", "pół roku", "1/2 roku", "1 rok i pół"
+# zamieniamy na kolumny typowane (migrations/003_typed_dates.sql):
+#   data_zgonu_d date, godzina_zgonu time, rok_zgonu smallint, wiek_interwal interval.
+#
+# Wszystkie wyrażenia są kompilowane raz, a wyniki dla powtarzających się
+# napisów (te same daty w jednej księdze) trzymane w lru_cache.
+
+# rdzenie nazw miesięcy (po usunięciu polskich znaków): polskie i łacińskie
+_MONTH_STEMS = [
+    ("stycz", 1), ("ianuar", 1), ("januar", 1),
+    ("lut", 2), ("febr", 2),
+    ("marz", 3), ("marc", 3), ("mart", 3),
+    ("kwie", 4), ("april", 4),
+    ("maj", 5), ("mai", 5),
+    ("czerw", 6), ("iun", 6), ("jun", 6),
+    ("lip", 7), ("iul", 7), ("jul", 7),
+    ("sierp", 8), ("augus", 8),
+    ("wrze", 9), ("septem", 9),
+    ("pazdz", 10), ("octob", 10), ("oktob", 10),
+    ("listop", 11), ("novem", 11),
+    ("grud", 12), ("decem", 12),
+]
+_ROMAN_MONTHS = {
+    "i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6,
+    "vii": 7, "viii": 8, "ix": 9, "x": 10, "xi": 11, "xii": 12,
+}
+
+_YEAR = r"((?:1[5-9]|20)\d{2})"
+
+_ISO_RE = re.compile(_YEAR + r"-(\d{1,2})-(\d{1,2})")
+_NUMERIC_RE = re.compile(r"(\d{1,2})[./-](\d{1,2})[./-]" + _YEAR)
+_WORD_RE = re.compile(r"(?:(\d{1,2})\s*\.?\s*)?\b([a-z]{3,})\.?\s+(?:r\.\s*)?" + _YEAR)
+_ROMAN_RE = re.compile(r"(\d{1,2})\s*\.?\s*\b([ivx]{1,4})\b\.?\s*" + _YEAR)
+_YEAR_RE = re.compile(r"(?<!\d)" + _YEAR + r"(?!\d)")
+
+_DAYPART = r"(rano|w nocy|nocy|wieczor\w*|po poludniu|popoludniu|w poludnie)"
+_TIME_HINT_RE = re.compile(r"godz\w*\.?\s*(\d{1,2})(?:[:.](\d{2}))?")
+_CLOCK_RE = re.compile(r"(?<![\d.])(\d{1,2})[:](\d{2})(?![\d])")
+# sama godzina przed porą dnia: "o 10 wieczorem", "o 5 rano"
+_DAYPART_HOUR_RE = re.compile(r"(?<![\d.:])(\d{1,2})(?:\.(\d{2}))?\s*(?=" + _DAYPART + ")")
+_DAYPART_RE = re.compile(_DAYPART)
+
+# "1/2", "2 1/2" ("½" po NFKD to "1⁄2" z ukośnikiem ułamkowym)
+_FRACTION_RE = re.compile(r"(?:(\d+)\s+)?(\d+)\s*/\s*(\d+)")
+_FRACTION_GLYPH_RE = re.compile(r"(\d?)(\d)\u2044(\d+)")
+_AGE_PART_RE = re.compile(
+    r"((?:\d+\s+)?\d+\s*/\s*\d+|\d+(?:[.,]\d+)?|poltora|pol)\s*"
+    r"(lat\w*|rok\w*|mies\w*|tyg\w*|dni|dzien|dnia|godz\w*)?"
+)
+_MISSING = ("brak", "niewiadom", "nieznan", "b.d")
+
+
+class Age(NamedTuple):
+    years: int = 0
+    months: int = 0
+    days: int = 0
+    hours: int = 0
+
+    def to_interval(self) -> str:
+        """Tekst zrozumiały dla PostgreSQL (rzutowanie %s::interval)."""
+        return f"{self.years} years {self.months} mons {self.days} days {self.hours} hours"
+
+    @property
+    def total_years(self) -> float:
+        return self.years + self.months / 12 + self.days / 365.25 + self.hours / 8766
+
+
+class ParsedDate(NamedTuple):
+    day: Optional[date]
+    time: Optional[time]
+    year: Optional[int]
+
+
+def _prepare(text) -> str:
+    return unaccent_pl(text or "").lower()
+
+
+def _month_from_word(word: str):
+    for stem, month in _MONTH_STEMS:
+        if word.startswith(stem):
+            return month
+    return None
+
+
+def _safe_date(y, m, d):
+    try:
+        return date(int(y), int(m), int(d))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_time(text: str):
+    m = _CLOCK_RE.search(text) or _TIME_HINT_RE.search(text) or _DAYPART_HOUR_RE.search(text)
+    if not m:
+        return None
+    hour, minute = int(m.group(1)), int(m.group(2) or 0)
+
+    part = _DAYPART_RE.search(text, m.end())
+    daypart = part.group(1) if part and part.start() - m.end() <= 12 else ""
+    if daypart in ("w nocy", "nocy"):
+        # "12 w nocy" to północ, "11 w nocy" – 23:00, "3 w nocy" – 3:00
+        if hour == 12:
+            hour = 0
+        elif 6 <= hour < 12:
+            hour += 12
+    elif daypart.startswith("wieczor") or daypart in ("po poludniu", "popoludniu"):
+        if hour < 12:
+            hour += 12
+
+    if hour == 24:
+        hour = 0
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return time(hour, minute)
+
+
+@lru_cache(maxsize=65536)
+def parse_death_date(text) -> ParsedDate:
+    """
+    Data zgonu -> (date | None, time | None, rok | None).
+    Rok jest wypełniony także wtedy, gdy znany jest tylko rok / miesiąc.
+    """
+    s = _prepare(text)
+    if not s:
+        return ParsedDate(None, None, None)
+
+    day = None
+    m = _ISO_RE.search(s)
+    if m:
+        day = _safe_date(m.group(1), m.group(2), m.group(3))
+    if day is None:
+        m = _NUMERIC_RE.search(s)
+        if m:
+            day = _safe_date(m.group(3), m.group(2), m.group(1))
+    if day is None:
+        for m in _WORD_RE.finditer(s):
+            month = _month_from_word(m.group(2))
+            if month and m.group(1):
+                day = _safe_date(m.group(3), month, m.group(1))
+                break
+    if day is None:
+        m = _ROMAN_RE.search(s)
+        if m and m.group(2) in _ROMAN_MONTHS:
+            day = _safe_date(m.group(3), _ROMAN_MONTHS[m.group(2)], m.group(1))
+
+    if day is not None:
+        year = day.year
+    else:
+        m = _YEAR_RE.search(s)
+        year = int(m.group(1)) if m else None
+
+    return ParsedDate(day, _parse_time(s), year)
+
+
+def _age_number(raw: str) -> float:
+    if raw == "pol":
+        return 0.5
+    if raw == "poltora":
+        return 1.5
+    m = _FRACTION_RE.fullmatch(raw)
+    if m:
+        whole, num, den = m.groups()
+        return int(whole or 0) + (int(num) / int(den) if int(den) else 0)
+    return float(raw.replace(",", "."))
+
+
+@lru_cache(maxsize=16384)
+def parse_age(text) -> Optional[Age]:
+    """
+    Wiek z tekstu -> Age | None. Sama liczba bez jednostki oznacza lata.
+    "2 miesiące 2 dni" -> Age(0, 2, 2, 0); "pół roku" -> Age(0, 6, 0, 0);
+    "1 rok i pół" -> Age(1, 6, 0, 0) – ułamek bez jednostki dotyczy poprzedniej.
+    """
+    s = _prepare(text)
+    if not s or any(s.startswith(x) for x in _MISSING):
+        return None
+    # nawiasy to zwykle komentarz: "53 lata (przybliżony, wyliczony)"
+    s = s.split("(", 1)[0]
+    s = _FRACTION_GLYPH_RE.sub(r"\1 \2/\3", s)
+
+    years = months = days = hours = 0.0
+    found = False
+    last_unit = ""
+    for m in _AGE_PART_RE.finditer(s):
+        raw, unit = m.group(1), m.group(2) or ""
+        value = _age_number(raw)
+        if not unit and last_unit and (raw in ("pol", "poltora") or "/" in raw):
+            unit = last_unit
+        elif not unit and raw in ("pol", "poltora"):
+            continue
+        last_unit = unit
+        found = True
+        if unit.startswith(("lat", "rok")) or not unit:
+            years += value
+        elif unit.startswith("mies"):
+            months += value
+        elif unit.startswith("tyg"):
+            days += value * 7
+        elif unit.startswith(("dni", "dzien", "dnia")):
+            days += value
+        elif unit.startswith("godz"):
+            hours += value
+
+    if not found:
+        return None
+
+    # ułamki przenosimy do mniejszych jednostek ("pół roku" -> 6 miesięcy)
+    whole_years = int(years)
+    months += (years - whole_years) * 12
+    whole_months = int(months)
+    days += (months - whole_months) * 30
+    age = Age(whole_years, whole_months, int(round(days)), int(round(hours)))
+    if age.years > 130:
+        return None
+    return age
+
+
+def typed_columns(data_zgonu, wiek):
+    """
+    Krotka (data_zgonu_d, godzina_zgonu, rok_zgonu, wiek_interwal)
+    do INSERT/UPDATE; wiek_interwal jako tekst do rzutowania ::interval.
+    """
+    parsed = parse_death_date(data_zgonu)
+    age = parse_age(wiek)
+    return (
+        parsed.day,
+        parsed.time,
+        parsed.year,
+        age.to_interval() if age else None,
+    )
@@ -0,0 +1,195 @@
+"""
+Rejestr przygotowanych zapytań wyszukiwarki (/search i /export w main_async.py).
+
+build_filters_sql składa tekst SQL z kilku niezależnych warunków, więc
+każde wyszukiwanie to jedna z kilkudziesięciu kombinacji: rodzaj frazy
+(ILIKE / klucze fuzzy), parafia, przyczyna, lata, wiek, ukrywanie
+duplikatów, a w /search jeszcze sortowanie. Tekst zapytania zależy tylko
+od kombinacji (wartości idą w parametrach), więc rejestr nadaje każdej
+kombinacji stałą nazwę, np.
+
+    search[fraza_fon,parafia,lata] rok_zgonu DESC NULLS LAST, data_zgonu_d DESC NULLS LAST
+
+a połączenie z puli przygotowuje zapytanie przy pierwszym użyciu
+(prepare=True – Parse w protokole rozszerzonym, psycopg trzyma instrukcje
+per połączenie). Kolejne wykonania na tym połączeniu pomijają parsowanie
+długiego tekstu z wyrażeniami regularnymi, a po kilku wykonaniach
+Postgres zwykle przechodzi na plan ogólny i nie planuje wcale.
+
+Metryki (/metrics, metrics.py), etykieta statement = nazwa kombinacji:
+- zgony_prepared_executions_total – wykonania,
+- zgony_prepared_prepares_total – przygotowania (pierwsze użycie na połączeniu),
+- zgony_prepared_execute_seconds – czas wykonania (po stronie klienta),
+- zgony_prepared_plan_seconds{mode} – próbkowany czas planowania: co
+  PREPARED_SAMPLE_EVERY wykonań EXPLAIN (SUMMARY) EXECUTE przygotowanej
+  instrukcji (mode="prepared") i tego samego tekstu bez przygotowania
+  (mode="text") – różnica to narzut planowania, którego już nie płacimy,
+- zgony_prepared_plans_total{plan} – rodzaj planu przygotowanej instrukcji
+  użyty w próbce (generic / custom, z pg_prepared_statements).
+"""
+import os
+import re
+import threading
+import time
+import weakref
+
+import psycopg
+from psycopg import sql
+from psycopg.rows import tuple_row
+
+import metrics
+from name_matching import phonetic_codes
+
+# limit rejestru i cache'u instrukcji psycopg na połączeniu (domyślnie 100)
+PREPARED_MAX = int(os.getenv("PREPARED_MAX", "256"))
+PREPARED_SAMPLE_EVERY = int(os.getenv("PREPARED_SAMPLE_EVERY", "100"))
+
+_PARAM_RE = re.compile(r"%s")
+
+
+def combination(kind, args, order=None) -> str:
+    """Nazwa kombinacji filtrów (argumenty build_filters_sql) i sortowania."""
+    query, parafia, cause, y_from, y_to, a_from, a_to, fuzzy, collapse = args
+    parts = []
+    if query:
+        if not fuzzy:
+            parts.append("fraza")
+        else:
+            # bez kodów fonetycznych build_filters_sql pomija warunek @>
+            parts.append("fraza_fon" if phonetic_codes(query) else "fraza_norm")
+    if parafia:
+        parts.append("parafia")
+    if cause:
+        parts.append("przyczyna")
+    if y_from is not None and y_to is not None:
+        parts.append("lata")
+    if a_from is not None and a_to is not None:
+        parts.append("wiek")
+    if collapse:
+        parts.append("bez_duplikatow")
+    name = f"{kind}[{','.join(parts)}]"
+    return f"{name} {order}" if order else name
+
+
+class Statement:
+    def __init__(self, name, query):
+        self.name = name
+        self.sql = query
+        # tekst w postaci, w jakiej psycopg wysyła go w Parse ($1, $2, ...)
+        self.server_sql = _server_text(query)
+        self.executions = 0
+
+
+def _server_text(query) -> str:
+    counter = iter(range(1, 1000))
+    return _PARAM_RE.sub(lambda m: f"${next(counter)}", query)
+
+
+class StatementRegistry:
+    """Tekst SQL -> Statement; poza limitem zapytania idą bez przygotowania."""
+
+    def __init__(self, max_size=PREPARED_MAX):
+        self.max_size = max_size
+        self._by_sql = {}
+        self._names = set()
+        # połączenie -> nazwy przygotowanych na nim instrukcji
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, query, name):
+        with self._lock:
+            statement = self._by_sql.get(query)
+            if statement is None:
+                if len(self._by_sql) >= self.max_size:
+                    return None
+                if name in self._names:
+                    # ta sama nazwa, inny tekst (np. zmiana build_filters_sql)
+                    name = f"{name} #{metrics.query_shape(query)[0]}"
+                statement = self._by_sql[query] = Statement(name, query)
+                self._names.add(name)
+            statement.executions += 1
+            return statement
+
+    def first_use(self, conn, statement) -> bool:
+        with self._lock:
+            names = self._prepared.setdefault(conn, set())
+            if statement.name in names:
+                return False
+            names.add(statement.name)
+            return True
+
+
+statements = StatementRegistry()
+
+
+async def configure(conn):
+    """configure= puli: cache instrukcji psycopg na połączeniu mieści cały rejestr."""
+    conn.prepared_max = PREPARED_MAX
+
+
+async def aexecute(conn, query, params, name):
+    """
+    conn.execute() przez przygotowaną instrukcję kombinacji name;
+    zwraca kursor jak conn.execute().
+    """
+    statement = statements.get(query, name)
+    if statement is None:
+        return await conn.execute(query, params)
+
+    if statements.first_use(conn, statement):
+        metrics.PREPARED_PREPARES.inc(statement.name)
+    start = time.perf_counter()
+    cur = await conn.execute(query, params, prepare=True)
+    metrics.PREPARED_SECONDS.observe(time.perf_counter() - start, statement.name)
+    metrics.PREPARED_EXECUTIONS.inc(statement.name)
+
+    if PREPARED_SAMPLE_EVERY > 0 and statement.executions % PREPARED_SAMPLE_EVERY == 1:
+        await _sample_planning(conn, statement, params)
+    return cur
+
+
+def _planning_seconds(row) -> float:
+    return row[0][0]["Planning Time"] / 1000
+
+
+async def _plan_counts(cur, statement):
+    await cur.execute(
+        """
+        SELECT name, generic_plans, custom_plans FROM pg_prepared_statements
+        WHERE statement = %s AND NOT from_sql
+        """,
+        (statement.server_sql,),
+    )
+    return await cur.fetchone()
+
+
+async def _sample_planning(conn, statement, params):
+    """
+    EXPLAIN (SUMMARY) bez ANALYZE – czas planowania, zapytanie się nie
+    wykonuje. W punkcie zapisu, żeby błąd próbki nie przerwał transakcji trasy.
+    """
+    try:
+        async with conn.transaction(), \
+                psycopg.AsyncClientCursor(conn, row_factory=tuple_row) as cur:
+            before = await _plan_counts(cur, statement)
+            if before is not None:
+                placeholders = sql.SQL(", ").join([sql.Placeholder()] * len(params))
+                await cur.execute(
+                    sql.SQL("EXPLAIN (SUMMARY ON, FORMAT JSON) EXECUTE {}({})").format(
+                        sql.Identifier(before[0]), placeholders
+                    ),
+                    params,
+                )
+                metrics.PREPARED_PLAN_SECONDS.observe(
+                    _planning_seconds(await cur.fetchone()), statement.name, "prepared"
+                )
+                after = await _plan_counts(cur, statement)
+                if after is not None:
+                    plan = "generic" if after[1] > before[1] else "custom"
+                    metrics.PREPARED_PLANS.inc(statement.name, plan)
+            await cur.execute("EXPLAIN (SUMMARY ON, FORMAT JSON) " + statement.sql, params)
+            metrics.PREPARED_PLAN_SECONDS.observe(
+                _planning_seconds(await cur.fetchone()), statement.name, "text"
+            )
+    except (psycopg.Error, LookupError) as e:  # próbka jest tylko dodatkiem do metryk
+        metrics.slow_log.warning("Próbka planowania %s nieudana: %s", statement.name, e)
@@ -0,0 +1,221 @@
+"""
+Cache wyników wyszukiwania i eksportu pod sygnaturą filtrów.
+
+Klucz = wersja danych + rodzaj ("search" / "export") + znormalizowana krotka
+argumentów build_filters_sql + sortowanie + strona. Wersja danych
+(data_version.py) jest podbijana przy każdym imporcie, więc po imporcie stare
+wpisy po prostu przestają pasować.
+
+Backend wybiera zmienna RESULT_CACHE:
+  lru (domyślnie)         – LRU w pamięci procesu, limit RESULT_CACHE_MB,
+  redis://host:6379/0     – Redis albo zgodny z nim serwer (Valkey, KeyDB);
+                            limit pamięci ustawia się na serwerze
+                            (maxmemory + maxmemory-policy allkeys-lru),
+  off                     – bez cache.
+"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from data_version import aget_data_version, get_data_version
+from name_matching import normalize_name
+
+RESULT_CACHE = os.getenv("RESULT_CACHE", "lru")
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "256"))
+# pojedynczy wpis większy niż ten ułamek limitu nie jest zapisywany
+MAX_ENTRY_FRACTION = 0.25
+# Redis: wpisy starych wersji wygasają same
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+
+
+def filter_signature(query, selected_parafia, cause, y_from, y_to, a_from, a_to,
+                     fuzzy=False, collapse=False) -> tuple:
+    """
+    Krotka argumentów build_filters_sql zbudowana z tego, co trafia do SQL:
+    przy fuzzy fraza jest kluczem normalize_name (z niego liczone są też kody
+    fonetyczne), więc "Łódź" i "lodz" dzielą wpis; bez fuzzy fraza idzie do
+    ILIKE bez zmian – "Jan  Kowalski" (dwie spacje) to inne zapytanie niż
+    "Jan Kowalski". Brak frazy (None) to co innego niż fraza bez liter
+    przy fuzzy (LIKE '%%' pomija rekordy bez klucza).
+    """
+    if not query:
+        q = None
+    else:
+        q = normalize_name(query) if fuzzy else query
+    return (
+        q,
+        selected_parafia or "",
+        cause or "",
+        y_from,
+        y_to,
+        a_from,
+        a_to,
+        bool(fuzzy),
+        bool(collapse),
+    )
+
+
+class LRUBackend:
+    """OrderedDict z limitem sumy rozmiarów wartości (bajty)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self._data = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self._version:
+                return None
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, version, key, value: bytes):
+        if len(value) > self.max_bytes * MAX_ENTRY_FRACTION:
+            return
+        with self._lock:
+            if version != self._version:
+                if self._version is not None and version < self._version:
+                    return  # spóźniony wynik sprzed importu
+                self._data.clear()
+                self._size = 0
+                self._version = version
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+    # main_async.py: słownik w pamięci nie czeka na sieć, wystarczy wywołać wprost
+    async def aget(self, version, key):
+        return self.get(version, key)
+
+    async def aset(self, version, key, value: bytes):
+        self.set(version, key, value)
+
+
+class RedisBackend:
+    """Redis / serwer zgodny z protokołem Redis; klucze z prefiksem wersji."""
+
+    def __init__(self, url, max_entry_bytes, ttl=RESULT_CACHE_TTL):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "RESULT_CACHE=redis://... wymaga pakietu redis (pip install redis)"
+            ) from e
+        self._client = redis.Redis.from_url(url)
+        self.url = url
+        # klient redis.asyncio dla main_async.py – tworzony w pętli zdarzeń, która go używa
+        self._async_client = None
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(version, key):
+        return "zgony:wyniki:%d:%s" % (version, pickle.dumps(key).hex())
+
+    def get(self, version, key):
+        try:
+            return self._client.get(self._key(version, key))
+        except Exception:  # niedostępny cache = zapytanie do bazy
+            return None
+
+    def set(self, version, key, value: bytes):
+        if len(value) > self.max_entry_bytes:
+            return
+        try:
+            self._client.set(self._key(version, key), value, ex=self.ttl)
+        except Exception:
+            pass
+
+    def _aclient(self):
+        if self._async_client is None:
+            import redis.asyncio
+
+            self._async_client = redis.asyncio.Redis.from_url(self.url)
+        return self._async_client
+
+    async def aget(self, version, key):
+        try:
+            return await self._aclient().get(self._key(version, key))
+        except Exception:
+            return None
+
+    async def aset(self, version, key, value: bytes):
+        if len(value) > self.max_entry_bytes:
+            return
+        try:
+            await self._aclient().set(self._key(version, key), value, ex=self.ttl)
+        except Exception:
+            pass
+
+
+def make_backend(spec=RESULT_CACHE, max_mb=RESULT_CACHE_MB):
+    spec = (spec or "").strip()
+    max_bytes = max_mb * 1024 * 1024
+    if spec.lower() in ("", "off", "0", "nie"):
+        return None
+    if spec.lower() == "lru":
+        return LRUBackend(max_bytes)
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec, max_bytes * MAX_ENTRY_FRACTION)
+    raise RuntimeError(f"Nieznany RESULT_CACHE: {spec!r} (lru, redis://..., off)")
+
+
+class ResultCache:
+    """
+    get_or_compute(conn, key, compute) – wartość trzymana jako pickle,
+    więc każde trafienie dostaje własną kopię (search() dopisuje do
+    rekordów pole z podświetleniem).
+    """
+
+    def __init__(self, backend, on_lookup=None):
+        self.backend = backend
+        self.on_lookup = on_lookup  # (rodzaj, "hit" / "miss") -> None, dla metryk
+
+    def get_or_compute(self, conn, key, compute):
+        if self.backend is None:
+            return compute()
+        kind = key[0]
+        version = get_data_version(conn)
+        cached = self.backend.get(version, key)
+        if cached is not None:
+            self._count(kind, "hit")
+            return pickle.loads(cached)
+
+        self._count(kind, "miss")
+        value = compute()
+        self.backend.set(version, key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        return value
+
+    async def aget_or_compute(self, conn, key, compute):
+        """
+        Wersja dla main_async.py: conn async, compute to funkcja async;
+        backend przez aget / aset (Redis bez blokowania pętli zdarzeń).
+        """
+        if self.backend is None:
+            return await compute()
+        kind = key[0]
+        version = await aget_data_version(conn)
+        cached = await self.backend.aget(version, key)
+        if cached is not None:
+            self._count(kind, "hit")
+            return pickle.loads(cached)
+
+        self._count(kind, "miss")
+        value = await compute()
+        await self.backend.aset(version, key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def _count(self, kind, result):
+        if self.on_lookup is not None:
+            self.on_lookup(kind, result)
@@ -0,0 +1,218 @@
+"""
+Wykrywanie prawie identycznych skanów przed OCR (ta sama strona jako
+1.jpg i 1.png, ponowny skan w innej rozdzielczości).
+
+- image_hash – pHash 64-bitowy (DCT 32x32 -> 8x8 najniższych częstotliwości,
+  bit = współczynnik powyżej mediany); odporny na skalowanie i kompresję.
+  Liczony w puli procesów, zapamiętywany w HASH_FILE_NAME (po rozmiarze
+  i czasie modyfikacji pliku), więc kolejne uruchomienia liczą tylko nowe skany,
+- BKTree – wyszukiwanie hashy w odległości Hamminga <= max_distance,
+- same_page – potwierdzenie kandydata: pHash z miniatury 32x32 widzi
+  głównie układ strony, więc dwie różne karty tego samego drukowanego
+  formularza mogą mieć bliskie hashe. Kandydat musi mieć te same proporcje
+  i żaden blok miniatury CONFIRM_SIZE px (po wyrównaniu jasności papieru
+  i tuszu) nie może się różnić o więcej niż MAX_BLOCK_DIFF – inny wpis
+  w jednej rubryce wystarczy, żeby strony uznać za różne,
+- find_duplicates – w obrębie jednego katalogu (księgi) reprezentantem
+  grupy jest skan o największej liczbie pikseli; pozostałe wskazują na niego.
+
+app.py --duplikaty wysyła do OCR tylko reprezentantów, a duplikaty
+dostają data.json z odnośnikiem do wyników reprezentanta.
+
+Wymaga pakietu pillow (pip install pillow).
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageFilter
+except ImportError:  # sprawdzane w image_hash
+    Image = None
+
+HASH_FILE_NAME = "hashe_skanow.json"
+MAX_DISTANCE = 4
+
+# potwierdzenie kandydatów (same_page)
+CONFIRM_SIZE = 64
+CONFIRM_BLOCKS = 16  # bloki 4x4 px miniatury
+MAX_BLOCK_DIFF = 0.2  # średnia różnica w bloku, 0 = papier, 1 = tusz
+MAX_ASPECT_DIFF = 0.03
+
+_N = 32
+_DCT = np.array([
+    [np.sqrt((1 if k == 0 else 2) / _N) * np.cos(np.pi * (2 * n + 1) * k / (2 * _N)) for n in range(_N)]
+    for k in range(_N)
+])
+
+
+def _require_pil():
+    if Image is None:
+        raise RuntimeError("Wykrywanie duplikatów skanów wymaga pakietu pillow (pip install pillow)")
+
+
+def image_hash(path):
+    """(pHash jako int, liczba pikseli)."""
+    _require_pil()
+    with Image.open(path) as img:
+        pixels = img.width * img.height
+        gray = img.convert("L").resize((_N, _N), Image.Resampling.LANCZOS)
+    coeffs = (_DCT @ np.asarray(gray, dtype=np.float64) @ _DCT.T)[:8, :8].flatten()
+    bits = coeffs > np.median(coeffs[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value, pixels
+
+
+def _hash_entry(path):
+    try:
+        return str(path), image_hash(path), None
+    except Exception as e:  # uszkodzony plik nie zatrzymuje całego przebiegu
+        return str(path), None, f"{type(e).__name__}: {e}"
+
+
+def hash_images(paths, cache_path=None, workers=None):
+    """{ścieżka: (hash, piksele)}; pliki bez zmian od ostatniego razu – z cache_path."""
+    cache = {}
+    if cache_path is not None and Path(cache_path).exists():
+        cache = json.loads(Path(cache_path).read_text(encoding="utf-8"))
+
+    result = {}
+    todo = []
+    for path in paths:
+        st = os.stat(path)
+        entry = cache.get(str(path))
+        if entry and entry["rozmiar"] == st.st_size and entry["mtime"] == st.st_mtime:
+            result[str(path)] = (int(entry["hash"], 16), entry["piksele"])
+        else:
+            todo.append(path)
+
+    if todo:
+        print(f"Hashowanie skanów: {len(todo)} (z pamięci: {len(result)})")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, value, error in pool.map(_hash_entry, todo, chunksize=16):
+                if error is not None:
+                    print(f"   pomijam {path}: {error}")
+                    continue
+                result[path] = value
+                st = os.stat(path)
+                cache[path] = {
+                    "hash": f"{value[0]:016x}",
+                    "piksele": value[1],
+                    "rozmiar": st.st_size,
+                    "mtime": st.st_mtime,
+                }
+        if cache_path is not None:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            # przetworzone skany są przenoszone ze źródła – ich wpisy nie są już potrzebne
+            cache = {path: entry for path, entry in cache.items() if path in result}
+            Path(cache_path).write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+    return result
+
+
+def hamming(a, b) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Drzewo Burkharda-Kellera nad odległością Hamminga."""
+
+    def __init__(self):
+        self._root = None  # [hash, wartość, {odległość: węzeł}]
+
+    def add(self, value_hash, value):
+        if self._root is None:
+            self._root = [value_hash, value, {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value_hash, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value_hash, value, {}]
+                return
+            node = child
+
+    def search(self, value_hash, max_distance):
+        """[(odległość, wartość)] posortowane od najbliższych."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value_hash, node[0])
+            if d <= max_distance:
+                found.append((d, node[1]))
+            for dist, child in node[2].items():
+                if d - max_distance <= dist <= d + max_distance:
+                    stack.append(child)
+        return sorted(found, key=lambda x: x[0])
+
+
+def page_thumbnail(path):
+    """(proporcje szerokość / wysokość, miniatura: 0 = papier, 1 = tusz)."""
+    _require_pil()
+    with Image.open(path) as img:
+        aspect = img.width / img.height
+        gray = img.convert("L").resize((CONFIRM_SIZE, CONFIRM_SIZE), Image.Resampling.BOX)
+        # rozmycie o 1 px – przesunięcie przy ponownym skanowaniu nie jest różnicą
+        gray = gray.filter(ImageFilter.BoxBlur(1))
+    a = np.asarray(gray, dtype=np.float32)
+    paper, ink = np.percentile(a, 90), np.percentile(a, 2)
+    return aspect, (paper - a) / max(paper - ink, 1.0)
+
+
+def same_page(thumb_a, thumb_b) -> bool:
+    """Czy miniatury page_thumbnail to ta sama strona (a nie tylko ten sam formularz)."""
+    aspect_a, a = thumb_a
+    aspect_b, b = thumb_b
+    if abs(aspect_a / aspect_b - 1) > MAX_ASPECT_DIFF:
+        return False
+    k = CONFIRM_SIZE // CONFIRM_BLOCKS
+    blocks = np.abs(a - b).reshape(CONFIRM_BLOCKS, k, CONFIRM_BLOCKS, k).mean(axis=(1, 3))
+    return float(blocks.max()) <= MAX_BLOCK_DIFF
+
+
+def find_duplicates(images, max_distance=MAX_DISTANCE, cache_path=None, workers=None):
+    """
+    {duplikat: reprezentant} dla ścieżek z images (Path). Grupy tylko
+    w obrębie jednego katalogu (księgi) – puste / podobne strony z różnych
+    ksiąg nie są łączone. Kandydat z BKTree jest duplikatem dopiero po
+    potwierdzeniu same_page.
+    """
+    hashes = hash_images(images, cache_path=cache_path, workers=workers)
+    by_book = {}
+    for path in images:
+        if str(path) not in hashes:
+            continue
+        by_book.setdefault(Path(path).parent, []).append(Path(path))
+
+    thumbnails = {}
+
+    def confirmed(path, rep):
+        try:
+            for p in (path, rep):
+                if p not in thumbnails:
+                    thumbnails[p] = page_thumbnail(p)
+        except OSError as e:  # nieczytelny plik – nie uznajemy za duplikat
+            print(f"   pomijam porównanie {path}: {e}")
+            return False
+        return same_page(thumbnails[path], thumbnails[rep])
+
+    duplicates = {}
+    for paths in by_book.values():
+        tree = BKTree()
+        # największy skan pierwszy – zostaje reprezentantem
+        for path in sorted(paths, key=lambda p: (-hashes[str(p)][1], str(p))):
+            value_hash = hashes[str(path)][0]
+            candidates = tree.search(value_hash, max_distance)
+            rep = next((rep for _, rep in candidates if confirmed(path, rep)), None)
+            if rep is not None:
+                duplicates[path] = rep
+            else:
+                tree.add(value_hash, path)
+        thumbnails.clear()
+    return duplicates
@@ -0,0 +1,148 @@
+"""
+Wyszukiwanie skanów do OCR w zgony/ – strumieniowo i równolegle.
+
+ImageDiscovery to iterator ścieżek obrazów: katalogi czyta pula wątków
+(każdy podkatalog to osobne zadanie), a znalezione pliki trafiają do
+kolejki od razu, więc app.py zaczyna OCR pierwszej strony, zanim reszta
+drzewa zostanie przejrzana.
+
+Czasy modyfikacji katalogów są zapamiętywane w DIR_CACHE_FILE_NAME (obok
+hashe_skanow.json w json_zgony/): katalog z tym samym mtime co ostatnio
+nie jest listowany – jego pliki i podkatalogi pochodzą z pamięci, więc
+kolejne uruchomienia czytają tylko zmienione foldery parafii (na
+pozostałe przypada jedno stat). Dodanie, usunięcie i przeniesienie pliku
+zmienia mtime katalogu, także przeniesienie przetworzonego skanu do
+json_zgony/. Katalogi zmienione tuż przed odczytem (RACY_SECONDS) nie
+trafiają do pamięci – zmiana w tej samej chwili mogłaby mieć ten sam mtime.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DIR_CACHE_FILE_NAME = "katalogi_skanow.json"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+WORKERS = int(os.getenv("OCR_WYSZUKIWANIE_WATKI", "8"))
+RACY_SECONDS = 2
+
+_DONE = object()
+
+
+def _read_cache(cache_path):
+    if cache_path is None or not Path(cache_path).exists():
+        return {}
+    try:
+        return json.loads(Path(cache_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:  # uszkodzona pamięć = pełne przejście
+        print(f"Pamięć katalogów {cache_path} nieczytelna ({e}) – skanuję wszystko")
+        return {}
+
+
+class ImageDiscovery:
+    """
+    Iterator ścieżek obrazów pod source_root (kolejność między katalogami
+    zależy od wątków, w katalogu – alfabetyczna). found – ile znaleziono
+    do tej pory, done – czy całe drzewo jest już przejrzane.
+    """
+
+    def __init__(self, source_root, cache_path=None, workers=WORKERS):
+        self.source_root = Path(source_root)
+        self.cache_path = cache_path
+        self.workers = max(1, workers)
+        self.found = 0
+        self.done = False
+        self.stats = {"katalogi_z_pamieci": 0, "katalogi_czytane": 0, "bledy": 0}
+        self._cache = {}
+        self._new_cache = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._queue = queue.Queue()
+        self._pool = None
+
+    def __iter__(self):
+        self._cache = _read_cache(self.cache_path)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="skany")
+        complete = False
+        try:
+            self._submit(self.source_root)
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    break
+                yield item
+            complete = True
+        finally:
+            # przerwana iteracja: wątki kończą bieżące katalogi, nowych nie biorą
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            if complete:
+                self._write_cache()
+
+    def _submit(self, directory):
+        with self._lock:
+            self._pending += 1
+        self._pool.submit(self._visit, directory)
+
+    def _visit(self, directory):
+        try:
+            files, subdirs = self._list(directory)
+            with self._lock:
+                self.found += len(files)
+            for name in files:
+                self._queue.put(directory / name)
+            for name in subdirs:
+                self._submit(directory / name)
+        except OSError as e:
+            with self._lock:
+                self.stats["bledy"] += 1
+            print(f"Nie można odczytać katalogu {directory}: {e}")
+        except RuntimeError:  # pula zamknięta po przerwaniu iteracji
+            pass
+        finally:
+            with self._lock:
+                self._pending -= 1
+                finished = self._pending == 0
+                if finished:
+                    self.done = True
+            if finished:
+                self._queue.put(_DONE)
+
+    def _list(self, directory):
+        """(pliki obrazów, podkatalogi) – z pamięci, gdy mtime katalogu się nie zmienił."""
+        key = directory.relative_to(self.source_root).as_posix()
+        mtime = os.stat(directory).st_mtime_ns
+        entry = self._cache.get(key)
+        if entry is not None and entry["mtime_ns"] == mtime:
+            with self._lock:
+                self.stats["katalogi_z_pamieci"] += 1
+                self._new_cache[key] = entry
+            return entry["pliki"], entry["katalogi"]
+
+        files, subdirs = [], []
+        with os.scandir(directory) as it:
+            for item in it:
+                # jak os.walk: bez wchodzenia w dowiązania do katalogów
+                if item.is_dir():
+                    if not item.is_symlink():
+                        subdirs.append(item.name)
+                elif item.name.lower().endswith(IMAGE_EXTENSIONS):
+                    files.append(item.name)
+        files.sort()
+        subdirs.sort()
+        with self._lock:
+            self.stats["katalogi_czytane"] += 1
+            if time.time_ns() - mtime > RACY_SECONDS * 1_000_000_000:
+                self._new_cache[key] = {"mtime_ns": mtime, "pliki": files, "katalogi": subdirs}
+        return files, subdirs
+
+    def _write_cache(self):
+        if self.cache_path is None:
+            return
+        path = Path(self.cache_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        # tylko katalogi odwiedzone w tym przebiegu – usunięte znikają z pamięci
+        tmp.write_text(json.dumps(self._new_cache, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
@@ -0,0 +1,288 @@
+"""
+Kolumnowe migawki tabeli zgony (Parquet albo Arrow IPC) do pobierania
+całego zbioru bez obciążania bazy.
+
+Układ katalogu (SNAPSHOT_DIR, domyślnie snapshoty/):
+
+    v<wersja danych>/_manifest.json
+    v<wersja danych>/parafia=<nazwa, URL-encoded>/zgony.parquet
+
+Partycje w stylu Hive – pyarrow.dataset / DuckDB / Spark czytają katalog
+wersji wprost (kolumna parafia pochodzi ze ścieżki). Oprócz pól tekstowych
+pliki mają kolumny typowane: data_zgonu_d, godzina_zgonu, rok_zgonu
+i wiek_dni (wiek_interwal w dniach), więc nie trzeba parsować polskich dat.
+
+Migawka jest liczona w jednej transakcji REPEATABLE READ (wersja i dane
+z tej samej chwili) i budowana w katalogu tymczasowym. Gotowy katalog
+zastępuje poprzedni przez zmianę nazw (przebudowa z --wymus odkłada starą
+wersję na bok i usuwa ją dopiero po podmianie). Starsze wersje ponad
+--zostaw są usuwane. Trasy /snapshot
+(manifest najnowszej wersji) i /snapshot/v<wersja>/<plik> (obsługa Range)
+są w main.py i main_async.py.
+
+Wymaga pakietu pyarrow (pip install pyarrow, w requirements.txt jako
+opcjonalny) – tylko do budowania migawki.
+
+Użycie:
+    python snapshot.py
+    python snapshot.py --format arrow --zostaw 3
+    python snapshot.py --wymus         # przebuduj, nawet gdy wersja już jest
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from urllib.parse import quote
+
+import psycopg
+
+from data_version import get_data_version
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "snapshoty"))
+# "_" na początku – czytniki zbiorów Hive pomijają ten plik
+MANIFEST_NAME = "_manifest.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+MIMETYPES = {
+    ".parquet": "application/vnd.apache.parquet",
+    ".arrow": "application/vnd.apache.arrow.file",
+    ".json": "application/json",
+}
+URL_PREFIX = "/snapshot"
+COMPRESSION = "zstd"
+BATCH_SIZE = 20000
+KEEP_VERSIONS = 2
+# wartość partycji dla rekordów bez parafii (jak w Hive)
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+COLUMNS_SQL = """
+    SELECT NULLIF(TRIM(parafia), '') AS parafia,
+           id, imie_nazwisko, wiek, miejsce_urodzenia, data_zgonu, przyczyna_zgonu,
+           inne_wazne_informacje, source_file, image_url, imie_nazwisko_norm,
+           data_zgonu_d, godzina_zgonu, rok_zgonu,
+           EXTRACT(EPOCH FROM wiek_interwal)::float8 / 86400 AS wiek_dni
+    FROM zgony
+    ORDER BY 1 NULLS FIRST, id
+"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Migawki wymagają pakietu pyarrow (pip install pyarrow)") from e
+    return pa
+
+
+def _schema(pa):
+    text = pa.string()
+    return pa.schema([
+        ("id", pa.int32()),
+        ("imie_nazwisko", text),
+        ("wiek", text),
+        ("miejsce_urodzenia", text),
+        ("data_zgonu", text),
+        ("przyczyna_zgonu", text),
+        ("inne_wazne_informacje", text),
+        ("source_file", text),
+        ("image_url", text),
+        ("imie_nazwisko_norm", text),
+        ("data_zgonu_d", pa.date32()),
+        ("godzina_zgonu", pa.time64("us")),
+        ("rok_zgonu", pa.int16()),
+        ("wiek_dni", pa.float64()),
+    ])
+
+
+def partition_dir(parafia) -> str:
+    return "parafia=" + (quote(parafia, safe="") if parafia else NULL_PARTITION)
+
+
+class _PartitionWriter:
+    """Jeden plik partycji; partie rekordów dopisywane strumieniowo."""
+
+    def __init__(self, pa, schema, path, fmt, parafia):
+        self.pa = pa
+        self.parafia = parafia
+        self.schema = schema
+        self.path = path
+        self.rows = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, schema, compression=COMPRESSION)
+        else:
+            self._sink = pa.OSFile(str(path), "wb")
+            options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+            self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        batch = self.pa.RecordBatch.from_arrays(
+            [self.pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_batch(batch)
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, "_sink"):
+            self._sink.close()
+
+
+def build_snapshot(conn, root=SNAPSHOT_DIR, fmt="parquet", force=False):
+    """
+    Buduje migawkę bieżącej wersji danych; zwraca manifest (albo istniejący,
+    gdy ta wersja już jest i nie force). conn – bez autocommit.
+    """
+    pa = _pyarrow()
+    schema = _schema(pa)
+    root = Path(root)
+
+    conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+    version = get_data_version(conn)
+    target = root / f"v{version}"
+    if (target / MANIFEST_NAME).exists() and not force:
+        print(f"Migawka wersji {version} już istnieje: {target}")
+        conn.rollback()
+        return json.loads((target / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+    tmp = root / f".v{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    files = []
+    writer = None
+
+    def close_writer():
+        writer.close()
+        files.append({
+            "parafia": writer.parafia,
+            "plik": writer.path.relative_to(tmp).as_posix(),
+            "rekordy": writer.rows,
+            "bajty": writer.path.stat().st_size,
+        })
+
+    with conn.cursor(name="snapshot_zgony") as cur:
+        cur.itersize = BATCH_SIZE
+        cur.execute(COLUMNS_SQL)
+        while True:
+            rows = cur.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            # wiersze posortowane po parafii – nowa parafia zamyka poprzedni plik
+            for parafia, group in groupby(rows, key=itemgetter(0)):
+                if writer is None or parafia != writer.parafia:
+                    if writer is not None:
+                        close_writer()
+                    path = tmp / partition_dir(parafia) / f"zgony{FORMATS[fmt]}"
+                    writer = _PartitionWriter(pa, schema, path, fmt, parafia)
+                writer.write([r[1:] for r in group])
+    if writer is not None:
+        close_writer()
+    conn.rollback()
+
+    manifest = {
+        "wersja_danych": version,
+        "utworzono": datetime.now().isoformat(timespec="seconds"),
+        "format": fmt,
+        "kompresja": COMPRESSION,
+        "partycjonowanie": "hive: parafia",
+        "kolumny": [{"nazwa": f.name, "typ": str(f.type)} for f in schema]
+                   + [{"nazwa": "parafia", "typ": "string (ze ścieżki)"}],
+        "rekordy": sum(f["rekordy"] for f in files),
+        "bajty": sum(f["bajty"] for f in files),
+        "pliki": files,
+    }
+    tmp.mkdir(parents=True, exist_ok=True)
+    (tmp / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    old = None
+    if target.exists():
+        old = root / f".v{version}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(target, old)
+    os.replace(tmp, target)
+    if old is not None:
+        shutil.rmtree(old)
+    return manifest
+
+
+def versions(root=SNAPSHOT_DIR):
+    """Wersje danych z gotową migawką, rosnąco."""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    found = []
+    for d in root.iterdir():
+        if d.name.startswith("v") and d.name[1:].isdigit() and (d / MANIFEST_NAME).exists():
+            found.append(int(d.name[1:]))
+    return sorted(found)
+
+
+def prune(root=SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    for version in versions(root)[:-keep] if keep > 0 else []:
+        shutil.rmtree(Path(root) / f"v{version}")
+        print(f"Usunięto starą migawkę v{version}")
+
+
+def read_manifest(version, root=SNAPSHOT_DIR):
+    path = Path(root) / f"v{version}" / MANIFEST_NAME
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def latest_manifest(root=SNAPSHOT_DIR):
+    found = versions(root)
+    return read_manifest(found[-1], root) if found else None
+
+
+def with_urls(manifest, prefix=URL_PREFIX, root=SNAPSHOT_DIR):
+    """Manifest dla trasy /snapshot – z adresem każdego pliku i wszystkimi wersjami."""
+    manifest = dict(manifest)
+    version = manifest["wersja_danych"]
+    manifest["pliki"] = [
+        {**f, "url": f"{prefix}/v{version}/{quote(f['plik'], safe='/=')}"} for f in manifest["pliki"]
+    ]
+    manifest["wersje"] = versions(root)
+    return manifest
+
+
+def file_path(version, name, root=SNAPSHOT_DIR):
+    """Ścieżka pliku migawki – tylko manifest i pliki w nim wymienione."""
+    manifest = read_manifest(version, root)
+    if manifest is None:
+        return None
+    if name != MANIFEST_NAME and name not in {f["plik"] for f in manifest["pliki"]}:
+        return None
+    return Path(root) / f"v{version}" / name
+
+
+def main():
+    from backfill import get_dsn
+    from import_json_to_pg import mask_dsn
+
+    parser = argparse.ArgumentParser(description="Migawka tabeli zgony (Parquet / Arrow IPC)")
+    parser.add_argument("--katalog", type=Path, default=SNAPSHOT_DIR)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--zostaw", type=int, default=KEEP_VERSIONS,
+                        help="ile najnowszych wersji migawki zachować")
+    parser.add_argument("--wymus", action="store_true",
+                        help="przebuduj migawkę, nawet gdy ta wersja danych już ją ma")
+    args = parser.parse_args()
+
+    dsn = get_dsn()
+    print(f"Baza: {mask_dsn(dsn)}")
+    with psycopg.connect(dsn) as conn:
+        manifest = build_snapshot(conn, args.katalog, args.format, force=args.wymus)
+    prune(args.katalog, args.zostaw)
+    print(f"Migawka v{manifest['wersja_danych']}: {manifest['rekordy']} rekordów, "
+          f"{len(manifest['pliki'])} parafii, {manifest['bajty'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
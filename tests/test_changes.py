@@ -0,0 +1,57 @@
+import json
+from datetime import date, time
+
+import pytest
+
+from changes import (
+    DEFAULT_LIMIT, MAX_LIMIT, RECORD_COLUMNS, ChangesPruned, change_line, check_since, parse_args,
+)
+
+
+def _row(**extra):
+    row = {col: None for col in RECORD_COLUMNS}
+    row.update({
+        "seq": 12, "id": 5, "operacja": "I", "istnieje": True,
+        "imie_nazwisko": "Józef Woźniak", "data_zgonu_d": date(1900, 3, 3),
+        "godzina_zgonu": time(23, 0), "rok_zgonu": 1900, "wiek_dni": 547.5,
+    })
+    row.update(extra)
+    return row
+
+
+def test_insert_line():
+    line = change_line(_row())
+    assert line.endswith("\n") and line.count("\n") == 1
+    assert "Józef Woźniak" in line  # bez \u-escapowania
+    item = json.loads(line)
+    assert {k: item[k] for k in ("seq", "op", "id")} == {"seq": 12, "op": "insert", "id": 5}
+    assert list(item["rekord"]) == RECORD_COLUMNS
+    assert item["rekord"]["data_zgonu_d"] == "1900-03-03"
+    assert item["rekord"]["godzina_zgonu"] == "23:00:00"
+    assert item["rekord"]["wiek_dni"] == 547.5
+
+
+@pytest.mark.parametrize("op", ["U", "?"])
+def test_update_line(op):
+    assert json.loads(change_line(_row(operacja=op)))["op"] == "update"
+
+
+def test_delete_line():
+    item = json.loads(change_line(_row(operacja="U", istnieje=False)))
+    assert item == {"seq": 12, "op": "delete", "id": 5}
+
+
+def test_parse_args():
+    assert parse_args({}) == (0, DEFAULT_LIMIT)
+    assert parse_args({"since": "7", "limit": "10"}) == (7, 10)
+    assert parse_args({"limit": str(10 ** 9)})[1] == MAX_LIMIT
+    for bad in ({"since": "-1"}, {"limit": "0"}, {"since": "x"}):
+        with pytest.raises(ValueError):
+            parse_args(bad)
+
+
+def test_check_since():
+    check_since(10, 10)
+    with pytest.raises(ChangesPruned) as e:
+        check_since(9, 10)
+    assert e.value.pruned_to == 10
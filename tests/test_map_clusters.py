@@ -0,0 +1,70 @@
+import pytest
+
+from map_clusters import CLUSTER_MAX_ZOOM, TILE_PX, _world_px, tile_geojson, tile_valid
+
+POINTS = {
+    "albigowa": ("Albigowa", 50.01, 22.22),
+    "markowa": ("Markowa", 50.02, 22.31),
+    "lodz": ("Łódź", 51.76, 19.46),
+    "bez_zgonow": ("Bez zgonów", 50.03, 22.25),
+}
+COUNTS = {
+    "albigowa": (30, ["Parafia Albigowa"]),
+    "markowa": (10, ["Markowa", "Parafia Markowa"]),
+    "lodz": (5, ["Łódź"]),
+    "bez_zgonow": (0, ["Bez zgonów"]),
+    "spoza_gazetera": (7, ["Nieznana"]),
+}
+
+
+def _tile_of(lat, lng, z):
+    px, py = _world_px(lat, lng, z)
+    return int(px // TILE_PX), int(py // TILE_PX)
+
+
+def test_tile_valid():
+    assert tile_valid(0, 0, 0)
+    assert tile_valid(3, 7, 7)
+    assert not tile_valid(3, 8, 0)
+    assert not tile_valid(-1, 0, 0)
+    assert not tile_valid(19, 0, 0)
+
+
+def test_low_zoom_clusters_nearby_parishes():
+    geojson = tile_geojson(POINTS, COUNTS, 0, 0, 0)
+    assert geojson["type"] == "FeatureCollection"
+    features = geojson["features"]
+    assert [f["properties"]["count"] for f in features] == [45]
+    assert features[0]["properties"]["parafie"] == 3
+    assert "parafia" not in features[0]["properties"]
+
+
+def test_cluster_point_is_weighted_mean():
+    counts = {k: COUNTS[k] for k in ("albigowa", "markowa")}
+    z = 6
+    x, y = _tile_of(50.01, 22.22, z)
+    (feature,) = tile_geojson(POINTS, counts, z, x, y)["features"]
+    lng, lat = feature["geometry"]["coordinates"]
+    assert lat == pytest.approx((50.01 * 30 + 50.02 * 10) / 40, abs=1e-6)
+    assert lng == pytest.approx((22.22 * 30 + 22.31 * 10) / 40, abs=1e-6)
+
+
+def test_max_zoom_keeps_parishes_separate():
+    z = CLUSTER_MAX_ZOOM
+    x, y = _tile_of(50.01, 22.22, z)
+    features = tile_geojson(POINTS, COUNTS, z, x, y)["features"]
+    assert len(features) == 1
+    # jedna nazwa w tabeli zgony – wyświetlana ta nazwa, nie nazwa z gazetera
+    assert features[0]["properties"] == {"count": 30, "parafie": 1, "parafia": "Parafia Albigowa"}
+
+
+def test_features_sorted_and_outside_tile_skipped():
+    z = 8
+    x, y = _tile_of(51.76, 19.46, z)
+    features = tile_geojson(POINTS, COUNTS, z, x, y)["features"]
+    assert [f["properties"].get("parafia") for f in features] == ["Łódź"]
+
+    z = 5
+    x, y = _tile_of(51.76, 19.46, z)
+    counts = [f["properties"]["count"] for f in tile_geojson(POINTS, COUNTS, z, x, y)["features"]]
+    assert counts == [40, 5]
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import name_index
+from name_index import NameIndex
+from name_matching import normalize_name
+
+FIRST = ["Jan", "Józef", "Maria", "Marianna", "Anna", "Antoni", "Stanisław", "Katarzyna",
+         "Franciszek", "Zofia", "Wojciech", "Jadwiga", "Tomasz", "Teresa", "Karol", "Kazimierz"]
+LAST = ["Kowalski", "Kowalczyk", "Nowak", "Mazur", "Kuźniak", "Lewandowski", "Wójcik",
+        "Kamiński", "Zieliński", "Szymański", "Woźniak", "Dąbrowski", "Kozłowski", "Jankowski",
+        "Grzyb", "Rublewski", "Krawczyk", "Kaczmarek", "Mazurek", "Kozak"]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rnd = random.Random(7)
+    names = [f"{f} {m} {l}" for f in FIRST for m in ("", "Jan", "Maria") for l in LAST]
+    names = [" ".join(n.split()) for n in names]
+    counts = rnd.sample(range(1, 10 * len(names)), len(names))  # bez remisów
+    out = []
+    for name, count in zip(names, counts):
+        # dwie pisownie jednego klucza: bez diakrytyków rzadziej
+        out.append((normalize_name(name), name, count))
+        out.append((normalize_name(name), normalize_name(name).title(), 1))
+    return out
+
+
+def direct_scan(rows, text, limit):
+    counts, names = {}, {}
+    for norm, name, count in rows:
+        counts[norm] = counts.get(norm, 0) + count
+        if count > 1:
+            names[norm] = name
+    prefix = normalize_name(text)
+    words = lambda norm: [norm] + [norm[i + 1:] for i, ch in enumerate(norm) if ch == " "]
+    hits = [n for n in counts if any(w.startswith(prefix) for w in words(n))]
+    hits.sort(key=lambda n: -counts[n])
+    return [(names[n], counts[n]) for n in hits[:limit]]
+
+
+@pytest.mark.parametrize("text", ["k", "K", "kow", "Kowalski", "jan", "jan k", "Marianna",
+                                  "ma", "Wójcik", "wojc", "s", "zz", "j"])
+@pytest.mark.parametrize("limit", [1, 10, 50])
+def test_lookup_matches_direct_scan(rows, text, limit):
+    index = NameIndex(rows)
+    assert index.lookup(text, limit) == direct_scan(rows, text, limit)
+
+
+def test_heavy_prefixes_use_precomputed_tops(rows):
+    index = NameIndex(rows)
+    assert len(index.keys) > name_index.DIRECT_SCAN
+    assert {"k", "j", "m"} <= set(index._tops)
+
+
+def test_max_names_keeps_most_frequent(rows):
+    index = NameIndex(rows, max_names=5)
+    assert len(index) == 5
+    assert index.lookup("", 5) == []
+    top5 = direct_scan(rows, "", 5)  # pusty prefiks pasuje do wszystkich
+    assert list(index.counts) == [count for _, count in top5]
+    assert index.names == [name for name, _ in top5]
+
+
+def test_limit_is_clamped(rows):
+    index = NameIndex(rows)
+    assert len(index.lookup("k", 0)) == 1
+    assert len(index.lookup("k", 10 ** 6)) == name_index.MAX_LIMIT
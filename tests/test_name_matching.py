@@ -0,0 +1,49 @@
+import pytest
+
+from name_matching import name_keys, normalize_name, phonetic_codes, unaccent_pl
+
+
+def test_unaccent_pl():
+    assert unaccent_pl("Łódź, Żółć") == "Lodz, Zolc"
+    assert unaccent_pl("") == ""
+    assert unaccent_pl(None) == ""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Grzegorz (Jerzy) Dymitrzyk", "grzegorz jerzy dymitrzyk"),
+    ("  Józef   WOŹNIAK ", "jozef wozniak"),
+    ("Anna-Maria Łęcka", "anna maria lecka"),
+    ("", ""),
+])
+def test_normalize_name(text, expected):
+    assert normalize_name(text) == expected
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Maryanna", "Marianna"),
+    ("Maryjanna", "Marjanna"),
+    ("Wojciech", "Woyciech"),
+    ("Kajetan", "Kayetan"),
+    ("Józef", "Joseph"),
+    ("Ksawery", "Xawery"),
+    ("Grzegorz Dymitrzyk", "Grzegorz Dymitrzik"),
+])
+def test_spelling_variants_share_codes(a, b):
+    assert phonetic_codes(a) == phonetic_codes(b)
+
+
+def test_different_names_differ():
+    assert phonetic_codes("Kowalski") != phonetic_codes("Nowak")
+
+
+def test_phonetic_codes_sorted_unique_and_padded():
+    codes = phonetic_codes("Jan Nowak Jan i")
+    assert codes == sorted(set(codes))
+    assert len(codes) == 2  # "i" jest za krótkie, "Jan" liczone raz
+    assert all(len(c) == 6 and c.isdigit() for c in codes)
+
+
+def test_name_keys():
+    norm, codes = name_keys("Józef Woźniak")
+    assert norm == "jozef wozniak"
+    assert codes == phonetic_codes("Jozef Wozniak")
@@ -0,0 +1,49 @@
+import json
+
+from ocr_json import FAILED, OK, REPAIRED, parse_response
+
+RECORD = {"imie_nazwisko": "Jan Kowalski", "wiek": "4 lata"}
+
+
+def test_valid_json():
+    text = json.dumps({"rekordy": [RECORD]}, ensure_ascii=False)
+    assert parse_response(text) == ({"rekordy": [RECORD]}, OK, None)
+
+
+def test_code_fences():
+    text = "```json\n" + json.dumps({"rekordy": [RECORD]}) + "\n```"
+    assert parse_response(text) == ({"rekordy": [RECORD]}, OK, None)
+
+
+def test_trailing_commas():
+    text = '{"rekordy": [{"imie_nazwisko": "Jan Kowalski", "wiek": "4 lata",},],}'
+    assert parse_response(text) == ({"rekordy": [RECORD]}, REPAIRED, None)
+
+
+def test_comma_inside_string_is_kept():
+    data, status, _ = parse_response('[{"imie_nazwisko": "Kowalski, Jan }"}]')
+    assert status == OK
+    assert data["rekordy"][0]["imie_nazwisko"] == "Kowalski, Jan }"
+
+
+def test_truncated_response_keeps_complete_records():
+    text = json.dumps({"rekordy": [RECORD, RECORD, RECORD]})
+    data, status, error = parse_response(text[:-30])
+    assert status == REPAIRED and error is None
+    assert data["rekordy"] == [RECORD, RECORD]
+
+
+def test_text_around_json():
+    data, status, _ = parse_response('Oto wynik:\n{"rekordy": []}\nDziękuję.')
+    assert (data, status) == ({"rekordy": []}, REPAIRED)
+
+
+def test_list_and_non_dict_records():
+    assert parse_response('[1, {"a": "b"}]') == ({"rekordy": [{"a": "b"}]}, OK, None)
+
+
+def test_unrecoverable():
+    for text in ("nic tu nie ma", "", None, '{"rekordy": [{"a": "b'):
+        data, status, error = parse_response(text)
+        assert data is None and status == FAILED
+        assert error.startswith("Błąd parsowania JSON")
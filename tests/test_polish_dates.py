@@ -0,0 +1,61 @@
+from datetime import date, time
+
+import pytest
+
+from polish_dates import Age, parse_age, parse_death_date, typed_columns
+
+
+@pytest.mark.parametrize("text, day, at, year", [
+    ("29 grudnia 1939, godzina niewiadoma", date(1939, 12, 29), None, 1939),
+    ("26 stycznia 1876, 12:00 w nocy", date(1876, 1, 26), time(0, 0), 1876),
+    ("3 marca 1900, godz. 11 w nocy", date(1900, 3, 3), time(23, 0), 1900),
+    ("3 marca 1900, godz. 3 w nocy", date(1900, 3, 3), time(3, 0), 1900),
+    ("3 marca 1900 o 10 wieczorem", date(1900, 3, 3), time(22, 0), 1900),
+    ("5 maja 1890 o 5 rano", date(1890, 5, 5), time(5, 0), 1890),
+    ("1 lipca 1890, godz. 4 po południu", date(1890, 7, 1), time(16, 0), 1890),
+    ("14.07.1942", date(1942, 7, 14), None, 1942),
+    ("1942-07-14", date(1942, 7, 14), None, 1942),
+    ("14 VII 1942", date(1942, 7, 14), None, 1942),
+    ("14 Julii 1842", date(1842, 7, 14), None, 1842),
+    ("lipiec 1942", None, None, 1942),
+    ("1942", None, None, 1942),
+    ("31.02.1900", None, None, 1900),
+    ("brak informacji", None, None, None),
+    ("", None, None, None),
+    (None, None, None, None),
+])
+def test_parse_death_date(text, day, at, year):
+    parsed = parse_death_date(text)
+    assert (parsed.day, parsed.time, parsed.year) == (day, at, year)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("75 lat", Age(years=75)),
+    ("3", Age(years=3)),
+    ("2 miesiące 2 dni", Age(months=2, days=2)),
+    ("1 rok 6 miesięcy", Age(years=1, months=6)),
+    ("53 lata (przybliżony, wyliczony)", Age(years=53)),
+    ("pół roku", Age(months=6)),
+    ("półtora roku", Age(years=1, months=6)),
+    ("1/2 roku", Age(months=6)),
+    ("2 1/2 miesiąca", Age(months=2, days=15)),
+    ("2½ roku", Age(years=2, months=6)),
+    ("1 rok i pół", Age(years=1, months=6)),
+    ("1 rok i ½", Age(years=1, months=6)),
+    ("3 tygodnie", Age(days=21)),
+    ("12 godzin", Age(hours=12)),
+])
+def test_parse_age(text, expected):
+    assert parse_age(text) == expected
+
+
+@pytest.mark.parametrize("text", ["brak informacji", "niewiadomy", "", None, "pół", "200 lat"])
+def test_parse_age_none(text):
+    assert parse_age(text) is None
+
+
+def test_typed_columns():
+    assert typed_columns("3 marca 1900, godz. 11 w nocy", "1 rok i pół") == (
+        date(1900, 3, 3), time(23, 0), 1900, "1 years 6 mons 0 days 0 hours",
+    )
+    assert typed_columns(None, None) == (None, None, None, None)